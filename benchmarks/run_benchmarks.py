@@ -0,0 +1,279 @@
+"""
+benchmarks/run_benchmarks.py
+
+End-to-end benchmark suite for the pipeline.
+
+For each dataset size it generates a seeded synthetic CSV, then times:
+- CSV parse, DataCleaner.clean_dataframe and DataAgent.load_data
+- every DataAgent summarize_* method and get_low_ctr_ads
+- EvaluatorAgent.validate on a fixed batch of hypotheses, and on a bulk
+  batch naming real segments (hypotheses/sec throughput)
+- a full Orchestrator.run against StubLLM (no network)
+
+Results are written as JSON and checked against benchmarks/thresholds.json
+(absolute limits) and, if present, a saved baseline (relative regression).
+
+Usage:
+    python -m benchmarks.run_benchmarks --rows 10000 100000
+    python -m benchmarks.run_benchmarks --rows 1000000 --skip-orchestrator --check
+    python -m benchmarks.run_benchmarks --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import yaml
+
+from benchmarks.stub_llm import StubLLM
+from src.agents.data_agent import DataAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.utils.data_generator import SyntheticAdsGenerator
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "results.json")
+DEFAULT_THRESHOLDS = os.path.join(BENCH_DIR, "thresholds.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Names creatives so the creative stage and its fan-out are timed too
+ORCHESTRATOR_QUERY = "Analyze ROAS drop and recommend creatives for low-CTR ads"
+
+HYPOTHESES = {"hypotheses": [
+    {"reason": "ROAS dropped over the last month", "metric": "roas", "confidence": 0.6},
+    {"reason": "CTR dropped due to creative fatigue", "metric": "ctr", "confidence": 0.5},
+    {"reason": "Video outperforms image on CTR", "metric": "ctr", "confidence": 0.5},
+    {"reason": "Retargeting audience outperforms broad", "metric": "ctr", "confidence": 0.4},
+] * 25}
+
+BULK_TEMPLATES = [
+    ("{metric} dropped for {a} over the last two weeks", 0.6),
+    ("{metric} rose after budget moved to {a}", 0.4),
+    ("{a} outperforms {b} on {metric}", 0.5),
+    ("{a} underperforms {b} on {metric}", 0.5),
+    ("Audience mix explains the {metric} gap", 0.4),
+    ("Overall {metric} declined due to creative fatigue", 0.5),
+]
+
+
+def bulk_hypotheses(cube, count, seed=0):
+    """`count` templated hypotheses naming segments that exist in `cube`."""
+    rng = random.Random(seed)
+    dims = [d for d in ("campaign_name", "creative_type", "audience_type", "country") if len(cube.values.get(d, [])) >= 2]
+    items = []
+    for i in range(count):
+        template, confidence = BULK_TEMPLATES[i % len(BULK_TEMPLATES)]
+        a, b = rng.sample(cube.values[rng.choice(dims)], 2)
+        metric = rng.choice(["CTR", "ROAS"])
+        items.append({
+            "reason": template.format(metric=metric, a=a, b=b),
+            "metric": metric.lower(),
+            "confidence": confidence,
+        })
+    return {"hypotheses": items}
+
+
+def timed(fn, repeat=1):
+    """Best wall time of `repeat` calls, plus the last return value."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def write_bench_config(base_config_path, workdir, data_path):
+    with open(base_config_path, "r") as f:
+        config = yaml.safe_load(f)
+
+    config["paths"]["data"] = data_path
+    config["paths"]["reports"] = os.path.join(workdir, "reports") + os.sep
+    config["paths"]["logs"] = os.path.join(workdir, "logs") + os.sep
+    # StubLLM answers instantly; pacing would only measure the token bucket
+    config.setdefault("llm", {})["rate_per_sec"] = 0
+
+    path = os.path.join(workdir, "config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def bench_size(rows, workdir, args):
+    data_path = os.path.join(workdir, f"fb_ads_{rows}.csv")
+    gen_seconds, _ = timed(lambda: SyntheticAdsGenerator(
+        seed=args.seed,
+        campaigns=args.campaigns,
+        creatives=args.creatives,
+        audiences=args.audiences,
+        days=args.days,
+    ).write_csv(data_path, rows))
+    print(f"[BENCH] rows={rows} generated in {gen_seconds:.2f}s")
+
+    config_path = write_bench_config(args.config, workdir, data_path)
+    agent = DataAgent(config_path)
+    evaluator = EvaluatorAgent(config_path)
+
+    results = []
+
+    def record(stage, seconds, **extra):
+        results.append({
+            "rows": rows,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+            **extra,
+        })
+        print(f"[BENCH] rows={rows:<10} {stage:<32} {seconds:10.4f}s")
+
+    seconds, raw = timed(lambda: pd.read_csv(data_path), args.repeat)
+    record("read_csv", seconds)
+
+    seconds, _ = timed(lambda: agent.cleaner.clean_dataframe(raw), args.repeat)
+    record("clean_dataframe", seconds)
+    del raw
+
+    seconds, df = timed(agent.load_data, args.repeat)
+    record("load_data", seconds)
+
+    summarizers = sorted(m for m in dir(agent) if m.startswith("summarize_")) + ["get_low_ctr_ads"]
+    for name in summarizers:
+        seconds, _ = timed(lambda: getattr(agent, name)(df), args.repeat)
+        record(name, seconds)
+    del df
+
+    summary = agent.build_summary()
+    seconds, _ = timed(lambda: evaluator.validate(HYPOTHESES, summary), args.repeat)
+    record("evaluator.validate", seconds)
+
+    if args.hypotheses:
+        bulk = bulk_hypotheses(summary["metric_cube"], args.hypotheses, args.seed)
+        seconds, _ = timed(lambda: evaluator.validate(bulk, summary), args.repeat)
+        per_sec = round(args.hypotheses / seconds, 1) if seconds > 0 else None
+        record("evaluator.validate_bulk", seconds, hypotheses=args.hypotheses, hypotheses_per_sec=per_sec)
+        print(f"[BENCH] rows={rows:<10} {'':<32} {per_sec} hypotheses/sec")
+
+    if not args.skip_orchestrator and rows <= args.max_orchestrator_rows:
+        from src.orchestrator.orchestrator import Orchestrator
+
+        orchestrator = Orchestrator(config_path, llm=StubLLM())
+        seconds, _ = timed(lambda: orchestrator.run(ORCHESTRATOR_QUERY))
+        record("orchestrator.run", seconds, improvements=orchestrator.last_run["improvements"])
+
+    os.remove(data_path)
+    return results
+
+
+def check_thresholds(results, thresholds, baseline):
+    """Return a list of human-readable threshold violations."""
+    violations = []
+    limits = thresholds.get("stages", {})
+    max_regression = thresholds.get("max_regression_pct")
+
+    baseline_index = {}
+    for r in (baseline or {}).get("results", []):
+        baseline_index[(r["rows"], r["stage"])] = r["seconds"]
+
+    for r in results:
+        limit = limits.get(r["stage"], {})
+        if "max_us_per_row" in limit:
+            us_per_row = r["seconds"] * 1e6 / r["rows"]
+            if us_per_row > limit["max_us_per_row"]:
+                violations.append(
+                    f"{r['stage']} @ {r['rows']} rows: {us_per_row:.2f} us/row > {limit['max_us_per_row']}"
+                )
+        if "max_seconds" in limit and r["seconds"] > limit["max_seconds"]:
+            violations.append(
+                f"{r['stage']} @ {r['rows']} rows: {r['seconds']:.3f}s > {limit['max_seconds']}s"
+            )
+
+        previous = baseline_index.get((r["rows"], r["stage"]))
+        min_seconds = thresholds.get("min_seconds_for_regression", 0.05)
+        if max_regression is not None and previous and r["seconds"] >= min_seconds:
+            change_pct = (r["seconds"] - previous) / previous * 100
+            if change_pct > max_regression:
+                violations.append(
+                    f"{r['stage']} @ {r['rows']} rows: {change_pct:.0f}% slower than baseline "
+                    f"({previous:.3f}s -> {r['seconds']:.3f}s)"
+                )
+
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Kasparro pipeline on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--campaigns", type=int, default=12)
+    parser.add_argument("--creatives", type=int, default=40)
+    parser.add_argument("--audiences", type=int, default=4)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=1, help="best-of-N timing per stage")
+    parser.add_argument("--hypotheses", type=int, default=5000, help="bulk validation batch size (0 to skip)")
+    parser.add_argument("--skip-orchestrator", action="store_true")
+    parser.add_argument("--max-orchestrator-rows", type=int, default=1_000_000)
+    parser.add_argument("--out", default=DEFAULT_RESULTS)
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also write results to the baseline file")
+    parser.add_argument("--check", action="store_true", help="exit non-zero on threshold violations")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="kasparro_bench_")
+    try:
+        results = []
+        for rows in args.rows:
+            results.extend(bench_size(rows, workdir, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds, "r") as f:
+            thresholds = json.load(f)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    violations = check_thresholds(results, thresholds, baseline)
+
+    output = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("check", "save_baseline")},
+        "results": results,
+        "violations": violations,
+    }
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"[BENCH] Results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"[BENCH] Baseline saved to {args.baseline}")
+
+    for v in violations:
+        print(f"[BENCH] THRESHOLD VIOLATION: {v}")
+
+    if args.check and violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+benchmarks/stub_llm.py
+
+Deterministic stand-in for MultiLLM so pipeline benchmarks measure our own
+code rather than network latency. Answers are chosen from the agent's system
+prompt and shaped like the JSON each agent expects. Creative answers echo
+the creatives listed in the prompt, so fan-out runs as it would live.
+"""
+
+import ast
+
+
+def _prompt_creatives(user_prompt):
+    """The creatives list CreativeAgent renders on one line of its prompt."""
+    for line in user_prompt.splitlines():
+        if line.startswith("[{"):
+            return ast.literal_eval(line)
+    return []
+
+
+class StubLLM:
+    def __init__(self):
+        self.calls = 0
+        self.embedder = None
+
+    def ask(self, system_prompt, user_prompt):
+        return str(self.ask_json(system_prompt, user_prompt))
+
+    def ask_json(self, system_prompt, user_prompt):
+        self.calls += 1
+        prompt = system_prompt.lower()
+
+        if "planner" in prompt:
+            return {"tasks": [
+                {"step": 1, "task": "Summarize daily ROAS and CTR trend"},
+                {"step": 2, "task": "Compare creative types and audiences"},
+                {"step": 3, "task": "Recommend creatives for low-CTR ads"},
+            ]}
+
+        if "insight" in prompt:
+            return {"hypotheses": [
+                {"reason": "ROAS dropped over the last month", "evidence": "daily roas", "metric": "roas", "confidence": 0.6},
+                {"reason": "CTR dropped due to creative fatigue", "evidence": "daily ctr", "metric": "ctr", "confidence": 0.5},
+                {"reason": "Video outperforms image on CTR", "evidence": "creative summary", "metric": "ctr", "confidence": 0.5},
+                {"reason": "Retargeting audience outperforms broad", "evidence": "audience summary", "metric": "ctr", "confidence": 0.4},
+            ]}
+
+        if "creative" in prompt:
+            return {"improvements": [{
+                **{k: x[k] for k in ("id", "campaign", "adset", "old_message") if k in x},
+                "new_headlines": ["Headline A", "Headline B", "Headline C"],
+                "new_captions": ["Caption A", "Caption B", "Caption C"],
+                "new_ctas": ["Shop Now", "Learn More"],
+            } for x in _prompt_creatives(user_prompt)]}
+
+        return {"__raw_text": "stub"}
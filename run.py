@@ -4,22 +4,54 @@ Main entry point for Kasparro Agentic Facebook Analyst Pipeline.
 
 Usage:
     python run.py "Analyze ROAS drop"
+    python run.py "Analyze ROAS drop" --profile
+    python run.py "Analyze ROAS drop" --profile --profile-mode sampling
 """
 
-import sys
+import argparse
+import os
+
 from src.orchestrator.orchestrator import Orchestrator
+from src.utils.profiler import StageProfiler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kasparro Agentic FB Analyst")
+    parser.add_argument("query", nargs="?", help="analysis question, e.g. 'Analyze ROAS drop'")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile each pipeline stage (CPU + memory)")
+    parser.add_argument("--profile-mode", choices=["deterministic", "sampling"], default="deterministic",
+                        help="deterministic = cProfile + tracemalloc; sampling = low-overhead stack sampler")
+    parser.add_argument("--profile-top", type=int, default=25,
+                        help="hotspots listed per stage in the combined report")
+    parser.add_argument("--profile-interval", type=float, default=0.005,
+                        help="seconds between stack samples in sampling mode")
+    parser.add_argument("--profile-dir", default=None,
+                        help="output directory (default: <logs>/profiles)")
+    return parser.parse_args()
 
 
 def main():
-    if len(sys.argv) < 2:
+    args = parse_args()
+
+    if not args.query:
         print("❌ Error: You must provide a query.")
         print("Example: python run.py 'Analyze ROAS drop'")
         return
 
-    user_query = sys.argv[1]
+    user_query = args.query
     print(f"\n🚀 Running Kasparro Agentic FB Analyst\nQuery: {user_query}\n")
 
     orchestrator = Orchestrator("config/config.yaml")
+
+    if args.profile:
+        orchestrator.profiler = StageProfiler(
+            args.profile_dir or os.path.join(orchestrator.logs_dir, "profiles"),
+            mode=args.profile_mode,
+            top_n=args.profile_top,
+            sample_interval=args.profile_interval,
+        )
+
     orchestrator.run(user_query)
 
     print("\n✅ Pipeline completed.")
@@ -28,6 +60,8 @@ def main():
     print("   - creatives.json")
     print("   - report.md")
     print("\n📁 Check 'logs/' for pipeline logs.\n")
+    if args.profile:
+        print(f"📊 Profiles: {orchestrator.profiler.run_dir}\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+src/agents/anomaly_agent.py
+
+Anomaly Agent:
+- Runs between DataAgent and InsightAgent, without an LLM
+- Reads the roas_drop_pct, spend_spike_pct and impression_fatigue thresholds
+- Compares the recent window with the window before it for every campaign,
+  adset, creative type and audience series of the MetricCube
+- Flags ROAS drops, day-over-day spend spikes and fatigue (impressions up
+  while CTR falls) in one vectorized pass over all segments
+- Sparse segments are skipped: both windows need min_spend and
+  min_active_days days with spend, and a spike's base day must spend at
+  least spike_min_base of the prior window's daily average
+- Returns only the flagged segments, ranked within each type by impact in
+  currency (revenue lost, extra spend, spend on lost clicks), so a small
+  segment's large percentage does not outrank a large segment's real loss
+"""
+
+from itertools import zip_longest
+
+import yaml
+import numpy as np
+
+from src.utils.helpers import safe_number
+from src.utils.metric_cube import MEASURES
+
+
+class AnomalyAgent:
+    def __init__(self, config_path="config/config.yaml"):
+        with open(config_path, "r") as f:
+            self.config = yaml.safe_load(f)
+
+        self.thresholds = self.config["thresholds"]
+
+        anomaly_cfg = self.config.get("anomaly", {})
+        self.window = anomaly_cfg.get("window", 7)
+        self.max_flagged = anomaly_cfg.get("max_flagged", 20)
+        self.min_spend = anomaly_cfg.get("min_spend", 50.0)
+        self.min_active_days = anomaly_cfg.get("min_active_days", 3)
+        self.spike_min_base = anomaly_cfg.get("spike_min_base", 0.5)
+        self.dimensions = anomaly_cfg.get(
+            "dimensions", ["campaign_name", "adset_name", "creative_type", "audience_type"]
+        )
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _stack(self, cube, dims):
+        """All segments of all dimensions as one (segments x dates+1 x measures) prefix array."""
+        labels = [(dim, v) for dim in dims for v in cube.values[dim]]
+        prefix = np.concatenate([cube.prefix[dim] for dim in dims], axis=0)
+        return labels, prefix
+
+    def _windows(self, prefix, days):
+        """(prior, recent) window sums as {measure: array}, plus the recent daily sums."""
+        w = min(self.window, days // 2)
+        lo, mid, hi = days - 2 * w, days - w, days
+        prior = prefix[:, mid] - prefix[:, lo]
+        recent = prefix[:, hi] - prefix[:, mid]
+        # Daily values of the recent window plus the day before it (for day-over-day change)
+        daily = np.diff(prefix[:, mid - 1:hi + 1], axis=1)
+
+        # Days with any spend in each window
+        spend_days = np.diff(prefix[:, lo:hi + 1, MEASURES.index("spend")], axis=1) > 0
+        active = (spend_days[:, :mid - lo].sum(axis=1), spend_days[:, mid - lo:].sum(axis=1))
+
+        def as_dict(sums):
+            return {m: sums[..., k] for k, m in enumerate(MEASURES)}
+
+        return as_dict(prior), as_dict(recent), as_dict(daily), active, (lo, mid, hi)
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def detect(self, summary: dict) -> dict:
+        """
+        Returns:
+        {
+          "window": {"prior": [start, end], "recent": [start, end]},
+          "segments_scanned": int,
+          "counts": {"roas_drop": n, "spend_spike": n, "impression_fatigue": n},
+          "flagged": [ {type, dimension, segment, change_pct, prior, recent, spend_recent, severity, impact}, ... ]
+        }
+        """
+        cube = summary.get("metric_cube")
+        empty = {"window": None, "segments_scanned": 0,
+                 "counts": {"roas_drop": 0, "spend_spike": 0, "impression_fatigue": 0}, "flagged": []}
+        dims = [d for d in self.dimensions if cube is not None and cube.has(d)]
+        if not dims or len(cube.dates) < 2:
+            return empty
+
+        labels, prefix = self._stack(cube, dims)
+        prior, recent, daily, active, (lo, mid, hi) = self._windows(prefix, len(cube.dates))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roas_prior = prior["revenue"] / prior["spend"]
+            roas_recent = recent["revenue"] / recent["spend"]
+            roas_change = roas_recent / roas_prior - 1.0
+
+            ctr_prior = prior["clicks"] / prior["impressions"]
+            ctr_recent = recent["clicks"] / recent["impressions"]
+            ctr_change = ctr_recent / ctr_prior - 1.0
+            impressions_change = recent["impressions"] / prior["impressions"] - 1.0
+
+            # Largest day-over-day spend increase inside the recent window, from
+            # base days spending a usual amount (not a near-empty day)
+            spend = daily["spend"]
+            min_base = np.maximum(self.spike_min_base * prior["spend"] / max(1, mid - lo), 0.0)
+            base_ok = (spend[:, :-1] > 0) & (spend[:, :-1] >= min_base[:, None])
+            spend_change = np.where(base_ok, spend[:, 1:] / spend[:, :-1] - 1.0, np.nan)
+            spike_day = np.argmax(np.where(np.isfinite(spend_change), spend_change, -np.inf), axis=1)
+            rows = np.arange(len(labels))
+            spike = spend_change[rows, spike_day]
+
+            # Impact in currency
+            revenue_lost = (roas_prior - roas_recent) * recent["spend"]
+            extra_spend = spend[rows, spike_day + 1] - spend[rows, spike_day]
+            lost_click_spend = (ctr_prior - ctr_recent) * recent["impressions"] * prior["spend"] / prior["clicks"]
+
+        min_days = min(self.min_active_days, mid - lo)
+        material = (
+            (prior["spend"] >= self.min_spend) & (recent["spend"] >= self.min_spend)
+            & (active[0] >= min_days) & (active[1] >= min_days)
+        )
+        checks = {
+            "roas_drop": (
+                material & (roas_change <= self.thresholds["roas_drop_pct"]),
+                roas_change, roas_prior, roas_recent,
+                np.abs(roas_change / self.thresholds["roas_drop_pct"]),
+                revenue_lost,
+            ),
+            "spend_spike": (
+                material & (spike >= self.thresholds["spend_spike_pct"]),
+                spike, None, None,
+                spike / self.thresholds["spend_spike_pct"],
+                extra_spend,
+            ),
+            "impression_fatigue": (
+                material & (impressions_change >= self.thresholds["impression_fatigue"]) & (ctr_change < 0),
+                ctr_change, ctr_prior, ctr_recent,
+                impressions_change / self.thresholds["impression_fatigue"] * (1.0 - ctr_change),
+                lost_click_spend,
+            ),
+        }
+
+        by_type, counts = {}, {}
+        for kind, (mask, change, before, after, severity, impact) in checks.items():
+            mask = mask & np.isfinite(change)
+            counts[kind] = int(mask.sum())
+            flagged = by_type.setdefault(kind, [])
+            for i in np.flatnonzero(mask):
+                item = {
+                    "type": kind,
+                    "dimension": labels[i][0],
+                    "segment": labels[i][1],
+                    "change_pct": safe_number(change[i] * 100, 2),
+                    "spend_recent": safe_number(recent["spend"][i], 2),
+                    "severity": safe_number(severity[i], 3),
+                    "impact": safe_number(impact[i], 2),
+                }
+                if kind == "impression_fatigue":
+                    item["impressions_change_pct"] = safe_number(impressions_change[i] * 100, 2)
+                if kind == "spend_spike":
+                    item["date"] = str(cube.dates[mid + spike_day[i]])
+                if before is not None:
+                    item["prior"] = safe_number(before[i], 4)
+                    item["recent"] = safe_number(after[i], 4)
+                flagged.append(item)
+
+        # Largest impact first within each type, interleaved so one noisy type
+        # cannot crowd the others out of max_flagged
+        for items in by_type.values():
+            items.sort(key=lambda x: (x["impact"] or 0, x["severity"] or 0), reverse=True)
+        flagged = [a for group in zip_longest(*by_type.values()) for a in group if a is not None]
+
+        dates = cube.dates
+        return {
+            "window": {
+                "prior": [str(dates[lo]), str(dates[mid - 1])],
+                "recent": [str(dates[mid]), str(dates[hi - 1])],
+            },
+            "segments_scanned": len(labels),
+            "counts": counts,
+            "flagged": flagged[: self.max_flagged],
+        }
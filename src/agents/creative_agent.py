@@ -1,29 +1,65 @@
+"""
+src/agents/creative_agent.py
+
+Creative Agent:
+- Finds every creative below the low-CTR threshold
+- Clusters near-duplicate messages (embeddings, or exact text without an
+  embedder) and generates once per cluster, fanning results out to members
+- Splits them into fixed-size chunks, one LLM prompt per chunk
+- Sends chunks concurrently; the LLM client's limiter paces the requests
+- Retries failed chunks on their own and merges results in chunk order
+"""
+
+import math
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
+from src.utils.dedup import MessageDeduplicator, normalize_message
 from src.utils.llm_client import MultiLLM
+from src.utils.rate_limiter import request_limiter
 
 
 class CreativeAgent:
-    def __init__(self, config_path="config/config.yaml"):
+    def __init__(self, config_path="config/config.yaml", llm=None):
         # Load config
         with open(config_path, "r") as f:
             self.config = yaml.safe_load(f)
 
         self.ctr_threshold = self.config["thresholds"]["low_ctr"]
 
-        self.llm = MultiLLM()
+        creative_cfg = self.config.get("creative", {})
+        self.chunk_size = max(1, creative_cfg.get("chunk_size", 5))
+        self.concurrency = max(1, creative_cfg.get("concurrency", 4))
+        self.max_retries = creative_cfg.get("max_retries", 2)
+        self.retry_backoff = creative_cfg.get("retry_backoff", 1.0)
+        self.max_items = creative_cfg.get("max_items")
 
-    def generate_creatives(self, summary: dict) -> dict:
-        """
-        Identify creatives with low CTR and generate improvements.
-        """
+        self.llm = llm if llm is not None else MultiLLM(rate_limiter=request_limiter(self.config))
+
+        dedup_cfg = self.config.get("dedup", {})
+        self.dedup_enabled = dedup_cfg.get("enabled", True)
+        self.deduplicator = MessageDeduplicator(
+            embedder=getattr(self.llm, "embedder", None),
+            threshold=dedup_cfg.get("similarity", 0.92),
+            batch_size=dedup_cfg.get("batch_size", 64),
+            cache_path=dedup_cfg.get("cache_path"),
+        )
 
-        # Use creative_summary (already aggregated)
-        items = summary["creative_summary"]
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _low_ctr_items(self, summary):
+        # Use creative_summary (per campaign/adset/message, ranked by wasted spend)
+        items = summary.get("creative_summary", [])
 
         # Filter items below threshold
         low_ctr_items = [
             {
                 "campaign": x.get("campaign_name"),
+                "adset": x.get("adset_name"),
                 "old_message": x.get("creative_message"),
                 "ctr": x.get("ctr"),
                 "creative_type": x.get("creative_type")
@@ -35,25 +71,27 @@ class CreativeAgent:
         # Remove items missing creative message
         low_ctr_items = [x for x in low_ctr_items if x["old_message"]]
 
-        # Limit to avoid LLM overload
-        low_ctr_items = low_ctr_items[:5]
+        if self.max_items:
+            low_ctr_items = low_ctr_items[: self.max_items]
+        return low_ctr_items
 
-        if not low_ctr_items:
-            return {"improvements": [], "note": "No low-CTR creatives found."}
-
-        # LLM prompt
+    def _prompts(self, chunk):
         system_prompt = (
             "You are a Facebook Ads Creative Agent. "
             "Your job is to improve low-CTR ads. "
             "Return ONLY JSON. No notes, no markup."
         )
 
+        # The id (cluster index) comes back with each improvement for fan-out
+        creatives = [{"id": x["cluster"], **{k: v for k, v in x.items() if k != "cluster"}} for x in chunk]
+
         user_prompt = f"""
 You are given a list of low-CTR creatives:
 
-{low_ctr_items}
+{creatives}
 
 For each creative:
+- Copy its id, campaign, adset and old_message unchanged
 - Use the old_message as the base
 - Maintain the product tone
 - Generate:
@@ -66,7 +104,9 @@ Return STRICT JSON:
 {{
   "improvements": [
     {{
+      "id": 0,
       "campaign": "...",
+      "adset": "...",
       "old_message": "...",
       "new_headlines": ["...", "...", "..."],
       "new_captions": ["...", "...", "..."],
@@ -75,27 +115,151 @@ Return STRICT JSON:
   ]
 }}
 """
+        return system_prompt, user_prompt
+
+    def _generate_chunk(self, chunk):
+        """One LLM call for one chunk. Raises ValueError on an unusable response."""
+        response = self.llm.ask_json(*self._prompts(chunk))
+
+        if "improvements" not in response:
+            # Check if we got a raw text response indicating failure
+            if isinstance(response, dict) and "__raw_text" in response:
+                raw_text = response.get("__raw_text", "")
+                if "Model failed" in raw_text or len(raw_text) < 50:
+                    raise ValueError(f"LLM failed to generate valid response: {raw_text[:200]}")
+            raise ValueError("Response missing 'improvements' key")
+
+        # Validate that we actually got improvements
+        if not response.get("improvements"):
+            raise ValueError("LLM returned empty improvements list")
+
+        return response["improvements"]
+
+    def _run_chunk(self, index, chunk):
+        """Retry this chunk alone; returns (improvements, error)."""
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                print(f"[CREATIVE_AGENT] Retrying chunk {index} (attempt {attempt + 1})")
+            try:
+                return self._generate_chunk(chunk), None
+            except ValueError as e:
+                error = str(e)
+            except Exception as e:
+                error = f"CreativeAgent exception: {str(e)}"
+                print(f"[CREATIVE_AGENT] Chunk {index}: {error}")
+                print(traceback.format_exc())
+        return [], error
 
+    @staticmethod
+    def _match(chunk, improvement):
+        """
+        The chunk item an improvement belongs to: by echoed id (if its
+        old_message agrees), else by (campaign, adset, old_message), else by
+        old_message when only one item has it. None when nothing matches
+        unambiguously.
+        """
+        message = normalize_message(improvement.get("old_message", ""))
         try:
-            response = self.llm.ask_json(system_prompt, user_prompt)
-
-            # Fallback safety
-            if "improvements" not in response:
-                # Check if we got a raw text response indicating failure
-                if isinstance(response, dict) and "__raw_text" in response:
-                    raw_text = response.get("__raw_text", "")
-                    if "Model failed" in raw_text or len(raw_text) < 50:
-                        return {"improvements": [], "__error": f"LLM failed to generate valid response: {raw_text[:200]}"}
-                return {"improvements": [], "__raw": response, "__error": "Response missing 'improvements' key"}
-
-            # Validate that we actually got improvements
-            if not response.get("improvements") or len(response.get("improvements", [])) == 0:
-                return {"improvements": [], "__error": "LLM returned empty improvements list"}
-
-            return response
-        except Exception as e:
-            import traceback
-            error_msg = f"CreativeAgent exception: {str(e)}"
-            print(f"[CREATIVE_AGENT] {error_msg}")
-            print(traceback.format_exc())
-            return {"improvements": [], "__error": error_msg}
+            item = next((x for x in chunk if x["cluster"] == int(improvement.get("id"))), None)
+        except (TypeError, ValueError):
+            item = None
+        if item is not None and (not message or normalize_message(item["old_message"]) == message):
+            return item
+
+        same = [x for x in chunk if normalize_message(x["old_message"]) == message]
+        key = (improvement.get("campaign"), improvement.get("adset"))
+        exact = [x for x in same if (x["campaign"], x["adset"]) == key]
+        if len(exact) == 1:
+            return exact[0]
+        return same[0] if len(same) == 1 else None
+
+    def _fan_out(self, chunk, improvements, clusters):
+        """
+        Copy each representative's improvement to every member of its cluster.
+        An improvement that matches no item (see _match) is dropped rather
+        than attached to the wrong creative.
+        Returns (fanned-out improvements, number dropped).
+        """
+        out, dropped = [], 0
+        for imp in improvements:
+            item = self._match(chunk, imp)
+            if item is None:
+                dropped += 1
+                continue
+            members = clusters[item["cluster"]]
+            for member in members:
+                out.append({
+                    **{k: v for k, v in imp.items() if k != "id"},
+                    "campaign": member["campaign"],
+                    "adset": member["adset"],
+                    "old_message": member["old_message"],
+                    "cluster": item["cluster"],
+                    "cluster_size": len(members),
+                })
+        return out, dropped
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def generate_creatives(self, summary: dict) -> dict:
+        """
+        Identify creatives with low CTR and generate improvements.
+        """
+        if "creative_summary" not in summary:
+            return {"improvements": [], "skipped": "Skipped by plan (no creative summary requested)"}
+
+        low_ctr_items = self._low_ctr_items(summary)
+
+        if not low_ctr_items:
+            return {"improvements": [], "note": "No low-CTR creatives found."}
+
+        # One representative per cluster of near-identical messages
+        if self.dedup_enabled:
+            groups = self.deduplicator.cluster([x["old_message"] for x in low_ctr_items])
+        else:
+            groups = [[i] for i in range(len(low_ctr_items))]
+        clusters = [[low_ctr_items[i] for i in members] for members in groups]
+        representatives = [{**members[0], "cluster": c} for c, members in enumerate(clusters)]
+
+        chunks = [representatives[i:i + self.chunk_size] for i in range(0, len(representatives), self.chunk_size)]
+
+        if self.concurrency == 1 or len(chunks) == 1:
+            results = [self._run_chunk(i, chunk) for i, chunk in enumerate(chunks)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks))) as pool:
+                # map() yields in submission order, so merged output is stable
+                results = list(pool.map(self._run_chunk, range(len(chunks)), chunks))
+
+        improvements, failed, unmatched = [], [], 0
+        for i, (chunk_improvements, error) in enumerate(results):
+            fanned, dropped = self._fan_out(chunks[i], chunk_improvements, clusters)
+            improvements.extend(fanned)
+            unmatched += dropped
+            if dropped:
+                print(f"[CREATIVE_AGENT] Chunk {i}: dropped {dropped} improvements matching no creative")
+            if error:
+                failed.append({"chunk": i, "items": len(chunks[i]), "error": error})
+
+        result = {
+            "improvements": improvements,
+            "creatives_covered": sum(
+                len(clusters[x["cluster"]]) for c, (_, error) in zip(chunks, results) if not error for x in c
+            ),
+            "chunks": len(chunks),
+            "dedup": {
+                "creatives": len(low_ctr_items),
+                "clusters": len(clusters),
+                "method": "embedding" if self.deduplicator.embedder is not None else "exact",
+                "llm_calls_saved": math.ceil(len(low_ctr_items) / self.chunk_size) - len(chunks),
+            },
+        }
+        if failed:
+            result["failed_chunks"] = failed
+        if unmatched:
+            result["unmatched_improvements"] = unmatched
+        if not improvements:
+            result["__error"] = failed[0]["error"] if failed else "LLM returned empty improvements list"
+        return result
@@ -1,8 +1,17 @@
+import numpy as np
 import pandas as pd
 import yaml
 import os
 
+from src.utils.aggregation import SUMMARY_RATIOS, aggregate
 from src.utils.cleaner import DataCleaner
+from src.utils.metric_cube import DIMENSIONS, RATIOS, TOTAL, MetricCube
+from src.utils.pattern_matcher import MultiPatternMatcher
+from src.utils.query_plan import PROJECTABLE, RATIO_METRICS, full_plan
+from src.utils.sampling import ratio_intervals, stratified_sample_csv
+
+
+FILTER_DIMENSIONS = ("campaign_name", "creative_type", "audience_type", "country")
 
 
 class DataAgent:
@@ -14,47 +23,118 @@ class DataAgent:
 
         self.data_path = self.config["paths"]["data"]
         self.thresholds = self.config["thresholds"]
+        self.creative_top_k = self.config.get("creative", {}).get("top_k", 100)
+
+        settings = self.config.get("settings", {})
+        self.mode = settings.get("mode", "full")
+        self.seed = settings.get("seed", 42)
+        self.sampling_cfg = self.config.get("sampling", {})
+        # Filled by load_data() in sample mode
+        self.sampling = None
 
     def load_data(self):
         if not os.path.exists(self.data_path):
             raise FileNotFoundError(f"Dataset not found at: {self.data_path}")
 
+        if self.mode == "sample":
+            return self._load_sample()
+
+        self.sampling = None
         df = pd.read_csv(self.data_path)
         df = self.cleaner.clean_dataframe(df)
 
         return df
 
+    def _load_sample(self):
+        """Seeded sample stratified by date, campaign and creative type (weighted measures)."""
+        cfg = self.sampling_cfg
+        df, info = stratified_sample_csv(
+            self.data_path,
+            self.cleaner.clean_dataframe,
+            max_rows=cfg.get("max_rows", 200_000),
+            time_budget=cfg.get("time_budget_sec"),
+            chunk_rows=cfg.get("chunk_rows", 200_000),
+            seed=self.seed,
+            min_per_stratum=cfg.get("min_per_stratum", 2),
+        )
+        info["confidence"] = cfg.get("confidence", 0.95)
+        self.sampling = info
+        print(
+            f"[DATA_AGENT] Sample mode: {info['rows_sampled']} of {info['rows_read']} rows read "
+            f"(~{info.get('estimated_rows')} in file)"
+        )
+        if info.get("partial"):
+            print("[DATA_AGENT] Time budget reached: estimates cover only the rows read")
+        return df
+
+    def _intervals(self, df, group_cols):
+        """{group key: {ratio: [lo, hi]}} for the sampled rows."""
+        out = {}
+        for name in SUMMARY_RATIOS:
+            num, den, _ = RATIOS[name]
+            ci = ratio_intervals(df, group_cols, num, den, self.sampling["population"], self.sampling["confidence"])
+            keys = list(ci[group_cols].itertuples(index=False, name=None)) if group_cols else [()]
+            for key, lo, hi in zip(keys, ci["lo"], ci["hi"]):
+                # No interval for a group with a zero denominator
+                if np.isfinite(lo) and np.isfinite(hi):
+                    out.setdefault(key, {})[name] = [float(lo), float(hi)]
+        return out
+
+    def _attach_intervals(self, records, df, group_cols):
+        intervals = self._intervals(df, list(group_cols))
+        for r in records:
+            found = intervals.get(tuple(r.get(c) for c in group_cols), {})
+            for name, bounds in found.items():
+                if name in r:
+                    r[f"{name}_ci"] = bounds
+        return records
+
+    # Summaries carry additive totals plus a row count; CTR/ROAS are derived
+    # from the sums (see src/utils/aggregation.py), so partial results merge.
+
     def summarize_daily(self, df):
-        return df.groupby("date").agg({
-            "spend": "sum",
-            "impressions": "sum",
-            "clicks": "sum",
-            "purchases": "sum",
-            "revenue": "sum",
-            "ctr": "mean",
-            "roas": "mean"
-        }).reset_index().to_dict(orient="records")
+        return aggregate(df, ["date"]).reset_index().to_dict(orient="records")
+
+    def summarize_by_creative_type(self, df):
+        return aggregate(df, ["creative_type"]).reset_index().to_dict(orient="records")
 
     def summarize_by_creative(self, df):
-        # FIXED: Include creative_message and campaign_name
-        creative_summary = df.groupby("creative_type").agg({
-            "ctr": "mean",
-            "roas": "mean",
-            "spend": "sum",
-            "impressions": "sum",
-            "creative_message": "first",     # FIX
-            "campaign_name": "first"         # FIX
-        }).reset_index()
-
-        return creative_summary.to_dict(orient="records")
+        """
+        One row per (campaign, adset, creative_message), keeping only the
+        top_k rows by wasted spend (spend not covered by revenue at the
+        low_roas target, or by revenue itself when low_roas is not positive).
+        Partial sort: O(n) selection, then O(k log k).
+        """
+        keys = ["campaign_name", "adset_name", "creative_message"]
+        sums = aggregate(df, keys, sort=False)
+        sums["creative_type"] = df.groupby(keys, sort=False)["creative_type"].first()
+
+        spend = sums["spend"].to_numpy(dtype=float)
+        revenue = sums["revenue"].to_numpy(dtype=float)
+        low_roas = self.thresholds["low_roas"]
+        covered = revenue / low_roas if low_roas > 0 else revenue
+        wasted = np.maximum(spend - covered, 0.0)
+
+        k = min(self.creative_top_k, len(sums))
+        if k < len(sums):
+            top = np.argpartition(-wasted, k - 1)[:k]
+        else:
+            top = np.arange(len(sums))
+        top = top[np.argsort(-wasted[top], kind="stable")]
+
+        rows = sums.iloc[top].reset_index()
+        rows["wasted_spend"] = wasted[top]
+        return rows.to_dict(orient="records")
 
     def summarize_by_audience(self, df):
-        return df.groupby("audience_type").agg({
-            "ctr": "mean",
-            "roas": "mean",
-            "spend": "sum",
-            "impressions": "sum"
-        }).reset_index().to_dict(orient="records")
+        return aggregate(df, ["audience_type"]).reset_index().to_dict(orient="records")
+
+    def summarize_metric_cube(self, df):
+        """
+        (dimension, value, date) prefix-sum cube for O(1) window lookups.
+        Used by EvaluatorAgent for statistical tests; not sent to the LLM.
+        """
+        return MetricCube.from_dataframe(df)
 
     def get_low_ctr_ads(self, df):
         threshold = self.thresholds["low_ctr"]
@@ -72,18 +152,71 @@ class DataAgent:
 
         return low_ctr_df.to_dict(orient="records")
 
-    def build_summary(self):
-        df = self.load_data()
+    def _resolve_filters(self, df, texts):
+        """
+        Segment values named in the user query, per dimension. A dimension is
+        filtered only when two or more of its values are named (an explicit
+        comparison set); a single name keeps the rest as the baseline.
+        """
+        folded, exact = {}, {}
+        for dim in FILTER_DIMENSIONS:
+            if dim in df.columns:
+                for v in df[dim].dropna().unique():
+                    v = str(v)
+                    (exact if len(v) <= 3 else folded)[(dim, v)] = [v]
+        matcher = MultiPatternMatcher(folded, exact)
+
+        named = {}
+        for text in texts:
+            for (dim, value), _ in matcher.scan(text):
+                if value not in named.setdefault(dim, []):
+                    named[dim].append(value)
+        return {dim: values for dim, values in named.items() if len(values) >= 2}
+
+    def apply_plan(self, df, plan):
+        """Date window and segment filters of a DataPlan; records resolved filters on the plan."""
+        if plan.window_days and df["date"].notna().any():
+            start = df["date"].max() - pd.Timedelta(days=plan.window_days - 1)
+            df = df[df["date"] >= start]
+
+        plan.filters = self._resolve_filters(df, plan.texts) if plan.texts else {}
+        for dim, values in plan.filters.items():
+            df = df[df[dim].astype(str).isin(values)]
+        return df
+
+    def build_summary(self, plan=None):
+        """
+        plan: DataPlan from query_plan.compile_plan(); None computes every
+        summary over all history.
+        """
+        plan = plan or full_plan()
+        df = self.apply_plan(self.load_data(), plan)
 
         summary = {
             "dataset_info": {
                 "rows": len(df),
-                "columns": list(df.columns)
+                "columns": list(df.columns),
+                "data_plan": plan.describe(),
             },
-            "daily_summary": self.summarize_daily(df),
-            "creative_summary": self.summarize_by_creative(df),
-            "audience_summary": self.summarize_by_audience(df),
-            "low_ctr_ads": self.get_low_ctr_ads(df)
         }
-
+        for op in plan.ops:
+            records = getattr(self, op.method)(df)
+            if plan.metrics and op.kind in PROJECTABLE:
+                dropped = set(RATIO_METRICS) - set(plan.metrics)
+                records = [{k: v for k, v in r.items() if k not in dropped} for r in records]
+            if self.sampling and op.group_by:
+                records = self._attach_intervals(records, df, op.group_by)
+            summary[op.summary_key] = records
+
+        summary["metric_cube"] = self.summarize_metric_cube(df)
+
+        if self.sampling:
+            summary["sampling"] = {k: v for k, v in self.sampling.items() if k != "population"}
+            # Whole-period intervals per segment, read by EvaluatorAgent
+            summary["segment_intervals"] = {TOTAL: {"all": self._intervals(df, []).get((), {})}}
+            for dim in DIMENSIONS:
+                if dim in df.columns:
+                    summary["segment_intervals"][dim] = {
+                        str(key[0]): bounds for key, bounds in self._intervals(df, [dim]).items()
+                    }
         return summary
@@ -3,13 +3,73 @@ src/agents/evaluator_agent.py
 
 Evaluator Agent:
 - Validates hypotheses from InsightAgent using actual numbers.
+- Routes each hypothesis through a declarative rule table. Keywords,
+  metric names and segment names are compiled into one multi-pattern
+  matcher, so each reason is scanned once.
+- Tests the full daily time series (trend slope, change point, rolling
+  windows), not just the last two days. Hypotheses are grouped by rule and
+  each group is tested in one NumPy-vectorized call.
+- Reads segment series and window aggregates from DataAgent's MetricCube,
+  so hypotheses naming a campaign, adset, country, audience or creative
+  type are checked against that segment in O(1) lookups.
 - Adds a 'validated' field: true/false
-- Adds numeric evidence
-- Produces a confidence score based on strength of numeric match.
+- Adds numeric evidence, p-value and effect size. Change points are
+  corrected for the split search and the supporting-segment scan for the
+  number of segments; a series too short to test is not validated.
+- Produces a confidence score from effect size and p-value.
+- In sample mode, a comparison whose segments' confidence intervals
+  overlap is reported as inconclusive rather than validated. Trend tests
+  need no adjustment: day-to-day variance already includes sampling noise.
 """
 
+import weakref
+
 import yaml
-import statistics
+import numpy as np
+
+from src.utils import stats
+from src.utils.helpers import safe_number
+from src.utils.metric_cube import TOTAL
+from src.utils.pattern_matcher import MultiPatternMatcher
+
+
+METRICS = ("ctr", "roas", "spend", "cpc", "cpm", "cvr")
+
+KEYWORDS = {
+    "ctr": ["ctr", "click-through rate", "click through rate", "clickthrough rate"],
+    "roas": ["roas", "return on ad spend"],
+    "spend": ["spend", "spending", "budget"],
+    "cpc": ["cpc", "cost per click"],
+    "cpm": ["cpm", "cost per mille", "cost per thousand impressions"],
+    "cvr": ["cvr", "conversion rate"],
+    "drop": ["drop", "drops", "dropped", "dropping", "decline", "declines", "declined", "declining",
+             "decrease", "decreased", "decreasing", "fell", "fall", "falling", "dip", "dipped",
+             "worsened", "deteriorated"],
+    "rise": ["rise", "rises", "rose", "rising", "increase", "increases", "increased", "increasing",
+             "spike", "spiked", "spiking", "grew", "surge", "surged", "improved"],
+    "worse": ["underperform", "underperforms", "underperformed", "worse", "weaker", "lags", "lagged", "below",
+              "lower than"],
+    "audience": ["audience", "audiences"],
+    "video": ["video", "videos"],
+    "image": ["image", "images"],
+}
+
+# Declarative routing table. A hypothesis matches every rule whose
+# `requires` features it has; the lowest `priority` decides the check and
+# all matches are reported. Features are keyword labels plus:
+#   metric - a metric name was found (defaults to ctr otherwise)
+#   pair   - two named segments of the same dimension were found
+#   drop / rise - the direction word nearest the first metric
+RULES = [
+    {"name": "segment_comparison", "requires": ["pair"], "check": "compare", "priority": 1},
+    {"name": "metric_drop", "requires": ["metric", "drop"], "check": "trend", "direction": -1, "priority": 2},
+    {"name": "metric_rise", "requires": ["metric", "rise"], "check": "trend", "direction": 1, "priority": 2},
+    {"name": "audience_spread", "requires": ["audience"], "check": "anova", "dimension": "audience_type", "priority": 3},
+    {"name": "video_vs_image", "requires": ["video", "image"], "check": "aggregate_compare", "priority": 4},
+]
+
+NO_CHECK = {"validated": False, "direction_ok": False, "numeric_support": None,
+            "p_value": None, "effect_size": None, "statistics": None}
 
 
 class EvaluatorAgent:
@@ -19,15 +79,401 @@ class EvaluatorAgent:
 
         self.thresholds = self.config["thresholds"]
 
-    def _get_latest_ctr_change(self, daily_summary):
-        if len(daily_summary) < 2:
-            return 0
-        return daily_summary[-1]["ctr"] - daily_summary[-2]["ctr"]
+        eval_cfg = self.config.get("evaluation", {})
+        self.alpha = eval_cfg.get("alpha", 0.05)
+        self.window = eval_cfg.get("window", 7)
+        self.min_points = eval_cfg.get("min_points", 3)
+        self.max_segments = eval_cfg.get("max_segments", 5)
+
+        self.rules = sorted(RULES, key=lambda r: r["priority"])
+        # Weak keys: an entry goes away with its cube, so a recycled id()
+        # can never hand back a stale matcher
+        self._matchers = weakref.WeakKeyDictionary()
+        self._keyword_matcher = None
+
+    # -------------------------------------------------------------------
+    # ROUTING
+    # -------------------------------------------------------------------
+
+    def _matcher_for(self, cube):
+        """Keywords + every segment name of this cube, compiled once per cube."""
+        if cube is None:
+            if self._keyword_matcher is None:
+                self._keyword_matcher = MultiPatternMatcher(KEYWORDS)
+            return self._keyword_matcher
+
+        matcher = self._matchers.get(cube)
+        if matcher is None:
+            folded, exact = cube.entity_phrases()
+            matcher = MultiPatternMatcher({**KEYWORDS, **folded}, exact)
+            self._matchers[cube] = matcher
+        return matcher
+
+    def _route(self, hyp, matcher):
+        hits = matcher.scan(hyp.get("reason") or "")
+
+        keywords = {label for label, _ in hits if isinstance(label, str)}
+        entities = []
+        for label, _ in hits:
+            if isinstance(label, tuple) and label[1:] not in entities:
+                entities.append(label[1:])
+
+        metric_hits = [(label, pos) for label, pos in hits if label in METRICS]
+        metric, metric_pos = metric_hits[0] if metric_hits else ("ctr", 0)
+
+        features = set(keywords) - {"drop", "rise"}
+        if metric_hits:
+            features.add("metric")
+        direction_hits = [(abs(pos - metric_pos), label) for label, pos in hits if label in ("drop", "rise")]
+        if direction_hits:
+            features.add(min(direction_hits)[1])
+
+        pair = next(
+            ((a, b) for i, a in enumerate(entities) for b in entities[i + 1:] if a[0] == b[0]),
+            None,
+        )
+        if pair:
+            features.add("pair")
+        # Which of video / image the text names first
+        lead = next((label for label, _ in hits if label in ("video", "image")), None)
+
+        matched = [r for r in self.rules if all(req in features for req in r["requires"])]
+        return {
+            "rule": matched[0] if matched else None,
+            "matched_rules": [r["name"] for r in matched],
+            "metric": metric,
+            "entities": entities,
+            "pair": pair,
+            "lead": lead,
+            # Pair order follows the text; "underperforms"/"worse" flips the claim
+            "claim": -1 if "worse" in keywords else 1,
+        }
+
+    # -------------------------------------------------------------------
+    # SERIES TESTS
+    # -------------------------------------------------------------------
+
+    def _daily_series(self, summary, metric):
+        cube = summary.get("metric_cube")
+        if cube is not None:
+            return cube.daily(TOTAL, metric), cube.date_strings()
+        daily = summary.get("daily_summary", [])
+        values = [row.get(metric) for row in daily]
+        series = np.array([[np.nan if v is None else v for v in values]], dtype=float)
+        return series, [str(row.get("date")) for row in daily]
+
+    def _test_series(self, x, direction):
+        """
+        Trend, change-point and rolling-window tests on every row of x.
+
+        direction: -1 for a hypothesised drop, +1 for a rise.
+        Returns a dict of per-row arrays.
+        """
+        days = x.shape[1]
+        min_size = max(1, min(self.min_points, days // 2))
+
+        tr = stats.trend(x)
+        cp = stats.change_point(x, min_size=min_size)
+        win = stats.window_compare(x, self.window)
+
+        # The change point is the primary test (its p already covers the split
+        # search). The trend only counts when it agrees with the hypothesis;
+        # Bonferroni covers taking the smaller of the two p-values.
+        trend_p = np.where(np.sign(tr["slope"]) == direction, tr["p"], np.nan)
+        with np.errstate(invalid="ignore"):
+            p = np.fmin(cp["p"], trend_p)
+            p = np.where(np.isfinite(p), np.minimum(1.0, 2 * p), np.nan)
+
+        direction_ok = np.sign(cp["effect"]) == direction
+        # No p-value (too few days) means insufficient data, not support
+        validated = direction_ok & np.isfinite(p) & (p <= self.alpha)
+
+        return {
+            "validated": validated,
+            "direction_ok": direction_ok,
+            "effect": cp["effect"],
+            "p": p,
+            "d": cp["d"],
+            "change_index": cp["index"],
+            "before": cp["before"],
+            "after": cp["after"],
+            "slope": tr["slope"],
+            "slope_p": tr["p"],
+            "window_prior": win["prior"],
+            "window_recent": win["recent"],
+            "splits": cp["splits"],
+        }
+
+    def _confidence(self, llm_conf, validated, direction_ok, p, d):
+        """Blend the LLM's confidence with statistical evidence strength."""
+        if p is None or not np.isfinite(p):
+            return llm_conf
+
+        size = min(1.0, abs(d) / 0.8) if d is not None and np.isfinite(d) else 0.5
+        strength = (1.0 - p) * size
+
+        if validated:
+            return llm_conf + (1.0 - llm_conf) * strength
+        if not direction_ok:
+            return llm_conf * (1.0 - strength)
+        return llm_conf
+
+    # -------------------------------------------------------------------
+    # BATCHED CHECKS (one vectorized call per group)
+    # -------------------------------------------------------------------
+
+    def _batch_trend(self, summary, keys):
+        """
+        keys: set of (metric, direction, segment or None).
+        For each (metric, direction) the requested series and, for account-level
+        requests, every segment of every dimension are stacked into one matrix.
+        """
+        cube = summary.get("metric_cube")
+        results = {}
+
+        groups = {}
+        for metric, direction, segment in keys:
+            groups.setdefault((metric, direction), []).append(segment)
+
+        for (metric, direction), segments in groups.items():
+            total, dates = self._daily_series(summary, metric)
+            rows = [total if seg is None else cube.daily(seg[0], metric, [seg[1]]) for seg in segments]
+
+            scan_labels = []
+            if cube is not None and None in segments:
+                for dim in cube.values:
+                    if dim != TOTAL:
+                        rows.append(cube.daily(dim, metric))
+                        scan_labels.extend((dim, v) for v in cube.values[dim])
+
+            res = self._test_series(np.vstack(rows), direction)
+
+            # Every segment was scanned: Holm-correct across the scan
+            support = []
+            offset = len(segments)
+            scan_p = stats.holm(res["p"][offset:])
+            with np.errstate(invalid="ignore"):
+                significant = res["direction_ok"][offset:] & (scan_p <= self.alpha)
+            for i in np.flatnonzero(significant):
+                support.append({
+                    "dimension": scan_labels[i][0],
+                    "value": scan_labels[i][1],
+                    "effect": safe_number(res["effect"][offset + i], 6),
+                    "p_value": safe_number(scan_p[i], 6),
+                })
+            support.sort(key=lambda s: (s["p_value"], -abs(s["effect"] or 0)))
+
+            for i, seg in enumerate(segments):
+                change_date = None
+                if len(dates) >= 2 and np.isfinite(res["effect"][i]):
+                    change_date = dates[int(res["change_index"][i])]
+
+                statistics = {
+                    "test": "change_point+trend",
+                    "segment": {"dimension": seg[0], "value": seg[1]} if seg else None,
+                    "change_date": change_date,
+                    "mean_before": safe_number(res["before"][i], 6),
+                    "mean_after": safe_number(res["after"][i], 6),
+                    "slope_per_day": safe_number(res["slope"][i], 8),
+                    "slope_p_value": safe_number(res["slope_p"][i], 6),
+                    "rolling_prior_mean": safe_number(res["window_prior"][i], 6),
+                    "rolling_recent_mean": safe_number(res["window_recent"][i], 6),
+                    "splits_tested": int(res["splits"][i]),
+                    "insufficient_data": not np.isfinite(res["p"][i]),
+                }
+                if seg is None:
+                    statistics["segments"] = support[: self.max_segments]
+
+                results[(metric, direction, seg)] = {
+                    "validated": bool(res["validated"][i]),
+                    "direction_ok": bool(res["direction_ok"][i]),
+                    "numeric_support": safe_number(res["effect"][i], 6),
+                    "p_value": safe_number(res["p"][i], 6),
+                    "effect_size": safe_number(res["d"][i], 3),
+                    "statistics": statistics,
+                }
+
+        return results
+
+    def _batch_compare(self, summary, keys):
+        """keys: set of (metric, a, b) named segment pairs; paired t-tests per metric."""
+        cube = summary["metric_cube"]
+        results = {}
+
+        groups = {}
+        for metric, a, b in keys:
+            groups.setdefault(metric, []).append((a, b))
+
+        for metric, pairs in groups.items():
+            diff = np.vstack([
+                cube.daily(a[0], metric, [a[1]]) - cube.daily(b[0], metric, [b[1]]) for a, b in pairs
+            ])
+            res = stats.paired_difference(diff, 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"), stats.quiet_nan():
+                d = res["mean"] / np.nanstd(diff, axis=1, ddof=1)
+
+            for i, (a, b) in enumerate(pairs):
+                totals = {v: cube.window(dim, v) for dim, v in (a, b)}
+                statistics = {
+                    "test": f"paired_t({a[1]} - {b[1]})",
+                    "dimension": a[0],
+                    "days": int(res["n"][i]),
+                    "period_totals": {
+                        v: {"ctr": safe_number(t["ctr"], 6), "roas": safe_number(t["roas"], 6), "spend": safe_number(t["spend"], 2)}
+                        for v, t in totals.items()
+                    },
+                }
+                intervals = self._sample_intervals(summary, metric, (a, b))
+                if intervals is not None:
+                    statistics["sample_intervals"] = intervals
+                    statistics["sampling_inconclusive"] = self._overlap(list(intervals.values()))
+
+                results[(metric, a, b)] = {
+                    "mean": res["mean"][i],
+                    "p": res["p"][i],
+                    "d": d[i],
+                    "statistics": statistics,
+                }
 
-    def _get_latest_roas_change(self, daily_summary):
-        if len(daily_summary) < 2:
-            return 0
-        return daily_summary[-1]["roas"] - daily_summary[-2]["roas"]
+        return results
+
+    @staticmethod
+    def _overlap(intervals):
+        """True if every pair of [lo, hi] intervals overlaps (no separation)."""
+        if len(intervals) < 2 or any(i is None for i in intervals):
+            return False
+        return max(lo for lo, _ in intervals) <= min(hi for _, hi in intervals)
+
+    def _sample_intervals(self, summary, metric, segments):
+        """{segment: [lo, hi]} from sample-mode segment_intervals, or None in full mode."""
+        known = summary.get("segment_intervals")
+        if not known:
+            return None
+        return {v: known.get(dim, {}).get(v, {}).get(metric) for dim, v in segments}
+
+    def _check_anova(self, summary, dimension, metric):
+        """Across every segment of a dimension: one-way ANOVA over daily values."""
+        cube = summary.get("metric_cube")
+        if cube is not None and len(cube.values.get(dimension, [])) >= 2:
+            values = cube.values[dimension]
+            matrix = cube.daily(dimension, metric)
+            with stats.quiet_nan():
+                means = np.nanmean(matrix, axis=1)
+            # e.g. cvr with no clicks or roas with no spend in any segment
+            if np.isfinite(means).sum() < 2:
+                return {**NO_CHECK, "direction_ok": True,
+                        "statistics": {"test": "one_way_anova", "insufficient_data": True}}
+            f, p = stats.one_way_anova(matrix)
+            with stats.quiet_nan():
+                spread = np.nanmax(means) - np.nanmin(means)
+                d = spread / np.nanstd(matrix - means[:, None], ddof=1)
+            return {
+                "validated": bool(np.isfinite(p) and p <= self.alpha),
+                "direction_ok": True,
+                "numeric_support": safe_number(spread, 6),
+                "p_value": safe_number(p, 6),
+                "effect_size": safe_number(d, 3),
+                "statistics": {
+                    "test": "one_way_anova",
+                    "f_statistic": safe_number(f, 4),
+                    "best": values[int(np.nanargmax(means))],
+                    "worst": values[int(np.nanargmin(means))],
+                },
+            }
+
+        # Without daily data there is nothing to test; report the spread only
+        values = [x[metric] for x in summary.get("audience_summary", []) if x.get(metric) is not None]
+        return {
+            "validated": False,
+            "direction_ok": True,
+            "numeric_support": safe_number(max(values) - min(values), 6) if len(values) >= 2 else None,
+            "p_value": None,
+            "effect_size": None,
+            "statistics": {"test": "none (no daily data)"},
+        }
+
+    def _check_aggregate_compare(self, summary, route):
+        """Video vs image from the aggregate rows (no daily breakdown available)."""
+        metric = route["metric"]
+        creative = summary.get("creative_type_summary") or summary.get("creative_summary", [])
+        # Difference in text order, like the pair comparison: "image beats video" is image - video
+        first, second = ("image", "video") if route["lead"] == "image" else ("video", "image")
+        try:
+            a = next(x for x in creative if x["creative_type"].lower() == first)
+            b = next(x for x in creative if x["creative_type"].lower() == second)
+            diff = a[metric] - b[metric]
+        except (StopIteration, KeyError, AttributeError):
+            return NO_CHECK
+        direction_ok = bool(np.sign(diff) == route["claim"])
+        statistics = {"test": f"aggregate difference ({first} - {second})"}
+
+        intervals = [a.get(f"{metric}_ci"), b.get(f"{metric}_ci")]
+        inconclusive = False
+        if all(intervals):
+            inconclusive = self._overlap(intervals)
+            statistics["sample_intervals"] = {first: intervals[0], second: intervals[1]}
+            statistics["sampling_inconclusive"] = inconclusive
+
+        return {
+            "validated": direction_ok and not inconclusive,
+            "direction_ok": direction_ok,
+            "numeric_support": safe_number(diff, 6),
+            "p_value": None,
+            "effect_size": None,
+            "statistics": statistics,
+        }
+
+    def _run_checks(self, routes, summary):
+        """Group routed hypotheses by check, run each group once, fan results back out."""
+        trend_keys, compare_keys, anova_keys = set(), set(), set()
+        for r in routes:
+            rule = r["rule"]
+            if rule is None:
+                continue
+            if rule["check"] == "trend":
+                segment = r["entities"][0] if r["entities"] else None
+                r["key"] = (r["metric"], rule["direction"], segment)
+                trend_keys.add(r["key"])
+            elif rule["check"] == "compare":
+                r["key"] = (r["metric"], *r["pair"])
+                compare_keys.add(r["key"])
+            elif rule["check"] == "anova":
+                r["key"] = (rule["dimension"], r["metric"])
+                anova_keys.add(r["key"])
+
+        trend = self._batch_trend(summary, trend_keys) if trend_keys else {}
+        compare = self._batch_compare(summary, compare_keys) if compare_keys else {}
+        anova = {key: self._check_anova(summary, *key) for key in anova_keys}
+
+        checks = []
+        for r in routes:
+            rule = r["rule"]
+            if rule is None:
+                checks.append(NO_CHECK)
+            elif rule["check"] == "trend":
+                checks.append(trend[r["key"]])
+            elif rule["check"] == "anova":
+                checks.append(anova[r["key"]])
+            elif rule["check"] == "compare":
+                res = compare[r["key"]]
+                direction_ok = bool(np.sign(res["mean"]) == r["claim"])
+                significant = bool(np.isfinite(res["p"]) and res["p"] <= self.alpha)
+                inconclusive = res["statistics"].get("sampling_inconclusive", False)
+                checks.append({
+                    "validated": bool(direction_ok and significant and not inconclusive),
+                    "direction_ok": direction_ok,
+                    "numeric_support": safe_number(res["mean"], 6),
+                    "p_value": safe_number(res["p"], 6),
+                    "effect_size": safe_number(res["d"], 3),
+                    "statistics": res["statistics"],
+                })
+            else:
+                checks.append(self._check_aggregate_compare(summary, r))
+        return checks
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
 
     def validate(self, hypotheses: dict, summary: dict) -> dict:
         """
@@ -35,74 +481,46 @@ class EvaluatorAgent:
         Adds:
         - validated: True/False
         - numeric_support
+        - p_value / effect_size / statistics
+        - rule / matched_rules
+        - routed_metric: the metric the check tested (None when no rule applied)
         - final_confidence
         """
-        
+
         # Preserve error if present
         result = {}
         if "__error" in hypotheses:
             result["__error"] = hypotheses["__error"]
 
-        daily = summary["daily_summary"]
-        creative = summary["creative_summary"]
-        audience = summary["audience_summary"]
-
-        ctr_change = self._get_latest_ctr_change(daily)
-        roas_change = self._get_latest_roas_change(daily)
+        items = hypotheses.get("hypotheses", [])
+        matcher = self._matcher_for(summary.get("metric_cube"))
+        routes = [self._route(hyp, matcher) for hyp in items]
+        checks = self._run_checks(routes, summary)
 
         validated_hypotheses = []
-
-        for hyp in hypotheses.get("hypotheses", []):
-            reason = hyp.get("reason", "").lower()
-
-            validated = False
-            numeric_support = None
-
-            # CTR drop check
-            if "ctr" in reason and "drop" in reason:
-                numeric_support = ctr_change
-                validated = ctr_change < 0
-
-            # ROAS drop check
-            if "roas" in reason and "drop" in reason:
-                numeric_support = roas_change
-                validated = roas_change < 0
-
-            # creative type comparison check
-            if "video" in reason and "image" in reason:
-                try:
-                    video_ctr = next(x for x in creative if x["creative_type"].lower() == "video")["ctr"]
-                    image_ctr = next(x for x in creative if x["creative_type"].lower() == "image")["ctr"]
-                    numeric_support = video_ctr - image_ctr
-                    validated = video_ctr > image_ctr
-                except:
-                    pass
-
-            # audience performance check
-            if "audience" in reason:
-                # simple validation: look for bigger CTR difference
-                try:
-                    ctrs = [x["ctr"] for x in audience]
-                    mean_ctr = statistics.mean(ctrs)
-                    numeric_support = mean_ctr
-                    validated = True  # soft validation
-                except:
-                    pass
-
-            # final confidence: combine numeric support + LLM confidence
+        for hyp, route, check in zip(items, routes, checks):
             llm_conf = hyp.get("confidence", 0.5)
-            if numeric_support is not None:
-                final_conf = min(1.0, llm_conf + 0.2)
-            else:
-                final_conf = llm_conf
+            final_conf = self._confidence(
+                llm_conf,
+                check["validated"],
+                check["direction_ok"],
+                check["p_value"],
+                check["effect_size"],
+            )
 
             validated_hypotheses.append({
                 "reason": hyp.get("reason"),
                 "evidence": hyp.get("evidence"),
                 "metric": hyp.get("metric"),
-                "validated": validated,
-                "numeric_support": numeric_support,
-                "final_confidence": round(final_conf, 3)
+                "validated": check["validated"],
+                "numeric_support": check["numeric_support"],
+                "p_value": check["p_value"],
+                "effect_size": check["effect_size"],
+                "statistics": check["statistics"],
+                "rule": route["rule"]["name"] if route["rule"] else None,
+                "matched_rules": route["matched_rules"],
+                "routed_metric": route["metric"] if route["rule"] else None,
+                "final_confidence": round(min(1.0, max(0.0, final_conf)), 3)
             })
 
         result["validated_hypotheses"] = validated_hypotheses
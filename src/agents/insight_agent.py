@@ -3,6 +3,8 @@ src/agents/insight_agent.py
 
 Insight Agent:
 - Receives the data summary from DataAgent
+- When AnomalyAgent has run, sends only the flagged segments to the LLM,
+  and skips the LLM call entirely when nothing was flagged
 - Calls LLM to analyze trends
 - Produces hypotheses explaining ROAS changes, CTR shifts, and creative/audience performance
 - Returns strictly JSON
@@ -12,12 +14,16 @@ import yaml
 from src.utils.llm_client import MultiLLM
 
 class InsightAgent:
-    def __init__(self, config_path="config/config.yaml"):
+    NON_PROMPT_KEYS = {"metric_cube", "segment_intervals"}
+    # Context kept alongside the flagged segments when anomalies are present
+    ANOMALY_CONTEXT_KEYS = ("dataset_info", "sampling")
+
+    def __init__(self, config_path="config/config.yaml", llm=None):
         with open(config_path, "r") as f:
             self.config = yaml.safe_load(f)
 
         # FIXED: MultiLLM takes NO arguments
-        self.llm = MultiLLM()
+        self.llm = llm if llm is not None else MultiLLM()
 
     def generate_insights(self, summary: dict) -> dict:
 
@@ -26,10 +32,22 @@ class InsightAgent:
             "Return ONLY JSON. No text outside JSON."
         )
 
-        summary_text = str(summary)
+        anomalies = summary.get("anomalies")
+        if anomalies is not None:
+            if not anomalies.get("flagged"):
+                return {"hypotheses": [], "skipped": "No anomalies flagged; LLM not called"}
+            prompt_data = {k: summary[k] for k in self.ANOMALY_CONTEXT_KEYS if k in summary}
+            prompt_data["anomalies"] = anomalies
+            intro = "Explain the following flagged Facebook Ads anomalies (recent window vs the window before it):"
+        else:
+            # Evidence-only sections (large matrices) stay out of the prompt
+            prompt_data = {k: v for k, v in summary.items() if k not in self.NON_PROMPT_KEYS}
+            intro = "Analyze the following Facebook Ads summary data:"
+
+        summary_text = str(prompt_data)
 
         user_prompt = f"""
-Analyze the following Facebook Ads summary data:
+{intro}
 
 {summary_text}
 
@@ -16,12 +16,12 @@ from src.utils.llm_client import MultiLLM
 import yaml
 
 class PlannerAgent:
-    def __init__(self, config_path="config/config.yaml"):
+    def __init__(self, config_path="config/config.yaml", llm=None):
         with open(config_path, "r") as fh:
             self.config = yaml.safe_load(fh)
 
         # FIXED: MultiLLM takes NO arguments
-        self.llm = MultiLLM()
+        self.llm = llm if llm is not None else MultiLLM()
 
     def plan(self, user_query: str) -> dict:
 
@@ -0,0 +1,259 @@
+"""
+src/orchestrator/multi_account.py
+
+Runs the pipeline for many ad accounts, sharded across a process pool.
+
+- Each worker process builds one Orchestrator (LLM client, embedding model,
+  history connection) when it starts and reuses it for every account it is
+  given, so warm-up is paid once per process instead of once per account
+- Every LLM HTTP request, from any process, draws from one SharedTokenBucket
+  sized by llm.rate_per_sec; it replaces the per-process limiter
+- Each account writes its reports and logs to <output_dir>/<account>/ and
+  is recorded in the shared history store under its own account label
+- A failing account is reported and does not stop the others
+- <output_dir>/summary.json lists per-account results plus throughput
+
+Manifest (YAML or JSON):
+    query: "Analyze ROAS drop"            # default query
+    accounts:
+      - account: acme
+        data: data/acme.csv
+      - account: globex
+        data: data/globex.csv
+        query: "Why did CTR fall?"        # per-account override
+
+Usage:
+    python -m src.orchestrator.multi_account accounts.yaml [--processes 4] [--output-dir reports/accounts]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import yaml
+
+from src.orchestrator.orchestrator import Orchestrator
+from src.utils.llm_client import MultiLLM
+from src.utils.rate_limiter import SharedTokenBucket
+
+
+# Per-process Orchestrator, built once by _init_worker
+_orchestrator = None
+
+
+def _init_worker(config_path, rate_limiter, llm_factory):
+    global _orchestrator
+    llm = (llm_factory or MultiLLM)(rate_limiter=rate_limiter)
+    _orchestrator = Orchestrator(config_path, llm=llm)
+
+
+def _run_account(job):
+    orchestrator = _orchestrator
+    start = time.perf_counter()
+    result = {
+        "account": job["account"],
+        "run_id": job["run_id"],
+        "reports_dir": job["reports_dir"],
+        "pid": os.getpid(),
+    }
+    calls_before = getattr(orchestrator.llm, "calls", None)
+
+    try:
+        orchestrator.use_account(
+            job["account"], job["data"], job["reports_dir"], os.path.join(job["reports_dir"], "logs")
+        )
+        orchestrator.last_run = None
+        events = orchestrator.run(job["query"], run_id=job["run_id"])
+        result["status"] = "ok"
+        result["failed_steps"] = [e["step"] for e in events if e["status"] == "failed"]
+        result.update({k: v for k, v in (orchestrator.last_run or {}).items() if k != "run_id"})
+    except Exception as e:
+        print(f"[MULTI_ACCOUNT] {job['account']} failed: {e}")
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    if calls_before is not None:
+        result["llm_calls"] = orchestrator.llm.calls - calls_before
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def account_slug(account) -> str:
+    """Directory and run_id suffix for an account label."""
+    return re.sub(r"[^\w.-]+", "_", str(account))
+
+
+def load_manifest(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return validate_manifest(yaml.safe_load(f) or {}, path)
+
+
+def validate_manifest(manifest, source="manifest") -> dict:
+    if isinstance(manifest, list):
+        manifest = {"accounts": manifest}
+
+    accounts = manifest.get("accounts") or []
+    labels = [a.get("account") for a in accounts]
+    if not accounts or not all(labels):
+        raise ValueError(f"{source} must list accounts, each with an 'account' label")
+    duplicates = sorted({a for a in labels if labels.count(a) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate accounts in {source}: {duplicates}")
+
+    # Distinct labels can share a slug ("acct 1", "acct_1") and so a reports directory
+    by_slug = {}
+    for label in labels:
+        by_slug.setdefault(account_slug(label), []).append(str(label))
+    collisions = {slug: names for slug, names in by_slug.items() if len(names) > 1}
+    if collisions:
+        raise ValueError(f"Accounts in {source} map to the same directory: {collisions}")
+    return manifest
+
+
+class MultiAccountRunner:
+    def __init__(self, config_path="config/config.yaml", processes=None, output_dir=None, llm_factory=None):
+        """
+        processes:   worker processes (None = config, then min(accounts, CPU count))
+        output_dir:  parent of the per-account report directories
+        llm_factory: callable(rate_limiter=...) -> LLM client; defaults to MultiLLM.
+                     Must be importable by name in the worker processes.
+        """
+        with open(config_path, "r") as f:
+            self.config = yaml.safe_load(f)
+        cfg = self.config.get("multi_account", {})
+
+        self.config_path = config_path
+        self.processes = processes or cfg.get("processes")
+        self.output_dir = output_dir or cfg.get("output_dir") or os.path.join(
+            self.config["paths"]["reports"], "accounts"
+        )
+        llm_cfg = self.config.get("llm", {})
+        self.llm_rate = llm_cfg.get("rate_per_sec", 2.0)
+        self.llm_burst = llm_cfg.get("burst")
+        self.llm_factory = llm_factory
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _jobs(self, manifest):
+        default_query = manifest.get("query") or "Analyze ROAS drop"
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        jobs = []
+        for entry in manifest["accounts"]:
+            account = str(entry["account"])
+            slug = account_slug(account)
+            jobs.append({
+                "account": account,
+                "data": entry.get("data") or self.config["paths"]["data"],
+                "query": entry.get("query") or default_query,
+                # Unique per account, so each run has its own log index entry
+                "run_id": f"{stamp}-{slug}",
+                "reports_dir": os.path.join(self.output_dir, slug),
+            })
+        return jobs
+
+    @staticmethod
+    def _throughput(results, processes, seconds, llm_rate):
+        ok = [r for r in results if r["status"] == "ok"]
+        rows = sum(r.get("rows") or 0 for r in ok)
+        calls = [r["llm_calls"] for r in results if r.get("llm_calls") is not None]
+        return {
+            "accounts": len(results),
+            "succeeded": len(ok),
+            "failed": len(results) - len(ok),
+            "processes": processes,
+            "wall_seconds": round(seconds, 3),
+            "accounts_per_minute": round(len(ok) / seconds * 60, 2) if seconds > 0 else None,
+            "rows_processed": rows,
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+            "llm_calls": sum(calls) if calls else None,
+            "llm_rate_limit_per_sec": llm_rate,
+            "account_seconds": {
+                "mean": round(sum(r["seconds"] for r in results) / len(results), 3) if results else None,
+                "max": max((r["seconds"] for r in results), default=None),
+            },
+            "accounts_per_process": {
+                str(pid): sum(1 for r in results if r.get("pid") == pid)
+                for pid in sorted({r["pid"] for r in results if r.get("pid")})
+            },
+            "failures": [
+                {"account": r["account"], "error": r.get("error")} for r in results if r["status"] != "ok"
+            ],
+        }
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def run(self, manifest) -> dict:
+        """manifest: dict or path to a manifest file. Returns the summary written to summary.json."""
+        manifest = validate_manifest(manifest) if isinstance(manifest, (dict, list)) else load_manifest(manifest)
+        jobs = self._jobs(manifest)
+        processes = max(1, min(len(jobs), self.processes or os.cpu_count() or 1))
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        ctx = multiprocessing.get_context()
+        limiter = SharedTokenBucket(self.llm_rate, self.llm_burst, ctx=ctx)
+        print(f"[MULTI_ACCOUNT] {len(jobs)} accounts on {processes} processes")
+
+        start = time.perf_counter()
+        results = {}
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(self.config_path, limiter, self.llm_factory),
+        ) as pool:
+            futures = {pool.submit(_run_account, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Worker start-up failed or the process died
+                    result = {
+                        "account": job["account"],
+                        "run_id": job["run_id"],
+                        "reports_dir": job["reports_dir"],
+                        "status": "failed",
+                        "error": f"{type(e).__name__}: {e}",
+                        "seconds": 0.0,
+                    }
+                results[job["account"]] = result
+                print(f"[MULTI_ACCOUNT] {job['account']}: {result['status']} ({result['seconds']}s)")
+        seconds = time.perf_counter() - start
+
+        ordered = [results[job["account"]] for job in jobs]
+        summary = {
+            "throughput": self._throughput(ordered, processes, seconds, self.llm_rate),
+            "results": ordered,
+        }
+        path = os.path.join(self.output_dir, "summary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=str)
+        summary["path"] = path
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the analyst for every account in a manifest.")
+    parser.add_argument("manifest", help="YAML/JSON file listing accounts and their datasets")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+
+    runner = MultiAccountRunner(args.config, processes=args.processes, output_dir=args.output_dir)
+    summary = runner.run(args.manifest)
+    print(json.dumps(summary["throughput"], indent=2))
+    print(f"\n📁 Per-account reports and summary.json in: {runner.output_dir}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,64 +3,130 @@ Orchestrator for Kasparro Agentic FB Analyst assignment.
 
 Flow:
 1. PlannerAgent.plan(user_query) -> tasks
-2. DataAgent.build_summary() -> summary
-3. InsightAgent.generate_insights(summary) -> hypotheses
-4. EvaluatorAgent.validate(hypotheses, summary) -> validated_hypotheses
-5. CreativeAgent.generate_creatives(summary) -> creative_suggestions
-6. Save outputs to reports/ and logs/
+2. compile_plan(tasks, query) -> DataAgent.build_summary(data_plan) -> summary
+3. AnomalyAgent.detect(summary) -> flagged segments (summary["anomalies"])
+4. InsightAgent.generate_insights(summary) -> hypotheses for flagged segments
+5. EvaluatorAgent.validate(hypotheses, summary) -> validated_hypotheses
+6. CreativeAgent.generate_creatives(summary) -> creative_suggestions
+7. Save outputs to reports/ and logs/, and record the run in the history store
 
 This orchestrator expects the other agent files and utils to be present.
 """
 
 import json
 import os
+
+import yaml
+from contextlib import nullcontext
 from datetime import datetime
 
 from src.agents.planner_agent import PlannerAgent
 from src.agents.data_agent import DataAgent
+from src.agents.anomaly_agent import AnomalyAgent
 from src.agents.insight_agent import InsightAgent
 from src.agents.evaluator_agent import EvaluatorAgent
 from src.agents.creative_agent import CreativeAgent
+from src.utils.llm_client import MultiLLM
 from src.utils.logger import get_logger
+from src.utils.log_writer import PipelineLogWriter
+from src.utils.history_store import HistoryStore
+from src.utils.query_plan import compile_plan
+from src.utils.rate_limiter import request_limiter
 
 logger = get_logger("orchestrator")
 
 
 class Orchestrator:
-    def __init__(self, config_path="config/config.yaml"):
+    def __init__(self, config_path="config/config.yaml", llm=None):
         self.config_path = config_path
+        with open(config_path, "r") as fh:
+            cfg = yaml.safe_load(fh)
+
+        # One LLM client (and embedding model) shared by every agent; its
+        # limiter paces every HTTP request
+        self.llm = llm if llm is not None else MultiLLM(rate_limiter=request_limiter(cfg))
+
         # Instantiate agents
-        self.planner = PlannerAgent(config_path)
+        self.planner = PlannerAgent(config_path, llm=self.llm)
         self.data_agent = DataAgent(config_path)
-        self.insight_agent = InsightAgent(config_path)
+        self.anomaly_agent = AnomalyAgent(config_path)
+        self.insight_agent = InsightAgent(config_path, llm=self.llm)
         self.evaluator = EvaluatorAgent(config_path)
-        self.creative = CreativeAgent(config_path)
+        self.creative = CreativeAgent(config_path, llm=self.llm)
 
-        # load config to get paths
-        import yaml
-        with open(config_path, "r") as fh:
-            cfg = yaml.safe_load(fh)
         self.reports_dir = cfg["paths"]["reports"]
         self.logs_dir = cfg["paths"]["logs"]
 
         os.makedirs(self.reports_dir, exist_ok=True)
         os.makedirs(self.logs_dir, exist_ok=True)
 
+        # Opened on the first entry of a run and closed when the run ends
+        self.log_cfg = cfg.get("logging", {})
+        self.log_writer = None
+
+        # Cross-run history (SQLite); None disables recording
+        history_cfg = cfg.get("history", {})
+        self.account = cfg.get("settings", {}).get("account", "default")
+        self.history = None
+        if history_cfg.get("enabled", True):
+            self.history = HistoryStore(history_cfg.get("path") or os.path.join(self.logs_dir, "history.sqlite"))
+
         # Local uploaded dataset path (provided by user/tooling)
         # This path can be transformed to a URL by your tooling if needed.
         self.dataset_local_path = cfg["paths"]["data"]
 
+        # Optional StageProfiler (set by `run.py --profile`)
+        self.profiler = None
+
+        # Counts from the latest run (read by the multi-account runner)
+        self.last_run = None
+
+    def _open_log_writer(self, logs_dir):
+        return PipelineLogWriter(
+            logs_dir,
+            batch_size=self.log_cfg.get("batch_size", 50),
+            flush_interval=self.log_cfg.get("flush_interval", 2.0),
+            rotate=self.log_cfg.get("rotate", "size"),
+            max_bytes=self.log_cfg.get("max_bytes", 50 * 1024 * 1024),
+            backup_count=self.log_cfg.get("backup_count"),
+        )
+
+    def use_account(self, account, data_path=None, reports_dir=None, logs_dir=None):
+        """
+        Point this orchestrator at another account's dataset and output
+        directories, keeping the LLM client, agents and history connection warm.
+        """
+        self.account = account
+        if data_path:
+            self.data_agent.data_path = data_path
+            self.dataset_local_path = data_path
+        if reports_dir:
+            self.reports_dir = reports_dir
+            os.makedirs(reports_dir, exist_ok=True)
+        if logs_dir and logs_dir != self.logs_dir:
+            self._close_log_writer()
+            self.logs_dir = logs_dir
+
     def _save_json(self, obj, filename):
         path = os.path.join(self.reports_dir, filename)
         with open(path, "w", encoding="utf-8") as f:
             json.dump(obj, f, indent=2, ensure_ascii=False)
         logger.info(f"Saved {path}")
 
-    def _append_log(self, entry, filename="pipeline_log.json"):
-        path = os.path.join(self.logs_dir, filename)
-        # append entry as a new line in NDJSON style for easy ingestion
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    def _append_log(self, entry):
+        # buffered NDJSON; flushed in batches by the writer's background thread
+        if self.log_writer is None:
+            self.log_writer = self._open_log_writer(self.logs_dir)
+        self.log_writer.write(entry)
+
+    def _close_log_writer(self):
+        """Flush and stop the writer thread; the next run opens a new one."""
+        if self.log_writer is not None:
+            self.log_writer.close()
+            self.log_writer = None
+
+    def _stage(self, name):
+        return self.profiler.stage(name) if self.profiler else nullcontext()
 
     def _save_report_md(self, text, filename="report.md"):
         path = os.path.join(self.reports_dir, filename)
@@ -68,10 +134,23 @@ class Orchestrator:
             f.write(text)
         logger.info(f"Saved {path}")
 
-    def run(self, user_query: str):
-        run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    def run(self, user_query: str, run_id: str = None):
+        # Microseconds keep back-to-back runs apart in the log index and history
+        run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
         logger.info(f"Starting pipeline run {run_id} for query: {user_query}")
 
+        if self.profiler:
+            self.profiler.begin(run_id)
+        try:
+            return self._run_stages(user_query, run_id)
+        finally:
+            # Also when a stage raises: flush logs, stop the sampler / tracemalloc
+            self._close_log_writer()
+            if self.profiler:
+                profile_report = self.profiler.finish()
+                logger.info(f"Profile written to {profile_report}")
+
+    def _run_stages(self, user_query, run_id):
         step_events = []
 
         def record(step: str, status: str, detail: str | None = None):
@@ -87,7 +166,8 @@ class Orchestrator:
         # 1) Planner
         record("planner", "started")
         try:
-            plan = self.planner.plan(user_query)
+            with self._stage("planner"):
+                plan = self.planner.plan(user_query)
             record("planner", "completed", f"{len(plan.get('tasks', []))} tasks")
         except Exception as e:
             logger.exception("Planner failed")
@@ -98,30 +178,59 @@ class Orchestrator:
         # 2) Data Agent: build summary (cleaning handled inside)
         record("data_agent", "started")
         try:
-            summary = self.data_agent.build_summary()
-            record("data_agent", "completed", f"Rows {summary['dataset_info']['rows']}")
+            with self._stage("data_agent"):
+                data_plan = compile_plan(plan, user_query)
+                summary = self.data_agent.build_summary(data_plan)
+            record("data_agent", "completed", f"Rows {summary['dataset_info']['rows']}, operations {data_plan.kinds}")
         except Exception as e:
             logger.exception("DataAgent failed")
             record("data_agent", "failed", str(e))
             raise
 
-        self._append_log({"run_id": run_id, "step": "data_summary", "rows": summary["dataset_info"]["rows"]})
+        self._append_log({
+            "run_id": run_id,
+            "step": "data_summary",
+            "rows": summary["dataset_info"]["rows"],
+            "data_plan": summary["dataset_info"].get("data_plan"),
+            "filters": data_plan.filters,
+        })
+
+        # 3) Anomaly Agent: deterministic thresholds, no LLM
+        record("anomaly_agent", "started")
+        try:
+            with self._stage("anomaly_agent"):
+                anomalies = self.anomaly_agent.detect(summary)
+            summary["anomalies"] = anomalies
+            record("anomaly_agent", "completed", f"{len(anomalies['flagged'])} flagged")
+        except Exception as e:
+            # Without anomalies InsightAgent falls back to the full summary
+            logger.exception("AnomalyAgent failed")
+            anomalies = None
+            record("anomaly_agent", "failed", str(e))
+        self._append_log({
+            "run_id": run_id,
+            "step": "anomaly",
+            "counts": anomalies["counts"] if anomalies else None,
+            "flagged_count": len(anomalies["flagged"]) if anomalies else None,
+        })
 
-        # 3) Insight Agent
+        # 4) Insight Agent
         record("insight_agent", "started")
         try:
-            insights = self.insight_agent.generate_insights(summary)
-            record("insight_agent", "completed", f"{len(insights.get('hypotheses', []))} insights")
+            with self._stage("insight_agent"):
+                insights = self.insight_agent.generate_insights(summary)
+            record("insight_agent", "completed", insights.get("skipped") or f"{len(insights.get('hypotheses', []))} insights")
         except Exception as e:
             logger.exception("InsightAgent failed")
             insights = {"hypotheses": [], "__error": str(e)}
             record("insight_agent", "failed", str(e))
         self._append_log({"run_id": run_id, "step": "insight", "insight_count": len(insights.get("hypotheses", []))})
 
-        # 4) Evaluator Agent
+        # 5) Evaluator Agent
         record("evaluator_agent", "started")
         try:
-            validated = self.evaluator.validate(insights, summary)
+            with self._stage("evaluator_agent"):
+                validated = self.evaluator.validate(insights, summary)
             if "__error" in insights:
                 validated["__error"] = insights["__error"]
             record("evaluator_agent", "completed", f"{len(validated.get('validated_hypotheses', []))} validated")
@@ -133,18 +242,27 @@ class Orchestrator:
             record("evaluator_agent", "failed", str(e))
         self._append_log({"run_id": run_id, "step": "evaluation", "validated_count": len(validated.get("validated_hypotheses", []))})
 
-        # 5) Creative Agent
+        # 6) Creative Agent
         record("creative_agent", "started")
         try:
-            creatives = self.creative.generate_creatives(summary)
-            record("creative_agent", "completed", f"{len(creatives.get('improvements', []))} improvements")
+            with self._stage("creative_agent"):
+                creatives = self.creative.generate_creatives(summary)
+            record("creative_agent", "completed", creatives.get("skipped") or f"{len(creatives.get('improvements', []))} improvements")
         except Exception as e:
             logger.exception("CreativeAgent failed")
             creatives = {"improvements": [], "__error": str(e)}
             record("creative_agent", "failed", str(e))
-        self._append_log({"run_id": run_id, "step": "creative", "improvement_count": len(creatives.get("improvements", []))})
+        dedup = creatives.get("dedup", {})
+        self._append_log({
+            "run_id": run_id,
+            "step": "creative",
+            "improvement_count": len(creatives.get("improvements", [])),
+            "skipped": creatives.get("skipped"),
+            "clusters": dedup.get("clusters"),
+            "llm_calls_saved": dedup.get("llm_calls_saved"),
+        })
 
-        # 6) Save structured outputs (include errors if present)
+        # 7) Save structured outputs (include errors if present)
         if "__error" in insights:
             validated["__error"] = insights["__error"]
         self._save_json(validated, "insights.json")
@@ -153,7 +271,7 @@ class Orchestrator:
             creatives["__error"] = creatives["__error"]
         self._save_json(creatives, "creatives.json")
 
-        # 7) Build a simple human-readable report.md
+        # 8) Build a simple human-readable report.md
         report_lines = []
         report_lines.append(f"# Kasparro Agentic FB Analyst Report")
         report_lines.append(f"Run ID: {run_id}")
@@ -162,13 +280,41 @@ class Orchestrator:
         report_lines.append("")
         report_lines.append("## Summary")
         report_lines.append(f"- Rows processed: {summary['dataset_info']['rows']}")
-        report_lines.append(f"- Dates: {summary['daily_summary'][0]['date'] if summary['daily_summary'] else 'N/A'} to {summary['daily_summary'][-1]['date'] if summary['daily_summary'] else 'N/A'}")
+        if summary.get("sampling"):
+            s = summary["sampling"]
+            report_lines.append(
+                f"- Mode: sample ({s['rows_sampled']} of {s['rows_read']} rows read, seed {s['seed']}; "
+                f"CTR/ROAS carry {int(s['confidence'] * 100)}% intervals)"
+            )
+            if s.get("partial"):
+                report_lines.append(
+                    f"- Partial estimate: time budget reached after {s['rows_read']} of "
+                    f"~{s['estimated_rows']} rows; totals cover the rows read only"
+                )
+        dates = summary["metric_cube"].date_strings() if summary.get("metric_cube") is not None else []
+        report_lines.append(f"- Dates: {dates[0] if dates else 'N/A'} to {dates[-1] if dates else 'N/A'}")
+        report_lines.append(f"- Data plan: {', '.join(data_plan.kinds)}")
+        if data_plan.filters:
+            filters = "; ".join(f"{dim} in {{{', '.join(values)}}}" for dim, values in data_plan.filters.items())
+            report_lines.append(f"- Filters: {filters}")
+        else:
+            report_lines.append("- Filters: none")
+        report_lines.append("")
+        report_lines.append("## Anomalies")
+        if anomalies and anomalies["flagged"]:
+            recent = anomalies["window"]["recent"]
+            report_lines.append(f"- Recent window {recent[0]} to {recent[1]}, {anomalies['segments_scanned']} segments scanned")
+            for a in anomalies["flagged"]:
+                report_lines.append(f"- {a['type']}: {a['dimension']} = {a['segment']} ({a['change_pct']}%)")
+        else:
+            report_lines.append("- No anomalies flagged.")
         report_lines.append("")
         report_lines.append("## Validated Insights")
         for vh in validated.get("validated_hypotheses", []):
             report_lines.append(f"- Reason: {vh.get('reason')}")
             report_lines.append(f"  - Validated: {vh.get('validated')}")
             report_lines.append(f"  - Numeric support: {vh.get('numeric_support')}")
+            report_lines.append(f"  - p-value: {vh.get('p_value')} (effect size {vh.get('effect_size')})")
             report_lines.append(f"  - Final confidence: {vh.get('final_confidence')}")
         report_lines.append("")
         report_lines.append("## Creative Recommendations (sample)")
@@ -177,13 +323,33 @@ class Orchestrator:
                 report_lines.append(f"- Campaign: {c.get('campaign', 'N/A')}")
                 report_lines.append(f"  - Old: {c.get('old_message')}")
                 report_lines.append(f"  - New Headlines: {', '.join(c.get('new_headlines', [])[:3])}")
+        elif creatives.get("skipped"):
+            report_lines.append(f"- {creatives['skipped']}.")
         else:
             report_lines.append("- No creative improvements generated.")
 
         report_text = "\n".join(report_lines)
         self._save_report_md(report_text, filename="report.md")
 
-        # 8) Final log entry
+        # 9) Record the run for cross-run queries
+        if self.history is not None:
+            try:
+                self.history.record_run(run_id, self.account, user_query, summary, validated, creatives)
+                record("history", "completed", self.history.path)
+            except Exception as e:
+                logger.exception("HistoryStore failed")
+                record("history", "failed", str(e))
+
+        self.last_run = {
+            "run_id": run_id,
+            "rows": summary["dataset_info"]["rows"],
+            "anomalies": len(anomalies["flagged"]) if anomalies else None,
+            "hypotheses": len(validated.get("validated_hypotheses", [])),
+            "validated": sum(1 for vh in validated.get("validated_hypotheses", []) if vh.get("validated")),
+            "improvements": len(creatives.get("improvements", [])),
+        }
+
+        # 10) Final log entry
         self._append_log({"run_id": run_id, "step": "complete", "timestamp": datetime.utcnow().isoformat()})
         logger.info(f"Run {run_id} completed. Reports written to: {self.reports_dir} Logs: {self.logs_dir}")
         record("pipeline", "completed", f"Run {run_id}")
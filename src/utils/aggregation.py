@@ -0,0 +1,68 @@
+"""
+src/utils/aggregation.py
+
+Mergeable group-by aggregates.
+
+Summaries store only additive components (the MetricCube measures plus a
+row count) and derive ratios from the summed totals, so CTR is weighted by
+impressions and ROAS by spend. Because every stored column is a sum,
+aggregates of disjoint partitions (CSV chunks, worker processes, daily
+increments, cached results) combine with merge(): add them, re-derive the
+ratios, no rows needed.
+"""
+
+import pandas as pd
+
+from src.utils.metric_cube import MEASURES, RATIOS
+
+
+ROWS = "rows"
+# Per-row weight column of a stratified sample (see src/utils/sampling.py)
+WEIGHT = "sample_weight"
+SUMMARY_RATIOS = ("ctr", "roas")
+
+
+def add_ratios(frame, ratios=SUMMARY_RATIOS):
+    """
+    (Re)derive ratio columns from the summed components. A zero denominator
+    gives 0, as DataCleaner does for single rows.
+    """
+    for name in ratios:
+        num, den, scale = RATIOS[name]
+        if num in frame.columns and den in frame.columns:
+            denominator = frame[den].astype(float)
+            frame[name] = (frame[num] * scale / denominator.where(denominator > 0)).fillna(0.0)
+    return frame
+
+
+def aggregate(df, keys, ratios=SUMMARY_RATIOS, sort=True):
+    """
+    Sums of the additive measures per group, plus ROWS and ratio columns.
+    Indexed by `keys`. In sample mode ROWS sums the sample weights, i.e. it
+    estimates the population row count like the weighted measures do.
+    """
+    grouped = df.groupby(list(keys), sort=sort)
+    sums = grouped[[m for m in MEASURES if m in df.columns]].sum()
+    sums[ROWS] = grouped[WEIGHT].sum() if WEIGHT in df.columns else grouped.size()
+    return add_ratios(sums, ratios)
+
+
+def merge(parts, keys, ratios=SUMMARY_RATIOS, sort=True):
+    """
+    Combine aggregates of disjoint partitions. parts: DataFrames from
+    aggregate() or lists of summary records. Columns that are neither
+    additive nor keys (ratios, intervals, labels) are re-derived or dropped.
+    """
+    keys = list(keys)
+    frames = []
+    for part in parts:
+        frame = part if isinstance(part, pd.DataFrame) else pd.DataFrame(list(part))
+        if not set(keys) <= set(frame.columns):
+            frame = frame.reset_index()
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=keys).set_index(keys)
+
+    combined = pd.concat(frames, ignore_index=True)
+    additive = [c for c in (*MEASURES, ROWS) if c in combined.columns]
+    return add_ratios(combined.groupby(keys, sort=sort)[additive].sum(), ratios)
@@ -0,0 +1,233 @@
+"""
+src/utils/data_generator.py
+
+Seeded generator for synthetic Facebook Ads CSVs in the schema DataAgent expects.
+
+- Scales from a few thousand to tens of millions of rows (written in chunks)
+- Configurable campaign, adset, creative and audience cardinality
+- Injects a late CTR/ROAS decline for a subset of creatives so the
+  pipeline has real signal to find
+- Optionally injects dirty values (mojibake, blanks) to exercise DataCleaner
+
+Usage:
+    python -m src.utils.data_generator --rows 4500
+    python -m src.utils.data_generator --rows 1000000 --out data/bench_1m.csv --campaigns 200
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+
+COLUMNS = [
+    "campaign_name",
+    "adset_name",
+    "date",
+    "spend",
+    "impressions",
+    "clicks",
+    "ctr",
+    "purchases",
+    "revenue",
+    "roas",
+    "creative_type",
+    "creative_message",
+    "audience_type",
+    "platform",
+    "country",
+]
+
+PRODUCTS = ["Comfortmax", "Cooling Mesh", "Seamless Fit", "Bamboo Soft", "Everyday Cotton", "Active Dry"]
+LINES = ["Men", "Women", "Unisex"]
+CAMPAIGN_GOALS = ["Launch", "Retargeting Push", "Summer Sale", "Always On", "Bundle Offer"]
+BENEFITS = [
+    "Cooling mesh panels keep you fresh all day",
+    "No ride-up, no chafing, all-day comfort",
+    "Breathable fabric built for workouts",
+    "Ultra-soft bamboo feel you will forget you are wearing",
+    "Tagless waistband for zero irritation",
+    "Moisture-wicking comfort from desk to gym",
+    "Buy 3 get 1 free on every pack",
+]
+CREATIVE_TYPES = ["Image", "Video", "UGC", "Carousel"]
+AUDIENCES = ["Broad", "Lookalike", "Retargeting", "Interest"]
+PLATFORMS = ["Facebook", "Instagram"]
+COUNTRIES = ["IN", "US", "UK", "CA", "AU", "DE"]
+
+DIRTY_TOKENS = ["â€™", "â€”", "Â"]
+
+
+class SyntheticAdsGenerator:
+    def __init__(
+        self,
+        seed=42,
+        campaigns=12,
+        adsets_per_campaign=4,
+        creatives=40,
+        audiences=4,
+        days=90,
+        start_date="2025-01-01",
+        decline_fraction=0.3,
+        dirty_fraction=0.0,
+    ):
+        self.seed = seed
+        self.days = days
+        self.start_date = pd.Timestamp(start_date)
+        self.decline_fraction = decline_fraction
+        self.dirty_fraction = dirty_fraction
+
+        rng = np.random.default_rng(seed)
+
+        self.campaign_names = np.array([
+            f"{LINES[i % len(LINES)]} {PRODUCTS[(i // len(LINES)) % len(PRODUCTS)]} "
+            f"{CAMPAIGN_GOALS[i % len(CAMPAIGN_GOALS)]}" + (f" {i // 15 + 1}" if i >= 15 else "")
+            for i in range(campaigns)
+        ], dtype=object)
+        self.adset_names = np.array([
+            f"{self.campaign_names[c]} - Adset {a + 1}"
+            for c in range(campaigns)
+            for a in range(adsets_per_campaign)
+        ], dtype=object)
+        self.adsets_per_campaign = adsets_per_campaign
+
+        self.creative_messages = np.array([
+            f"{BENEFITS[i % len(BENEFITS)]} — {PRODUCTS[i % len(PRODUCTS)]}"
+            + (f" #{i // len(BENEFITS) + 1}" if i >= len(BENEFITS) else "")
+            for i in range(creatives)
+        ], dtype=object)
+        self.creative_types = rng.choice(CREATIVE_TYPES, size=creatives)
+        self.creative_base_ctr = rng.uniform(0.006, 0.03, size=creatives)
+        self.creative_declines = rng.random(creatives) < decline_fraction
+
+        self.audience_names = np.array(
+            AUDIENCES[:audiences] + [f"Interest {i + 1}" for i in range(max(0, audiences - len(AUDIENCES)))],
+            dtype=object,
+        )
+        self.audience_lift = rng.uniform(0.7, 1.4, size=len(self.audience_names))
+
+        self.date_strings = np.array(
+            (self.start_date + pd.to_timedelta(np.arange(days), unit="D")).strftime("%d-%m-%Y"),
+            dtype=object,
+        )
+
+    def generate_chunk(self, rows: int, chunk_index: int = 0) -> pd.DataFrame:
+        """Generate one chunk; chunks are independently seeded so output is reproducible."""
+        rng = np.random.default_rng([self.seed, chunk_index])
+
+        day = rng.integers(0, self.days, size=rows)
+        adset = rng.integers(0, len(self.adset_names), size=rows)
+        campaign = adset // self.adsets_per_campaign
+        creative = rng.integers(0, len(self.creative_messages), size=rows)
+        audience = rng.integers(0, len(self.audience_names), size=rows)
+
+        # Declining creatives lose up to 45% CTR and ROAS over the last third of the window
+        progress = np.clip((day / max(self.days - 1, 1) - 2 / 3) * 3, 0, 1)
+        decay = 1 - 0.45 * progress * self.creative_declines[creative]
+
+        impressions = np.maximum(rng.lognormal(7.5, 1.0, size=rows).astype(np.int64), 1)
+        ctr = np.clip(
+            self.creative_base_ctr[creative] * self.audience_lift[audience] * decay
+            * rng.lognormal(0, 0.15, size=rows),
+            0.0005, 0.2,
+        )
+        clicks = rng.binomial(impressions, ctr)
+        cpm = rng.lognormal(np.log(180), 0.3, size=rows)
+        spend = np.round(impressions * cpm / 1000, 2)
+        cvr = np.clip(0.03 * self.audience_lift[audience] * decay, 0.001, 0.5)
+        purchases = rng.binomial(clicks, cvr)
+        revenue = np.round(purchases * rng.lognormal(np.log(900), 0.25, size=rows), 2)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row_ctr = np.where(impressions > 0, clicks / impressions, 0.0)
+            row_roas = np.where(spend > 0, revenue / spend, 0.0)
+
+        df = pd.DataFrame({
+            "campaign_name": self.campaign_names[campaign],
+            "adset_name": self.adset_names[adset],
+            "date": self.date_strings[day],
+            "spend": spend,
+            "impressions": impressions,
+            "clicks": clicks,
+            "ctr": np.round(row_ctr, 6),
+            "purchases": purchases,
+            "revenue": revenue,
+            "roas": np.round(row_roas, 4),
+            "creative_type": self.creative_types[creative],
+            "creative_message": self.creative_messages[creative],
+            "audience_type": self.audience_names[audience],
+            "platform": rng.choice(PLATFORMS, size=rows),
+            "country": rng.choice(COUNTRIES, size=rows),
+        }, columns=COLUMNS)
+
+        if self.dirty_fraction > 0:
+            self._dirty(df, rng)
+
+        return df
+
+    def _dirty(self, df, rng):
+        n = len(df)
+        k = int(n * self.dirty_fraction)
+        if k == 0:
+            return
+
+        rows = rng.choice(n, size=k, replace=False)
+        tokens = rng.choice(DIRTY_TOKENS, size=k)
+        df.loc[rows, "creative_message"] = df.loc[rows, "creative_message"].str.cat(tokens, sep=" ").values
+
+        blank_rows = rng.choice(n, size=max(1, k // 2), replace=False)
+        df["spend"] = df["spend"].astype(object)
+        df.loc[blank_rows, "spend"] = ""
+
+    def write_csv(self, path: str, rows: int, chunk_rows: int = 1_000_000):
+        """Stream `rows` rows to `path` in chunks so memory stays flat."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        written = 0
+        chunk_index = 0
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            chunk = self.generate_chunk(n, chunk_index)
+            chunk.to_csv(path, mode="w" if chunk_index == 0 else "a", header=chunk_index == 0, index=False)
+            written += n
+            chunk_index += 1
+
+        return path
+
+
+def main():
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic Facebook Ads dataset.")
+    parser.add_argument("--rows", type=int, default=4500)
+    parser.add_argument("--out", default=config["paths"]["data"])
+    parser.add_argument("--seed", type=int, default=config["settings"]["seed"])
+    parser.add_argument("--campaigns", type=int, default=12)
+    parser.add_argument("--adsets-per-campaign", type=int, default=4)
+    parser.add_argument("--creatives", type=int, default=40)
+    parser.add_argument("--audiences", type=int, default=4)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--start-date", default="2025-01-01")
+    parser.add_argument("--dirty-fraction", type=float, default=0.0)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    generator = SyntheticAdsGenerator(
+        seed=args.seed,
+        campaigns=args.campaigns,
+        adsets_per_campaign=args.adsets_per_campaign,
+        creatives=args.creatives,
+        audiences=args.audiences,
+        days=args.days,
+        start_date=args.start_date,
+        dirty_fraction=args.dirty_fraction,
+    )
+    generator.write_csv(args.out, args.rows, chunk_rows=args.chunk_rows)
+    print(f"[DATA_GENERATOR] Wrote {args.rows} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+src/utils/dedup.py
+
+Near-duplicate clustering of creative messages.
+
+Messages are normalized and hashed; identical texts always share a cluster.
+When an embedder (MultiLLM.embedder, a SentenceTransformer) is available,
+unique texts are embedded in batches, the vectors are cached by hash, and
+texts whose cosine similarity to a cluster leader reaches `threshold` join
+that cluster. Leaders are taken in input order, so clustering is stable.
+The cache file is rewritten atomically, once per cluster() call that
+embedded new texts.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+import numpy as np
+
+
+def normalize_message(text) -> str:
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def message_hash(text) -> str:
+    return hashlib.sha1(normalize_message(text).encode("utf-8")).hexdigest()
+
+
+class MessageDeduplicator:
+    def __init__(self, embedder=None, threshold=0.92, batch_size=64, cache_path=None):
+        """
+        embedder:   object with encode(list_of_texts, batch_size=...) -> 2D array, or None
+                    (exact-text dedup only)
+        threshold:  cosine similarity at which a message joins a cluster
+        cache_path: optional .npz file persisting {hash: vector} across runs
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.cache_path = cache_path
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                self.cache = {k: data[k] for k in data.files}
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _embed(self, hashes, texts):
+        """Unit vectors for unique texts; only uncached hashes reach the embedder."""
+        missing = [i for i, h in enumerate(hashes) if h not in self.cache]
+        if missing:
+            vectors = np.asarray(
+                self.embedder.encode([texts[i] for i in missing], batch_size=self.batch_size),
+                dtype=np.float32,
+            )
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+            for i, v in zip(missing, vectors):
+                self.cache[hashes[i]] = v
+        return np.stack([self.cache[h] for h in hashes])
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def cluster(self, messages: list) -> list:
+        """
+        Group messages into clusters.
+
+        Returns a list of clusters, each a list of indices into `messages`,
+        ordered by first appearance. cluster[0] is the representative.
+        """
+        hashes = [message_hash(m) for m in messages]
+
+        # Exact duplicates first: one slot per unique normalized text
+        unique, slot_of = [], {}
+        for i, h in enumerate(hashes):
+            if h not in slot_of:
+                slot_of[h] = len(unique)
+                unique.append(i)
+        members = [[] for _ in unique]
+        for i, h in enumerate(hashes):
+            members[slot_of[h]].append(i)
+
+        if self.embedder is None or len(unique) < 2:
+            return members
+
+        cached = len(self.cache)
+        vectors = self._embed([hashes[i] for i in unique], [str(messages[i]) for i in unique])
+        if len(self.cache) > cached:
+            self.save()
+
+        # Greedy leader clustering: one matrix-vector product per leader
+        assigned = np.full(len(unique), -1)
+        clusters = []
+        for slot in range(len(unique)):
+            if assigned[slot] >= 0:
+                continue
+            sims = vectors @ vectors[slot]
+            join = (assigned < 0) & (sims >= self.threshold)
+            join[slot] = True
+            assigned[join] = len(clusters)
+            clusters.append(np.flatnonzero(join))
+
+        return [sorted(i for s in slots for i in members[s]) for slots in clusters]
+
+    def save(self):
+        if self.cache_path and self.cache:
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            # Write beside the target and swap in, so readers never see a
+            # partial file. A file handle stops np.savez appending ".npz".
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, **self.cache)
+                os.replace(tmp, self.cache_path)
+            except BaseException:
+                os.remove(tmp)
+                raise
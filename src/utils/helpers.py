@@ -4,20 +4,26 @@ src/utils/helpers.py
 Small shared helper functions used across agents.
 """
 
+import math
+
 import pandas as pd
 
 
-def safe_number(x):
+def safe_number(x, digits=None):
     """
-    Convert strings or NaN to a float safely.
-    Returns None if conversion fails.
+    Convert strings, numpy scalars or NaN to a float safely (JSON-safe).
+    Returns None if conversion fails or the value is not finite.
+    Rounds to `digits` places when given.
     """
     try:
         if pd.isna(x):
             return None
-        return float(x)
+        x = float(x)
     except:
         return None
+    if not math.isfinite(x):
+        return None
+    return round(x, digits) if digits is not None else x
 
 
 def calculate_pct_change(current, previous):
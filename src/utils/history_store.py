@@ -0,0 +1,380 @@
+"""
+src/utils/history_store.py
+
+SQLite run-history store for cross-run comparison.
+
+Every Orchestrator run records its dataset summary, per-segment metric
+totals (from the MetricCube), validated hypotheses and creatives. Runs are
+keyed by (account, run_id), so accounts sharing a database never replace
+each other's runs. Tables are indexed by account, date range and metric,
+so questions like "how has ROAS moved across the last ten runs" are a
+single indexed query instead of a re-analysis.
+
+Each run also stores its data plan's segment filters and window. A run
+restricted to, say, Video creatives has account totals that are not
+comparable with unfiltered runs, so TOTAL trends leave it out by default.
+
+Usage:
+    python -m src.utils.history_store runs [--account A]
+    python -m src.utils.history_store trend roas [--account A] [--dimension campaign_name --segment X] [--include-filtered]
+    python -m src.utils.history_store hypotheses roas [--account A]
+    python -m src.utils.history_store show <run_id> [--account A]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import yaml
+
+from src.utils.helpers import safe_number
+from src.utils.metric_cube import TOTAL
+
+
+STORED_METRICS = ("spend", "revenue", "impressions", "clicks", "ctr", "roas", "cpc", "cpm", "cvr")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT NOT NULL,
+    account     TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    query       TEXT,
+    date_start  TEXT,
+    date_end    TEXT,
+    rows        INTEGER,
+    filters     TEXT,
+    window_days INTEGER,
+    summary     TEXT,
+    PRIMARY KEY (account, run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_account_dates ON runs (account, date_start, date_end);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id      TEXT NOT NULL,
+    account     TEXT NOT NULL,
+    date_start  TEXT,
+    date_end    TEXT,
+    dimension   TEXT NOT NULL,
+    segment     TEXT NOT NULL,
+    metric      TEXT NOT NULL,
+    value       REAL,
+    FOREIGN KEY (account, run_id) REFERENCES runs (account, run_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_lookup ON metrics (account, metric, dimension, segment, date_start);
+CREATE INDEX IF NOT EXISTS idx_metrics_run ON metrics (account, run_id);
+
+CREATE TABLE IF NOT EXISTS hypotheses (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id           TEXT NOT NULL,
+    account          TEXT NOT NULL,
+    date_start       TEXT,
+    date_end         TEXT,
+    metric           TEXT,
+    rule             TEXT,
+    reason           TEXT,
+    validated        INTEGER,
+    numeric_support  REAL,
+    p_value          REAL,
+    effect_size      REAL,
+    final_confidence REAL,
+    payload          TEXT,
+    FOREIGN KEY (account, run_id) REFERENCES runs (account, run_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_hypotheses_lookup ON hypotheses (account, metric, date_start);
+CREATE INDEX IF NOT EXISTS idx_hypotheses_run ON hypotheses (account, run_id);
+
+CREATE TABLE IF NOT EXISTS creatives (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      TEXT NOT NULL,
+    account     TEXT NOT NULL,
+    campaign    TEXT,
+    adset       TEXT,
+    old_message TEXT,
+    payload     TEXT,
+    FOREIGN KEY (account, run_id) REFERENCES runs (account, run_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_creatives_run ON creatives (account, run_id);
+CREATE INDEX IF NOT EXISTS idx_creatives_account_campaign ON creatives (account, campaign);
+"""
+
+# Tables in parent-first order, with the columns a pre-(account, run_id)
+# database has; _migrate copies these and backfills the rest
+TABLES = {
+    "runs": "run_id, account, created_at, query, date_start, date_end, rows, summary",
+    "metrics": "run_id, account, date_start, date_end, dimension, segment, metric, value",
+    "hypotheses": "id, run_id, account, date_start, date_end, metric, rule, reason, validated, "
+                  "numeric_support, p_value, effect_size, final_confidence, payload",
+    "creatives": "id, run_id, account, campaign, adset, old_message, payload",
+}
+
+
+class HistoryStore:
+    def __init__(self, path="logs/history.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Short-lived writers from parallel runs wait instead of failing
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = {r["name"] for r in self.conn.execute("PRAGMA table_info(runs)")}
+        if columns and "filters" not in columns:
+            self._migrate()
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _migrate(self):
+        """
+        Rebuild a database whose runs were keyed by run_id alone: copy every
+        table into the (account, run_id) schema in one transaction, then
+        backfill filters/window_days from each run's stored data plan.
+        """
+        script = ["BEGIN;"]
+        script += [f"ALTER TABLE {t} RENAME TO {t}_old;" for t in TABLES]
+        # Renamed tables keep their index names; free them for SCHEMA
+        script += [
+            f"DROP INDEX {r['name']};" for r in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+        ]
+        script.append(SCHEMA)
+        script += [f"INSERT INTO {t} ({cols}) SELECT {cols} FROM {t}_old;" for t, cols in TABLES.items()]
+        script += [f"DROP TABLE {t}_old;" for t in reversed(list(TABLES))]
+        script.append("COMMIT;")
+        self.conn.executescript("\n".join(script))
+
+        with self.conn:
+            for row in self.conn.execute("SELECT account, run_id, summary FROM runs").fetchall():
+                filters, window_days = self._plan_scope(json.loads(row["summary"] or "{}"))
+                self.conn.execute(
+                    "UPDATE runs SET filters = ?, window_days = ? WHERE account = ? AND run_id = ?",
+                    (filters, window_days, row["account"], row["run_id"]),
+                )
+
+    @staticmethod
+    def _plan_scope(summary):
+        """(filters as JSON or None when unfiltered, window_days) of the run's data plan."""
+        plan = summary.get("dataset_info", {}).get("data_plan") or {}
+        filters = plan.get("filters") or None
+        return (json.dumps(filters, sort_keys=True, default=str) if filters else None), plan.get("window_days")
+
+    @staticmethod
+    def _date_range(summary):
+        cube = summary.get("metric_cube")
+        if cube is not None and len(cube.dates):
+            return str(cube.dates[0]), str(cube.dates[-1])
+        daily = summary.get("daily_summary") or []
+        if daily:
+            return str(daily[0].get("date"))[:10], str(daily[-1].get("date"))[:10]
+        return None, None
+
+    @staticmethod
+    def _metric_rows(summary):
+        """(dimension, segment, metric, value) for every segment of the cube."""
+        cube = summary.get("metric_cube")
+        if cube is None:
+            return []
+        rows = []
+        for dim, values in cube.values.items():
+            totals = cube.windows(dim)
+            for metric in STORED_METRICS:
+                for segment, value in zip(values, totals[metric]):
+                    rows.append((dim, segment, metric, safe_number(value)))
+        return rows
+
+    @staticmethod
+    def _where(account=None, since=None, until=None):
+        """Shared filters; since/until bound the run's data window (YYYY-MM-DD)."""
+        clauses, params = [], []
+        if account is not None:
+            clauses.append("account = ?")
+            params.append(account)
+        if since is not None:
+            clauses.append("date_end >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("date_start <= ?")
+            params.append(until)
+        return (" AND ".join(clauses) or "1 = 1"), params
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def record_run(self, run_id, account, query, summary, validated=None, creatives=None):
+        """Store one run in a single transaction. Re-recording an (account, run_id) replaces it."""
+        date_start, date_end = self._date_range(summary)
+        filters, window_days = self._plan_scope(summary)
+        compact = {
+            k: v for k, v in summary.items()
+            if k in ("dataset_info", "sampling", "anomalies", "creative_type_summary", "audience_summary")
+        }
+
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE account = ? AND run_id = ?", (account, run_id))
+            self.conn.execute(
+                "INSERT INTO runs (run_id, account, created_at, query, date_start, date_end, rows, "
+                "filters, window_days, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, account, datetime.utcnow().isoformat(), query, date_start, date_end,
+                    summary.get("dataset_info", {}).get("rows"), filters, window_days,
+                    json.dumps(compact, default=str),
+                ),
+            )
+            self.conn.executemany(
+                "INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, account, date_start, date_end, *row) for row in self._metric_rows(summary)],
+            )
+            self.conn.executemany(
+                "INSERT INTO hypotheses (run_id, account, date_start, date_end, metric, rule, reason, validated, "
+                "numeric_support, p_value, effect_size, final_confidence, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id, account, date_start, date_end,
+                        h.get("routed_metric"), h.get("rule"), h.get("reason"),
+                        int(bool(h.get("validated"))),
+                        safe_number(h.get("numeric_support")), safe_number(h.get("p_value")),
+                        safe_number(h.get("effect_size")), safe_number(h.get("final_confidence")),
+                        json.dumps(h, default=str),
+                    )
+                    for h in (validated or {}).get("validated_hypotheses", [])
+                ],
+            )
+            self.conn.executemany(
+                "INSERT INTO creatives (run_id, account, campaign, adset, old_message, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, account, c.get("campaign"), c.get("adset"), c.get("old_message"), json.dumps(c, default=str))
+                    for c in (creatives or {}).get("improvements", [])
+                ],
+            )
+
+    def runs(self, account=None, since=None, until=None, limit=50) -> list:
+        where, params = self._where(account, since, until)
+        cur = self.conn.execute(
+            f"SELECT run_id, account, created_at, query, date_start, date_end, rows, filters, window_days FROM runs "
+            f"WHERE {where} ORDER BY date_end DESC, created_at DESC LIMIT ?",
+            params + [limit],
+        )
+        return [dict(r) for r in cur]
+
+    def metric_trend(self, metric, account=None, dimension=TOTAL, segment="all", since=None, until=None,
+                     include_filtered=False) -> list:
+        """
+        One value per run for a metric of one segment, oldest data window
+        first. TOTAL trends skip runs whose plan filtered segments (their
+        totals cover only part of the account) unless include_filtered.
+        """
+        where, params = self._where(account, since, until)
+        if dimension == TOTAL and not include_filtered:
+            where += (
+                " AND NOT EXISTS (SELECT 1 FROM runs WHERE runs.account = metrics.account "
+                "AND runs.run_id = metrics.run_id AND runs.filters IS NOT NULL)"
+            )
+        cur = self.conn.execute(
+            f"SELECT run_id, account, date_start, date_end, value FROM metrics "
+            f"WHERE metric = ? AND dimension = ? AND segment = ? AND {where} "
+            f"ORDER BY date_start, date_end, run_id",
+            [metric, dimension, segment] + params,
+        )
+        rows = [dict(r) for r in cur]
+        for prev, row in zip(rows, rows[1:]):
+            if prev["value"] and row["value"] is not None:
+                row["change_pct"] = round((row["value"] / prev["value"] - 1.0) * 100, 2)
+        return rows
+
+    def hypothesis_trend(self, metric, account=None, since=None, until=None) -> list:
+        """Per run: how many hypotheses about `metric` were raised and validated."""
+        where, params = self._where(account, since, until)
+        cur = self.conn.execute(
+            f"SELECT run_id, account, date_start, date_end, COUNT(*) AS hypotheses, "
+            f"SUM(validated) AS validated, AVG(final_confidence) AS avg_confidence, MIN(p_value) AS min_p_value "
+            f"FROM hypotheses WHERE metric = ? AND {where} "
+            f"GROUP BY account, run_id ORDER BY date_start, date_end, run_id",
+            [metric.lower()] + params,
+        )
+        return [dict(r) for r in cur]
+
+    def run(self, run_id, account=None) -> dict:
+        """Everything stored for one run; without an account, the latest run with that run_id."""
+        where, params = self._where(account)
+        row = self.conn.execute(
+            f"SELECT * FROM runs WHERE run_id = ? AND {where} ORDER BY created_at DESC LIMIT 1",
+            [run_id] + params,
+        ).fetchone()
+        if row is None:
+            return {}
+        result = dict(row)
+        result["summary"] = json.loads(result["summary"] or "{}")
+        result["filters"] = json.loads(result["filters"]) if result["filters"] else {}
+        key = (result["account"], run_id)
+        result["hypotheses"] = [
+            json.loads(r["payload"]) for r in self.conn.execute(
+                "SELECT payload FROM hypotheses WHERE account = ? AND run_id = ? ORDER BY id", key)
+        ]
+        result["creatives"] = [
+            json.loads(r["payload"]) for r in self.conn.execute(
+                "SELECT payload FROM creatives WHERE account = ? AND run_id = ? ORDER BY id", key)
+        ]
+        return result
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    default_path = config.get("history", {}).get("path") or os.path.join(config["paths"]["logs"], "history.sqlite")
+
+    parser = argparse.ArgumentParser(description="Query the pipeline run history.")
+    parser.add_argument("--db", default=default_path)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def filters(p):
+        p.add_argument("--account")
+        p.add_argument("--since", help="runs whose data ends on/after YYYY-MM-DD")
+        p.add_argument("--until", help="runs whose data starts on/before YYYY-MM-DD")
+
+    p = sub.add_parser("runs", help="list recorded runs")
+    filters(p)
+    p.add_argument("--limit", type=int, default=50)
+
+    p = sub.add_parser("trend", help="metric value per run")
+    p.add_argument("metric", choices=STORED_METRICS)
+    p.add_argument("--dimension", default=TOTAL)
+    p.add_argument("--segment", default="all")
+    p.add_argument("--include-filtered", action="store_true", help="keep runs with segment filters in TOTAL trends")
+    filters(p)
+
+    p = sub.add_parser("hypotheses", help="hypotheses about a metric per run")
+    p.add_argument("metric")
+    filters(p)
+
+    p = sub.add_parser("show", help="everything stored for one run")
+    p.add_argument("run_id")
+    p.add_argument("--account")
+
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+
+    if args.command == "runs":
+        result = store.runs(args.account, args.since, args.until, args.limit)
+    elif args.command == "trend":
+        result = store.metric_trend(args.metric, args.account, args.dimension, args.segment, args.since, args.until,
+                                    args.include_filtered)
+    elif args.command == "hypotheses":
+        result = store.hypothesis_trend(args.metric, args.account, args.since, args.until)
+    else:
+        result = store.run(args.run_id, args.account)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ Enhanced MultiLLM client for Kasparro Agentic FB Analyst:
 - Strong JSON extraction logic (regex-based)
 - Safe fallbacks when JSON fails
 - Uses `.env` automatically with load_dotenv()
+- Optional rate limiter (TokenBucket) applied to every model request
 """
 
 from dotenv import load_dotenv
@@ -15,9 +16,9 @@ load_dotenv()
 import os
 import json
 import re
+import threading
 import numpy as np
 import requests
-from sentence_transformers import SentenceTransformer
 
 
 BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
@@ -32,7 +33,13 @@ class MultiLLM:
     - embedding-based validation
     """
 
-    def __init__(self):
+    def __init__(self, rate_limiter=None):
+        """rate_limiter: optional TokenBucket / SharedTokenBucket; one token per model request."""
+        self.rate_limiter = rate_limiter
+        # Requests sent; CreativeAgent calls from several threads
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
         self.api_key = os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise RuntimeError("Missing OPENROUTER_API_KEY in your environment variables.")
@@ -63,7 +70,8 @@ class MultiLLM:
             "meituan/longcat-flash-chat:free"
         ]
 
-        # Embedding model for validation
+        # Embedding model for validation (imported lazily: torch is slow to import)
+        from sentence_transformers import SentenceTransformer
         self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
 
     # -------------------------------------------------------------------
@@ -78,6 +86,11 @@ class MultiLLM:
             "temperature": 0.3
         }
 
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with self._calls_lock:
+            self.calls += 1
+
         try:
             res = requests.post(
                 BASE_URL,
@@ -0,0 +1,286 @@
+"""
+src/utils/log_writer.py
+
+Buffered NDJSON sink for pipeline logs:
+- Entries are buffered in memory and flushed in batches by a background thread
+- The active file rotates by size or by date
+- A sidecar index maps run_id -> (file, offset, length) so one run can be
+  read back without scanning the whole log history
+
+Usage:
+    python -m src.utils.log_writer <run_id> [logs_dir]
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+
+class PipelineLogWriter:
+    def __init__(
+        self,
+        logs_dir,
+        filename="pipeline_log.json",
+        batch_size=50,
+        flush_interval=2.0,
+        rotate="size",
+        max_bytes=50 * 1024 * 1024,
+        backup_count=None,
+    ):
+        if rotate not in ("size", "daily"):
+            raise ValueError(f"Unknown rotate mode: {rotate}")
+
+        self.logs_dir = logs_dir
+        self.filename = filename
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.rotate = rotate
+        self.max_bytes = int(max_bytes)
+        self.backup_count = backup_count
+
+        os.makedirs(logs_dir, exist_ok=True)
+        self.path = os.path.join(logs_dir, filename)
+        self._stem, self._ext = os.path.splitext(filename)
+        self.index_path = os.path.join(logs_dir, f"{self._stem}.index")
+
+        self._file_date = self._current_file_date()
+
+        # Logs written before the index existed are indexed once, up front.
+        if not os.path.exists(self.index_path) and os.path.exists(self.path):
+            self.rebuild_index()
+
+        self._buffer = []
+        self._cond = threading.Condition()
+        # Serialises buffer swaps with disk writes so batches land in order.
+        self._io_lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(
+            target=self._worker, name="pipeline-log-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def write(self, entry: dict):
+        """Queue one entry; it is flushed by the background thread."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("PipelineLogWriter is closed")
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Write every buffered entry to disk before returning."""
+        with self._io_lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        # Writers are opened per run; don't keep closed ones alive until exit
+        atexit.unregister(self.close)
+
+    def read_run(self, run_id: str) -> list:
+        """Return all entries of one run using the sidecar index."""
+        entries = []
+        # Held throughout so a rotation cannot move files between index and read
+        with self._io_lock:
+            self._flush_locked()
+            for span in self.load_index().get(run_id, []):
+                path = os.path.join(self.logs_dir, span["file"])
+                if not os.path.exists(path):
+                    continue
+                with open(path, "rb") as f:
+                    f.seek(span["offset"])
+                    chunk = f.read(span["length"])
+                for line in chunk.splitlines():
+                    if line.strip():
+                        entries.append(json.loads(line))
+        return entries
+
+    def load_index(self) -> dict:
+        """run_id -> list of {"file", "offset", "length"} spans, in write order."""
+        index = {}
+        if not os.path.exists(self.index_path):
+            return index
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                span = json.loads(line)
+                run_id = span.pop("run_id")
+                index.setdefault(run_id, []).append(span)
+        return index
+
+    def rebuild_index(self):
+        """Regenerate the index by scanning every log file once."""
+        spans = []
+        for name in self._log_files():
+            offset = 0
+            with open(os.path.join(self.logs_dir, name), "rb") as f:
+                for line in f:
+                    length = len(line)
+                    try:
+                        run_id = json.loads(line).get("run_id")
+                    except ValueError:
+                        run_id = None
+                    spans.append((run_id, name, offset, length))
+                    offset += length
+        self._write_index(self._merge_spans(spans))
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[LOG_WRITER] Flush failed: {e}")
+            if closed:
+                return
+
+    def _flush_locked(self):
+        """flush() body; the caller holds _io_lock."""
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        try:
+            self._write_batch(batch)
+        except Exception:
+            # Keep the batch, ahead of newer entries, for the next flush
+            with self._cond:
+                self._buffer[:0] = batch
+            raise
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+
+        lines = [(json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in batch]
+        payload = b"".join(lines)
+        self._maybe_rotate(len(payload))
+
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(payload)
+
+        spans = []
+        for entry, line in zip(batch, lines):
+            spans.append((entry.get("run_id"), self.filename, offset, len(line)))
+            offset += len(line)
+
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            for span in self._merge_spans(spans):
+                f.write(json.dumps(span) + "\n")
+
+    @staticmethod
+    def _merge_spans(spans):
+        """Collapse consecutive lines of the same run into one span."""
+        merged = []
+        for run_id, name, offset, length in spans:
+            if run_id is None:
+                continue
+            last = merged[-1] if merged else None
+            if (
+                last
+                and last["run_id"] == run_id
+                and last["file"] == name
+                and last["offset"] + last["length"] == offset
+            ):
+                last["length"] += length
+            else:
+                merged.append({"run_id": run_id, "file": name, "offset": offset, "length": length})
+        return merged
+
+    def _current_file_date(self):
+        if os.path.exists(self.path):
+            return datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+        return datetime.now().date()
+
+    def _maybe_rotate(self, incoming_bytes):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._file_date = datetime.now().date()
+            return
+
+        if self.rotate == "daily":
+            needs_rotation = datetime.now().date() != self._file_date
+        else:
+            needs_rotation = os.path.getsize(self.path) + incoming_bytes > self.max_bytes
+
+        if needs_rotation:
+            self._rotate()
+
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = f"{self._stem}.{stamp}{self._ext}"
+        counter = 1
+        while os.path.exists(os.path.join(self.logs_dir, rotated)):
+            rotated = f"{self._stem}.{stamp}-{counter}{self._ext}"
+            counter += 1
+
+        os.replace(self.path, os.path.join(self.logs_dir, rotated))
+        self._file_date = datetime.now().date()
+
+        spans = []
+        for run_id, run_spans in self.load_index().items():
+            for span in run_spans:
+                if span["file"] == self.filename:
+                    span["file"] = rotated
+                spans.append({"run_id": run_id, **span})
+
+        if self.backup_count is not None:
+            rotated_files = [f for f in self._log_files() if f != self.filename]
+            expired = set(rotated_files[: max(0, len(rotated_files) - int(self.backup_count))])
+            for name in expired:
+                os.remove(os.path.join(self.logs_dir, name))
+            spans = [s for s in spans if s["file"] not in expired]
+
+        self._write_index(spans)
+
+    def _log_files(self):
+        """Rotated files oldest first, followed by the active file."""
+        prefix = f"{self._stem}."
+        rotated = sorted(
+            name
+            for name in os.listdir(self.logs_dir)
+            if name.startswith(prefix) and name.endswith(self._ext) and name != self.filename
+        )
+        if os.path.exists(self.path):
+            rotated.append(self.filename)
+        return rotated
+
+    def _write_index(self, spans):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+        os.replace(tmp_path, self.index_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.utils.log_writer <run_id> [logs_dir]")
+        sys.exit(1)
+
+    writer = PipelineLogWriter(sys.argv[2] if len(sys.argv) > 2 else "logs/")
+    for entry in writer.read_run(sys.argv[1]):
+        print(json.dumps(entry, ensure_ascii=False))
+    writer.close()
@@ -0,0 +1,160 @@
+"""
+src/utils/metric_cube.py
+
+Array-backed (dimension, value, date) metric cube with prefix sums.
+
+For every dimension the additive measures (spend, impressions, clicks,
+purchases, revenue) are stored as a (values x dates+1 x measures) array of
+cumulative sums. Any date-window aggregate of any segment is therefore two
+array reads and a subtraction, and ratios (CTR, ROAS, ...) are derived
+from the summed totals.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.utils.pattern_matcher import MultiPatternMatcher
+
+
+MEASURES = ("spend", "impressions", "clicks", "purchases", "revenue")
+
+DIMENSIONS = ("campaign_name", "adset_name", "creative_type", "audience_type", "country")
+
+TOTAL = "__total__"
+
+# ratio -> (numerator, denominator, scale)
+RATIOS = {
+    "ctr": ("clicks", "impressions", 1.0),
+    "roas": ("revenue", "spend", 1.0),
+    "cpc": ("spend", "clicks", 1.0),
+    "cpm": ("spend", "impressions", 1000.0),
+    "cvr": ("purchases", "clicks", 1.0),
+}
+
+
+class MetricCube:
+    def __init__(self, dates, values, prefix):
+        """
+        dates:  sorted numpy datetime64[D] array
+        values: {dimension: list of segment names}
+        prefix: {dimension: float array (n_values, n_dates + 1, n_measures)}
+        """
+        self.dates = dates
+        self.values = values
+        self.prefix = prefix
+        self._index = {dim: {v: i for i, v in enumerate(vals)} for dim, vals in values.items()}
+        self._entity_matcher = None
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, dimensions=DIMENSIONS):
+        df = df[df["date"].notna()]
+        date_codes, dates = pd.factorize(df["date"].values.astype("datetime64[D]"), sort=True)
+        n_dates = len(dates)
+        weights = [df[m].to_numpy(dtype=float) for m in MEASURES]
+
+        values, prefix = {}, {}
+        for dim in (TOTAL,) + tuple(d for d in dimensions if d in df.columns):
+            if dim == TOTAL:
+                codes, uniques = np.zeros(len(df), dtype=np.int64), np.array(["all"], dtype=object)
+            else:
+                codes, uniques = pd.factorize(df[dim].astype(str), sort=True)
+
+            flat = codes * n_dates + date_codes
+            size = len(uniques) * n_dates
+            cube = np.stack(
+                [np.bincount(flat, weights=w, minlength=size).reshape(len(uniques), n_dates) for w in weights],
+                axis=-1,
+            )
+            cum = np.zeros((len(uniques), n_dates + 1, len(MEASURES)))
+            np.cumsum(cube, axis=1, out=cum[:, 1:, :])
+
+            values[dim] = [str(v) for v in uniques]
+            prefix[dim] = cum
+
+        return cls(np.asarray(dates, dtype="datetime64[D]"), values, prefix)
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    def _bounds(self, start=None, end=None):
+        """Inclusive [start, end] dates -> half-open prefix indices."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), side="right"))
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _with_ratios(totals):
+        """totals: {measure: array} -> same dict plus derived ratios (NaN when undefined)."""
+        out = dict(totals)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, (num, den, scale) in RATIOS.items():
+                out[name] = np.where(totals[den] > 0, totals[num] / totals[den] * scale, np.nan)
+        return out
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def has(self, dimension, value=None):
+        if dimension not in self._index:
+            return False
+        return value is None or value in self._index[dimension]
+
+    def window(self, dimension, value, start=None, end=None) -> dict:
+        """Aggregate of one segment over an inclusive date window, in O(1)."""
+        i = self._index[dimension][value]
+        lo, hi = self._bounds(start, end)
+        sums = self.prefix[dimension][i, hi] - self.prefix[dimension][i, lo]
+        totals = {m: sums[k] for k, m in enumerate(MEASURES)}
+        return {k: float(v) for k, v in self._with_ratios(totals).items()}
+
+    def windows(self, dimension, start=None, end=None) -> dict:
+        """Aggregates of every segment of a dimension over a window, as arrays."""
+        lo, hi = self._bounds(start, end)
+        sums = self.prefix[dimension][:, hi] - self.prefix[dimension][:, lo]
+        totals = {m: sums[:, k] for k, m in enumerate(MEASURES)}
+        return self._with_ratios(totals)
+
+    def daily(self, dimension, metric, values=None, start=None, end=None):
+        """(segments x days) matrix of a measure or ratio; NaN where undefined."""
+        rows = slice(None) if values is None else [self._index[dimension][v] for v in values]
+        lo, hi = self._bounds(start, end)
+        cum = self.prefix[dimension][rows, lo:hi + 1]
+        per_day = np.diff(cum, axis=1)
+        totals = {m: per_day[..., k] for k, m in enumerate(MEASURES)}
+        if metric in totals:
+            return totals[metric]
+        return self._with_ratios(totals)[metric]
+
+    def date_strings(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return [str(d) for d in self.dates[lo:hi]]
+
+    def entity_phrases(self):
+        """
+        (folded, exact) phrase dicts for MultiPatternMatcher, one label
+        ("entity", dimension, value) per segment. Short codes (e.g. country
+        "US") must match case; longer names match case-insensitively.
+        """
+        folded, exact = {}, {}
+        for dim, vals in self.values.items():
+            if dim == TOTAL:
+                continue
+            for v in vals:
+                (exact if len(v) <= 3 else folded)[("entity", dim, v)] = [v]
+        return folded, exact
+
+    def match_entities(self, text: str) -> list:
+        """Segment values mentioned in free text, as (dimension, value) pairs in order of appearance."""
+        if self._entity_matcher is None:
+            self._entity_matcher = MultiPatternMatcher(*self.entity_phrases())
+        found = []
+        for label, _ in self._entity_matcher.scan(text):
+            if label[1:] not in found:
+                found.append(label[1:])
+        return found
+
+    def __repr__(self):
+        dims = ", ".join(f"{d}={len(v)}" for d, v in self.values.items() if d != TOTAL)
+        return f"MetricCube(dates={len(self.dates)}, {dims})"
@@ -0,0 +1,47 @@
+"""
+src/utils/pattern_matcher.py
+
+Multi-pattern phrase matcher.
+
+All phrases (keywords, metric names, segment names) are compiled into one
+regex alternation, longest phrase first, so each text is scanned once and
+every hit is mapped back to its labels with a dict lookup.
+"""
+
+import re
+
+
+class MultiPatternMatcher:
+    def __init__(self, phrases: dict, exact_phrases: dict = None):
+        """
+        phrases:       {label: [phrase, ...]}, matched ignoring case
+        exact_phrases: {label: [phrase, ...]}, matched case-sensitively
+                       (e.g. country code "US" but not the word "us")
+        A phrase may belong to several labels.
+        """
+        self._folded, self._exact = {}, {}
+        for table, source, fold in ((self._folded, phrases, True), (self._exact, exact_phrases or {}, False)):
+            for label, forms in source.items():
+                for form in forms:
+                    labels = table.setdefault(form.lower() if fold else form, [])
+                    if label not in labels:
+                        labels.append(label)
+
+        # One case-insensitive pass anchored at word starts; exact-case phrases
+        # are confirmed by the dict lookup in scan().
+        forms = sorted(set(self._folded) | set(self._exact), key=len, reverse=True)
+        alternation = "|".join(re.escape(f) for f in forms)
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE) if forms else None
+
+    def scan(self, text: str) -> list:
+        """[(label, position), ...] in order of appearance, one scan of `text`."""
+        if not text or self._pattern is None:
+            return []
+
+        hits = []
+        for m in self._pattern.finditer(text):
+            phrase = m.group(0)
+            labels = self._exact.get(phrase) or self._folded.get(phrase.lower(), [])
+            for label in labels:
+                hits.append((label, m.start()))
+        return hits
@@ -0,0 +1,260 @@
+"""
+src/utils/profiler.py
+
+Per-stage profiling for Orchestrator runs.
+
+Two modes:
+- "deterministic": cProfile + tracemalloc around each stage. Threads started
+  inside a stage (e.g. CreativeAgent's chunk pool) get their own profiler,
+  merged into the stage's. Threads that were already running, such as the
+  log writer, are not seen. Writes <stage>.prof (load with pstats /
+  snakeviz) and <stage>.alloc.txt.
+- "sampling": a background thread samples the stack of every thread every
+  few milliseconds. Overhead is low enough for production runs. Writes
+  <stage>.samples.txt in collapsed-stack format (flamegraph.pl / speedscope),
+  each stack rooted at its thread name.
+
+Both modes finish with a combined hotspots.md listing the top-N functions
+(and allocation sites, in deterministic mode) of every stage.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+class StackSampler:
+    """Samples the Python stack of every thread (but itself) at a fixed interval."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stage = None
+        self.samples = {}  # stage -> Counter of stack tuples, rooted at "[thread name]"
+        self.ticks = Counter()  # stage -> sampling rounds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stage = self.stage
+            if stage is None:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            counter = self.samples.setdefault(stage, Counter())
+            self.ticks[stage] += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    stack.append(f"[{names.get(thread_id, thread_id)}]")
+                    counter[tuple(reversed(stack))] += 1
+
+
+class StageProfiler:
+    def __init__(self, out_dir, mode="deterministic", top_n=25, sample_interval=0.005):
+        if mode not in ("deterministic", "sampling"):
+            raise ValueError(f"Unknown profile mode: {mode}")
+
+        self.out_dir = out_dir
+        self.mode = mode
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+
+        self.run_dir = None
+        self.stages = []  # per-stage stats, in execution order
+        self._sampler = None
+
+    # -------------------------------------------------------------------
+    # PUBLIC METHODS
+    # -------------------------------------------------------------------
+
+    def begin(self, run_id: str):
+        self.run_dir = os.path.join(self.out_dir, run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.stages = []
+
+        if self.mode == "sampling":
+            self._sampler = StackSampler(self.sample_interval)
+            self._sampler.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.run_dir is None:
+            raise RuntimeError("StageProfiler.begin(run_id) must be called before profiling stages")
+
+        if self.mode == "sampling":
+            with self._sampling_stage(name):
+                yield
+        else:
+            with self._deterministic_stage(name):
+                yield
+
+    def finish(self) -> str:
+        """Stop sampling (if any) and write the combined hotspot report."""
+        if self._sampler is not None:
+            self._sampler.stop()
+            for stage in self.stages:
+                self._write_samples(stage)
+            self._sampler = None
+
+        path = os.path.join(self.run_dir, "hotspots.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self._render_report())
+        return path
+
+    # -------------------------------------------------------------------
+    # INTERNAL METHODS
+    # -------------------------------------------------------------------
+
+    @contextmanager
+    def _deterministic_stage(self, name):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        mem_before = tracemalloc.get_traced_memory()[0]
+
+        # One profiler per thread started during the stage
+        thread_profiles = []
+
+        def profile_thread(frame, event, arg):
+            thread_profile = cProfile.Profile()
+            thread_profiles.append(thread_profile)
+            thread_profile.enable()
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        threading.setprofile(profile_thread)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            threading.setprofile(None)
+            wall = time.perf_counter() - start
+            mem_now, mem_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+            stats = pstats.Stats(profile)
+            for thread_profile in thread_profiles:
+                thread_profile.create_stats()
+                if thread_profile.stats:
+                    stats.add(thread_profile)
+            stats.dump_stats(os.path.join(self.run_dir, f"{name}.prof"))
+
+            allocations = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ]).statistics("lineno")[: self.top_n]
+
+            with open(os.path.join(self.run_dir, f"{name}.alloc.txt"), "w", encoding="utf-8") as f:
+                for stat in allocations:
+                    f.write(f"{stat}\n")
+
+            self.stages.append({
+                "name": name,
+                "wall_seconds": wall,
+                "peak_mb": (mem_peak - mem_before) / 1e6,
+                "retained_mb": (mem_now - mem_before) / 1e6,
+                "functions": self._top_functions(stats),
+                "allocations": [str(stat) for stat in allocations],
+                "threads": 1 + len(thread_profiles),
+            })
+
+    @contextmanager
+    def _sampling_stage(self, name):
+        self._sampler.stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sampler.stage = None
+            self.stages.append({
+                "name": name,
+                "wall_seconds": time.perf_counter() - start,
+                "functions": [],
+            })
+
+    def _top_functions(self, stats):
+        """Top-N (cumulative_seconds, self_seconds, calls, label) by cumulative time."""
+        rows = []
+        for (filename, lineno, func), (cc, nc, tt, ct, _) in stats.stats.items():
+            label = f"{func} ({os.path.basename(filename)}:{lineno})"
+            rows.append((ct, tt, nc, label))
+        rows.sort(reverse=True)
+        return rows[: self.top_n]
+
+    def _write_samples(self, stage):
+        counter = self._sampler.samples.get(stage["name"], Counter())
+        with open(os.path.join(self.run_dir, f"{stage['name']}.samples.txt"), "w", encoding="utf-8") as f:
+            for stack, count in counter.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+
+        # Inclusive samples per frame, and self samples at the leaf. Stacks
+        # start with their "[thread]" root, which the function table skips.
+        inclusive, leaf, threads = Counter(), Counter(), set()
+        for stack, count in counter.items():
+            threads.add(stack[0])
+            for frame in set(stack[1:]):
+                inclusive[frame] += count
+            leaf[stack[-1]] += count
+
+        # One round samples every thread, so seconds are per round: threads add up
+        ticks = self._sampler.ticks.get(stage["name"]) or 1
+        stage["samples"] = sum(counter.values())
+        stage["threads"] = len(threads)
+        stage["functions"] = [
+            (inclusive[frame] / ticks * stage["wall_seconds"],
+             leaf[frame] / ticks * stage["wall_seconds"],
+             inclusive[frame],
+             frame)
+            for frame, _ in inclusive.most_common(self.top_n)
+        ]
+
+    def _render_report(self):
+        out = io.StringIO()
+        out.write(f"# Profile report ({self.mode})\n\n")
+        if self.mode == "deterministic":
+            out.write("Threads already running when a stage starts (e.g. the log writer) are not profiled.\n\n")
+        else:
+            out.write("Every thread is sampled; times of concurrent threads add up.\n\n")
+        out.write("| Stage | Wall (s) | Peak alloc (MB) | Threads |\n|---|---|---|---|\n")
+        for stage in self.stages:
+            peak = f"{stage['peak_mb']:.1f}" if "peak_mb" in stage else "n/a"
+            out.write(f"| {stage['name']} | {stage['wall_seconds']:.3f} | {peak} | {stage.get('threads', 1)} |\n")
+
+        count_label = "Samples" if self.mode == "sampling" else "Calls"
+        for stage in self.stages:
+            out.write(f"\n## {stage['name']} — top {self.top_n} by cumulative time\n\n")
+            out.write(f"| Cumulative (s) | Self (s) | {count_label} | Function |\n|---|---|---|---|\n")
+            for cumulative, self_time, calls, label in stage["functions"]:
+                out.write(f"| {cumulative:.4f} | {self_time:.4f} | {calls} | `{label}` |\n")
+
+            if stage.get("allocations"):
+                out.write(f"\n### {stage['name']} — top allocation sites\n\n")
+                for line in stage["allocations"]:
+                    out.write(f"- `{line}`\n")
+
+        return out.getvalue()
@@ -0,0 +1,158 @@
+"""
+src/utils/query_plan.py
+
+Compiles the user query and PlannerAgent tasks into typed data operations.
+
+The user query is scanned with MultiPatternMatcher for topic keywords
+(daily trend, creatives, audiences, low CTR), metric names and a date
+window ("last month", "last 14 days"). Planner tasks only stand in when
+the query names no topic: they tend to mention every angle, which would
+turn a targeted question back into the full plan. The result is a DataPlan that
+DataAgent executes: only the listed summaries are computed, over only the
+requested window, with only the requested ratio metrics in the output.
+Segment filters (e.g. creative_type in {Image, Video}) are resolved by
+DataAgent against the values present in the data, from the user query
+only: planner tasks may name segments the user never asked to restrict to.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from src.utils.pattern_matcher import MultiPatternMatcher
+
+
+# kind -> (summary key, DataAgent method, group-by dimensions)
+OPERATIONS = {
+    "daily": ("daily_summary", "summarize_daily", ("date",)),
+    "creative": ("creative_summary", "summarize_by_creative", ("campaign_name", "adset_name", "creative_message")),
+    "creative_type": ("creative_type_summary", "summarize_by_creative_type", ("creative_type",)),
+    "audience": ("audience_summary", "summarize_by_audience", ("audience_type",)),
+    "low_ctr_ads": ("low_ctr_ads", "get_low_ctr_ads", ()),
+}
+
+RATIO_METRICS = ("ctr", "roas")
+
+# Operations whose ratio columns follow the requested metrics. creative and
+# low_ctr_ads keep CTR: CreativeAgent selects on it.
+PROJECTABLE = ("daily", "creative_type", "audience")
+
+TOPICS = {
+    "daily": ["daily", "trend", "trends", "over time", "drop", "dropped", "decline", "declined", "change",
+              "fluctuation", "fluctuations", "week over week", "day by day", "time series"],
+    "creative": ["creative", "creatives", "message", "messages", "headline", "headlines", "copy",
+                 "recommend", "recommendation", "recommendations", "improve", "ad text"],
+    "creative_type": ["creative type", "creative types", "format", "formats", "video", "image", "ugc", "carousel"],
+    "audience": ["audience", "audiences", "targeting", "retargeting", "lookalike", "broad", "interest"],
+    "low_ctr_ads": ["low ctr", "low-ctr", "underperforming", "underperform", "worst ads", "poor ctr"],
+}
+
+METRIC_WORDS = {
+    "ctr": ["ctr", "click-through rate", "click through rate"],
+    "roas": ["roas", "return on ad spend"],
+}
+
+WINDOW_WORDS = {
+    7: ["last week", "past week", "this week"],
+    14: ["last two weeks", "past two weeks", "last fortnight"],
+    30: ["last month", "past month", "this month"],
+    90: ["last quarter", "past quarter", "last three months"],
+}
+
+_N_DAYS = re.compile(r"\b(?:last|past)\s+(\d+)\s+(day|days|week|weeks|month|months)\b", re.IGNORECASE)
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30}
+
+_matcher = MultiPatternMatcher({
+    **{("op", k): v for k, v in TOPICS.items()},
+    **{("metric", k): v for k, v in METRIC_WORDS.items()},
+    **{("window", k): v for k, v in WINDOW_WORDS.items()},
+})
+
+
+@dataclass(frozen=True)
+class DataOp:
+    kind: str
+    summary_key: str
+    method: str
+    group_by: tuple = ()
+
+
+@dataclass
+class DataPlan:
+    ops: list
+    metrics: tuple = ()
+    window_days: int = None
+    texts: list = field(default_factory=list)     # filter source: the user query
+    filters: dict = field(default_factory=dict)   # resolved by DataAgent
+
+    @property
+    def kinds(self):
+        return [op.kind for op in self.ops]
+
+    def describe(self) -> dict:
+        return {
+            "operations": self.kinds,
+            "metrics": list(self.metrics),
+            "window_days": self.window_days,
+            "filters": self.filters,
+        }
+
+
+def make_op(kind) -> DataOp:
+    summary_key, method, group_by = OPERATIONS[kind]
+    return DataOp(kind, summary_key, method, group_by)
+
+
+def full_plan() -> DataPlan:
+    """Every summary over all history: the behaviour without a planner."""
+    return DataPlan(ops=[make_op(k) for k in OPERATIONS])
+
+
+def _scan(texts):
+    """(operation kinds, metrics in order of mention, window lengths in days) named in texts."""
+    kinds, metrics, windows = set(), [], []
+    for text in texts:
+        for (group, value), _ in _matcher.scan(text):
+            if group == "op":
+                kinds.add(value)
+            elif group == "metric":
+                if value not in metrics:
+                    metrics.append(value)
+            else:
+                windows.append(value)
+        for count, unit in _N_DAYS.findall(text):
+            windows.append(int(count) * _UNIT_DAYS[unit.lower().rstrip("s")])
+    return kinds, metrics, windows
+
+
+def compile_plan(plan: dict = None, user_query: str = "") -> DataPlan:
+    """
+    plan: PlannerAgent output ({"tasks": [{"task": ...}, ...]}) or None.
+    Operations and metrics come from the user query; the planner tasks are
+    used only when the query names no topic. The window is taken from the
+    query alone, like segment filters. Falls back to full_plan() when
+    nothing maps to an operation.
+    """
+    kinds, metrics, windows = _scan([user_query or ""])
+    if not kinds:
+        tasks = []
+        for task in (plan or {}).get("tasks", []):
+            if isinstance(task, dict):
+                tasks.append(str(task.get("task", "")))
+            elif isinstance(task, str):
+                tasks.append(task)
+        kinds, task_metrics, _ = _scan(tasks)
+        metrics = metrics or task_metrics
+
+    if not kinds:
+        result = full_plan()
+    else:
+        # Creative recommendations are built from creative_summary
+        if "low_ctr_ads" in kinds:
+            kinds.add("creative")
+        result = DataPlan(ops=[make_op(k) for k in OPERATIONS if k in kinds])
+
+    result.metrics = tuple(metrics)
+    # The widest window mentioned wins, so no requested period is cut off
+    result.window_days = max(windows) if windows else None
+    result.texts = [user_query] if user_query else []
+    return result
@@ -0,0 +1,102 @@
+"""
+src/utils/rate_limiter.py
+
+Thread-safe token bucket for LLM request pacing.
+
+`rate` tokens are added per second up to `capacity`; each request takes
+one token and waits until one is available. MultiLLM charges one token per
+HTTP request (every model it falls back through counts), so concurrency and
+request rate are limited independently.
+
+SharedTokenBucket keeps the same state in shared memory so several worker
+processes (see src/orchestrator/multi_account.py) draw from one budget.
+"""
+
+import multiprocessing
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        rate:     tokens added per second (<= 0 disables limiting)
+        capacity: burst size; defaults to max(1, rate)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: float = None) -> bool:
+        """Block until `tokens` are available. Returns False if `timeout` expires first."""
+        if self.rate <= 0:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def request_limiter(config):
+    """TokenBucket for LLM requests from the `llm:` config section."""
+    llm_cfg = config.get("llm", {})
+    return TokenBucket(llm_cfg.get("rate_per_sec", 2.0), llm_cfg.get("burst"))
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket shared by processes. It must reach the workers when they are
+    started (e.g. as a pool initializer argument), not through a task queue.
+    time.monotonic() is system-wide, so refill times agree across processes.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, ctx=None):
+        ctx = ctx or multiprocessing.get_context()
+        self._state = ctx.RawArray("d", 2)   # tokens, last refill time
+        super().__init__(rate, capacity)
+        self._lock = ctx.Lock()
+
+    @property
+    def _tokens(self):
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def _updated(self):
+        return self._state[1]
+
+    @_updated.setter
+    def _updated(self, value):
+        self._state[1] = value
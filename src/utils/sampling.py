@@ -0,0 +1,207 @@
+"""
+src/utils/sampling.py
+
+Seeded stratified sampling of large ad exports, with ratio error bounds.
+
+The CSV is streamed in chunks. Every row belongs to a stratum (by default
+date x campaign_name x creative_type) and draws a seeded uniform priority.
+Across the whole file, two bounded candidate pools are kept: the
+min_per_stratum lowest-priority rows of each stratum, and the max_rows
+lowest-priority rows overall. At the end the per-stratum minimums are taken
+first, and the rest of the budget is filled by priority, so the sample
+never exceeds max_rows. Each stratum's sample is then its lowest-priority
+rows, a simple random sample of it. Reading stops early once the time budget
+is spent; the estimate then covers only the rows read and is flagged
+partial. Population counts per stratum are tracked for every row read, so
+each kept row gets the post-stratification weight N_h / n_h. Additive
+measures are multiplied by that weight, which makes every sum over the
+sample an unbiased estimate of the population total.
+
+ratio_intervals() gives linearized (Taylor) confidence intervals for
+ratios such as CTR = clicks / impressions, per group, under that design.
+"""
+
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from src.utils.aggregation import WEIGHT
+from src.utils.metric_cube import MEASURES
+
+
+STRATA = ("date", "campaign_name", "creative_type")
+STRATUM = "sample_stratum"
+
+
+def estimate_rows(path, probe_bytes=1 << 20):
+    """Row count estimated from the average line length of the first MB."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(probe_bytes)
+    lines = head.count(b"\n")
+    if lines <= 1 or len(head) >= size:
+        return max(0, lines - 1)
+    return int(size / (len(head) / lines)) - 1
+
+
+def _stratum_rank(codes, u):
+    """Rank of each row within its stratum by priority u (0 = lowest)."""
+    order = np.lexsort((u, codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    rank = np.empty(len(codes), dtype=np.int64)
+    rank[order] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    return rank
+
+
+def _candidates(pool, max_rows, min_per_stratum):
+    """Rows that can still be selected: a stratum minimum or the overall budget."""
+    u = pool["_u"].to_numpy()
+    keep = _stratum_rank(pool["_code"].to_numpy(), u) < min_per_stratum
+    if len(u) > max_rows:
+        keep |= u <= np.partition(u, max_rows - 1)[max_rows - 1]
+    else:
+        keep[:] = True
+    return pool[keep]
+
+
+def _select(pool, max_rows, min_per_stratum):
+    """Stratum minimums first (lowest ranks across strata first), then the rest by priority."""
+    u = pool["_u"].to_numpy()
+    rank = _stratum_rank(pool["_code"].to_numpy(), u)
+    tier = np.minimum(rank, min_per_stratum)
+    order = np.lexsort((u, tier))[:max_rows]
+    return pool.iloc[np.sort(order)]
+
+
+def stratified_sample_csv(
+    path,
+    clean,
+    max_rows=200_000,
+    time_budget=None,
+    chunk_rows=200_000,
+    seed=42,
+    min_per_stratum=2,
+    strata=STRATA,
+):
+    """
+    clean: callable applied to each raw chunk (e.g. DataCleaner.clean_dataframe)
+    Returns (sample_df, info). sample_df has WEIGHT and STRATUM columns and
+    weighted additive measures, and at most max_rows rows.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    est_total = max(1, estimate_rows(path))
+
+    code_of, population = {}, np.zeros(0, dtype=np.int64)
+    pool = None
+    rows_read, partial = 0, False
+
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        chunk = clean(chunk)
+        if len(chunk):
+            key_codes, key_values = pd.factorize(pd.MultiIndex.from_frame(chunk[list(strata)].astype(str)))
+            codes = np.array([code_of.setdefault(k, len(code_of)) for k in key_values], dtype=np.int64)[key_codes]
+            population = np.bincount(codes, minlength=len(code_of)) + np.pad(
+                population, (0, len(code_of) - len(population))
+            )
+
+            chunk = chunk.assign(_u=rng.random(len(chunk)), _code=codes, _row=rows_read + np.arange(len(chunk)))
+            pool = chunk if pool is None else pd.concat([pool, chunk], ignore_index=True)
+            pool = _candidates(pool, max_rows, min_per_stratum)
+            rows_read += len(chunk)
+
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            partial = True
+            break
+
+    if pool is None or max_rows < 1:
+        return pd.DataFrame(), {"rows_read": rows_read, "rows_sampled": 0}
+
+    df = _select(pool, max_rows, min_per_stratum).sort_values("_row")
+
+    # Weights from the final per-stratum counts
+    codes, uniques = pd.factorize(df["_code"].to_numpy())
+    n_h = np.bincount(codes)
+    N_h = population[uniques].astype(float)
+    df = df.drop(columns=["_u", "_code", "_row"]).reset_index(drop=True)
+    df[STRATUM] = codes
+    df[WEIGHT] = (N_h / n_h)[codes]
+
+    for m in MEASURES:
+        if m in df.columns:
+            df[m] = df[m] * df[WEIGHT]
+
+    unsampled = np.setdiff1d(np.arange(len(population)), uniques)
+    info = {
+        "mode": "sample",
+        "seed": seed,
+        "strata": list(strata),
+        "strata_count": len(population),
+        # Only when there are more strata than max_rows / min_per_stratum
+        "strata_unsampled": len(unsampled),
+        "rows_unsampled_strata": int(population[unsampled].sum()),
+        "rows_read": rows_read,
+        "rows_sampled": len(df),
+        "estimated_rows": est_total,
+        "sampling_rate": round(len(df) / rows_read, 6) if rows_read else None,
+        # Time budget hit: weights and totals cover the rows read, not the file
+        "partial": partial,
+        "seconds": round(time.perf_counter() - start, 3),
+        "population": {"N_h": N_h, "n_h": n_h},
+    }
+    return df, info
+
+
+def ratio_intervals(df, group_cols, numerator, denominator, population, confidence=0.95):
+    """
+    Linearized CI of sum(numerator) / sum(denominator) per group.
+
+    df holds weighted measures plus WEIGHT and STRATUM columns (from
+    stratified_sample_csv); population is info["population"]. Returns a
+    DataFrame with the group columns plus estimate, lo, hi.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    group_cols = list(group_cols)
+
+    if group_cols:
+        g = df.groupby(group_cols, sort=False, dropna=False).ngroup().to_numpy()
+        keys = df[group_cols].drop_duplicates().reset_index(drop=True)
+    else:
+        g = np.zeros(len(df), dtype=np.int64)
+        keys = pd.DataFrame(index=[0])
+    groups = len(keys)
+
+    w = df[WEIGHT].to_numpy(dtype=float)
+    y = df[numerator].to_numpy(dtype=float)   # weighted
+    x = df[denominator].to_numpy(dtype=float)
+    Y, X = np.bincount(g, y, groups), np.bincount(g, x, groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(X > 0, Y / X, np.nan)
+
+    # Residual per row in unweighted units; rows outside a group count as 0
+    e = np.nan_to_num((y - ratio[g] * x) / w)
+
+    # Sums of e and e^2 per (group, stratum) cell
+    h = df[STRATUM].to_numpy()
+    cells, cell = np.unique(g * (int(h.max()) + 1) + h, return_inverse=True)
+    cell_g, cell_h = cells // (int(h.max()) + 1), cells % (int(h.max()) + 1)
+    sum_e = np.bincount(cell, e, len(cells))
+    sum_e2 = np.bincount(cell, e * e, len(cells))
+
+    n = population["n_h"][cell_h].astype(float)
+    N = population["N_h"][cell_h]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s2 = (sum_e2 - sum_e ** 2 / n) / (n - 1)
+        contrib = np.where(n > 1, N * N * (1 - n / N) * s2 / n, 0.0)
+        var = np.bincount(cell_g, contrib, groups)
+        se = np.sqrt(np.maximum(var, 0.0)) / X
+
+    out = keys.copy()
+    out["estimate"] = ratio
+    out["lo"] = ratio - z * se
+    out["hi"] = ratio + z * se
+    return out
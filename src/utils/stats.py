@@ -0,0 +1,308 @@
+"""
+src/utils/stats.py
+
+NumPy-vectorized statistics used by EvaluatorAgent.
+
+Every function takes a 2D array (one row per series/segment, one column per
+date) and tests all rows at once. NaN marks a missing day and is ignored.
+SciPy is not a dependency, so t and F tail probabilities are computed from
+a vectorized regularized incomplete beta function.
+"""
+
+import math
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+
+
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+
+
+@contextmanager
+def quiet_nan():
+    """Silence numpy's 'mean of empty slice' warnings for all-NaN rows."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        yield
+
+
+def as_2d(x):
+    x = np.asarray(x, dtype=float)
+    return x.reshape(1, -1) if x.ndim == 1 else x
+
+
+# -------------------------------------------------------------------
+# DISTRIBUTIONS
+# -------------------------------------------------------------------
+
+def _betacf(a, b, x, iterations=200, eps=1e-12):
+    """Continued fraction for the incomplete beta (modified Lentz), elementwise."""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = np.where(np.abs(d) < tiny, tiny, d)
+    d = 1.0 / d
+    h = d.copy()
+
+    for m in range(1, iterations + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        d = 1.0 / d
+        h *= d * c
+
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if np.all(np.abs(delta - 1.0) < eps):
+            break
+
+    return h
+
+
+def betainc(a, b, x):
+    """Regularized incomplete beta I_x(a, b), elementwise over broadcast inputs."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, b, x)))
+    out = np.full(x.shape, np.nan)
+
+    valid = np.isfinite(a) & np.isfinite(b) & np.isfinite(x) & (a > 0) & (b > 0)
+    out[valid & (x <= 0)] = 0.0
+    out[valid & (x >= 1)] = 1.0
+    inner = valid & (x > 0) & (x < 1)
+    if not inner.any():
+        return out
+
+    a, b, x = a[inner], b[inner], x[inner]
+    log_front = _lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+    front = np.exp(log_front)
+
+    # Use the symmetry relation where the continued fraction converges faster
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    result = np.empty_like(x)
+    d = ~swap
+    result[d] = front[d] * _betacf(a[d], b[d], x[d]) / a[d]
+    result[swap] = 1.0 - front[swap] * _betacf(b[swap], a[swap], 1.0 - x[swap]) / b[swap]
+    out[inner] = result
+    return np.clip(out, 0.0, 1.0)
+
+
+def t_two_sided_p(t, df):
+    """Two-sided p-value of Student's t; NaN where undefined."""
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=float), np.asarray(df, dtype=float))
+    return betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def f_sf(f, d1, d2):
+    """Survival function of the F distribution."""
+    f, d1, d2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (f, d1, d2)))
+    return betainc(d2 / 2.0, d1 / 2.0, d2 / (d2 + d1 * f))
+
+
+# -------------------------------------------------------------------
+# TESTS
+# -------------------------------------------------------------------
+
+def welch_t(mean1, var1, n1, mean2, var2, n2):
+    """Welch's t statistic for (mean2 - mean1) and its degrees of freedom."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        se1, se2 = var1 / n1, var2 / n2
+        se = np.sqrt(se1 + se2)
+        t = (mean2 - mean1) / se
+        df = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    return np.where(se > 0, t, np.nan), df
+
+
+def welch(mean1, var1, n1, mean2, var2, n2):
+    """Welch's t-test for (mean2 - mean1). Returns (t, df, p)."""
+    t, df = welch_t(mean1, var1, n1, mean2, var2, n2)
+    return t, df, t_two_sided_p(t, df)
+
+
+def cohens_d(mean1, var1, n1, mean2, var2, n2):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled = ((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2)
+        d = (mean2 - mean1) / np.sqrt(pooled)
+    return np.where(np.isfinite(d), d, np.nan)
+
+
+def rolling_mean(x, window):
+    """Trailing rolling mean per row (NaN-aware); NaN until `window` days are seen."""
+    x = as_2d(x)
+    valid = np.isfinite(x)
+    sums = np.cumsum(np.where(valid, x, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts[:, window:] = counts[:, window:] - counts[:, :-window]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = sums / counts
+    out[:, : window - 1] = np.nan
+    return np.where(counts > 0, out, np.nan)
+
+
+def trend(x):
+    """
+    OLS slope of each row against its day index.
+
+    Returns dict of arrays: slope, t, p, n, mean.
+    """
+    x = as_2d(x)
+    valid = np.isfinite(x)
+    n = valid.sum(axis=1).astype(float)
+    idx = np.broadcast_to(np.arange(x.shape[1], dtype=float), x.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        y = np.where(valid, x, 0.0)
+        t_idx = np.where(valid, idx, 0.0)
+        mean_t = t_idx.sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dt = np.where(valid, idx - mean_t[:, None], 0.0)
+        dy = np.where(valid, x - mean_y[:, None], 0.0)
+        sxx = (dt * dt).sum(axis=1)
+        slope = (dt * dy).sum(axis=1) / sxx
+        resid = np.where(valid, dy - slope[:, None] * dt, 0.0)
+        dof = n - 2
+        se = np.sqrt((resid * resid).sum(axis=1) / dof / sxx)
+        t = slope / se
+
+    t = np.where((dof > 0) & (se > 0), t, np.nan)
+    return {"slope": slope, "t": t, "p": t_two_sided_p(t, dof), "n": n, "mean": mean_y}
+
+
+def change_point(x, min_size=1):
+    """
+    Single mean-shift change point per row.
+
+    Scores every split with cumulative sums (O(days) per row) and keeps the
+    split with the largest |Welch t| (largest |mean shift| where variance is
+    undefined). Because the best of many splits is kept, its Welch p-value
+    is Bonferroni-corrected for the number of splits searched. Returns dict
+    of arrays: index (first day after the shift), before, after, effect
+    (after - before), t, p, d (Cohen's d), splits (candidates searched).
+    """
+    x = as_2d(x)
+    rows, days = x.shape
+    if days < 2:
+        nan = np.full(rows, np.nan)
+        return {"index": np.zeros(rows, dtype=int), "before": nan, "after": nan,
+                "effect": nan, "t": nan, "p": nan, "d": nan, "splits": np.zeros(rows, dtype=int)}
+
+    valid = np.isfinite(x)
+    v = np.where(valid, x, 0.0)
+
+    c = np.cumsum(valid, axis=1).astype(float)
+    s = np.cumsum(v, axis=1)
+    ss = np.cumsum(v * v, axis=1)
+    total_c, total_s, total_ss = c[:, -1:], s[:, -1:], ss[:, -1:]
+
+    # Split k puts days [0, k) before and [k, days) after; k runs over 1..days-1
+    n1, s1, ss1 = c[:, :-1], s[:, :-1], ss[:, :-1]
+    n2, s2, ss2 = total_c - n1, total_s - s1, total_ss - ss1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m1, m2 = s1 / n1, s2 / n2
+        var1 = (ss1 - n1 * m1 * m1) / (n1 - 1)
+        var2 = (ss2 - n2 * m2 * m2) / (n2 - 1)
+        var1, var2 = np.maximum(var1, 0.0), np.maximum(var2, 0.0)
+        # t only: p-values are computed for the winning split alone
+        t, _ = welch_t(m1, var1, n1, m2, var2, n2)
+
+    allowed = (n1 >= min_size) & (n2 >= min_size)
+    score = np.where(allowed & np.isfinite(t), np.abs(t), -np.inf)
+    fallback = np.where(allowed & np.isfinite(m2 - m1), np.abs(m2 - m1), -np.inf)
+    use_t = np.isfinite(score).any(axis=1)
+    best = np.where(use_t, np.argmax(score, axis=1), np.argmax(fallback, axis=1))
+
+    r = np.arange(rows)
+    mean1, mean2 = m1[r, best], m2[r, best]
+    v1, v2, c1, c2 = var1[r, best], var2[r, best], n1[r, best], n2[r, best]
+    t_best, _, p_best = welch(mean1, v1, c1, mean2, v2, c2)
+    splits = np.isfinite(score).sum(axis=1)
+    p_best = np.minimum(1.0, p_best * np.maximum(splits, 1))
+
+    return {
+        "index": best + 1,
+        "before": mean1,
+        "after": mean2,
+        "effect": mean2 - mean1,
+        "t": t_best,
+        "p": p_best,
+        "d": cohens_d(mean1, v1, c1, mean2, v2, c2),
+        "splits": splits,
+    }
+
+
+def holm(p):
+    """Holm-Bonferroni adjusted p-values for one family of tests; NaN entries are left out."""
+    p = np.asarray(p, dtype=float)
+    out = np.full(p.shape, np.nan)
+    finite = np.flatnonzero(np.isfinite(p))
+    m = len(finite)
+    if m:
+        order = finite[np.argsort(p[finite], kind="stable")]
+        out[order] = np.minimum(1.0, np.maximum.accumulate(p[order] * (m - np.arange(m))))
+    return out
+
+
+def window_compare(x, window):
+    """Welch test of the last `window` days against the `window` days before them."""
+    x = as_2d(x)
+    recent = x[:, -window:]
+    prior = x[:, -2 * window:-window] if x.shape[1] > window else x[:, :0]
+
+    def moments(a):
+        n = np.isfinite(a).sum(axis=1).astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"), quiet_nan():
+            mean = np.nanmean(a, axis=1) if a.shape[1] else np.full(a.shape[0], np.nan)
+            var = np.nanvar(a, axis=1, ddof=1) if a.shape[1] else np.full(a.shape[0], np.nan)
+        return mean, var, n
+
+    m1, v1, n1 = moments(prior)
+    m2, v2, n2 = moments(recent)
+    t, _, p = welch(m1, v1, n1, m2, v2, n2)
+    return {"prior": m1, "recent": m2, "effect": m2 - m1, "t": t, "p": p}
+
+
+def paired_difference(a, b):
+    """Paired t-test of (a - b) over aligned days. Returns dict: mean, t, p, n."""
+    diff = as_2d(a) - as_2d(b)
+    n = np.isfinite(diff).sum(axis=1).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"), quiet_nan():
+        mean = np.nanmean(diff, axis=1)
+        sd = np.nanstd(diff, axis=1, ddof=1)
+        t = mean / (sd / np.sqrt(n))
+    t = np.where((n > 1) & (sd > 0), t, np.nan)
+    return {"mean": mean, "t": t, "p": t_two_sided_p(t, n - 1), "n": n}
+
+
+def one_way_anova(x):
+    """One-way ANOVA across rows (groups), each row a sample over days. Returns (F, p)."""
+    x = as_2d(x)
+    valid = np.isfinite(x)
+    n_i = valid.sum(axis=1).astype(float)
+    keep = n_i > 0
+    x, valid, n_i = x[keep], valid[keep], n_i[keep]
+
+    k, n = len(n_i), n_i.sum()
+    if k < 2 or n - k < 1:
+        return np.nan, np.nan
+
+    v = np.where(valid, x, 0.0)
+    means = v.sum(axis=1) / n_i
+    grand = v.sum() / n
+    ss_between = (n_i * (means - grand) ** 2).sum()
+    ss_within = (np.where(valid, x - means[:, None], 0.0) ** 2).sum()
+    if ss_within <= 0:
+        return np.nan, np.nan
+
+    f = (ss_between / (k - 1)) / (ss_within / (n - k))
+    return float(f), float(f_sf(f, k - 1, n - k))
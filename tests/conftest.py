@@ -0,0 +1,54 @@
+"""
+Shared test fixtures.
+
+cube_summary builds a pipeline summary around a MetricCube from hand-made
+daily rows; creative_summary builds the creative_summary records that
+CreativeAgent selects from.
+"""
+
+import pandas as pd
+import pytest
+
+from src.utils.metric_cube import MetricCube
+
+
+# Measures of one hand-made row; a CTR is applied to these impressions
+DAY = {"impressions": 100000, "clicks": 2000.0, "spend": 100.0, "revenue": 200.0, "purchases": 2}
+
+
+@pytest.fixture
+def cube_summary():
+    """
+    Factory: cube_summary(series, dimension="audience_type", start="2025-01-01").
+
+    series: {segment: [day, ...]}, one entry per consecutive day. A day is
+    a CTR (float) or a dict of measures overriding DAY.
+    """
+    def build(series, dimension="audience_type", start="2025-01-01"):
+        rows = []
+        for segment, days in series.items():
+            for offset, day in enumerate(days):
+                values = dict(DAY, **day) if isinstance(day, dict) else dict(DAY, clicks=day * DAY["impressions"])
+                rows.append({"date": pd.Timestamp(start) + pd.Timedelta(days=offset), dimension: segment, **values})
+        df = pd.DataFrame(rows)
+        return {
+            "dataset_info": {"rows": len(df)},
+            "daily_summary": [],
+            "creative_summary": [],
+            "audience_summary": [],
+            "metric_cube": MetricCube.from_dataframe(df),
+        }
+
+    return build
+
+
+@pytest.fixture
+def creative_summary():
+    """Factory: creative_summary(messages, ctr=0.005), one creative per message in campaigns C0, C1, ..."""
+    def build(messages, ctr=0.005):
+        return {"creative_summary": [
+            {"campaign_name": f"C{i}", "creative_message": m, "ctr": ctr, "creative_type": "Image"}
+            for i, m in enumerate(messages)
+        ]}
+
+    return build
@@ -0,0 +1,75 @@
+"""
+Unit tests for mergeable aggregation.
+
+These tests ensure:
+- CTR/ROAS are derived from summed totals, not averaged per row
+- a group with no impressions or spend gets 0, like a cleaned row
+- aggregates of partitions merge to the aggregate of the whole
+- DataAgent summaries carry the additive components and row counts
+"""
+
+import pandas as pd
+import pytest
+
+from src.agents.data_agent import DataAgent
+from src.utils.aggregation import ROWS, aggregate, merge
+from src.utils.cleaner import DataCleaner
+from src.utils.data_generator import SyntheticAdsGenerator
+
+
+@pytest.fixture(scope="module")
+def df():
+    raw = SyntheticAdsGenerator(seed=3, campaigns=3, creatives=6, days=10).generate_chunk(3000)
+    return DataCleaner().clean_dataframe(raw)
+
+
+def test_ratios_weighted_by_totals():
+    rows = pd.DataFrame({
+        "audience_type": ["Broad", "Broad"],
+        "impressions": [100, 10_000_000],
+        "clicks": [50, 100_000],
+        "spend": [1.0, 1000.0],
+        "revenue": [10.0, 500.0],
+        "purchases": [1, 10],
+    })
+    result = aggregate(rows, ["audience_type"]).loc["Broad"]
+
+    assert result["ctr"] == pytest.approx(100_050 / 10_000_100)
+    assert result["roas"] == pytest.approx(510 / 1001)
+    assert result[ROWS] == 2
+
+
+def test_zero_denominator_gives_zero():
+    rows = pd.DataFrame({
+        "audience_type": ["Broad", "Lookalike"],
+        "impressions": [0, 1000],
+        "clicks": [0, 10],
+        "spend": [0.0, 50.0],
+        "revenue": [0.0, 100.0],
+        "purchases": [0, 1],
+    })
+    result = aggregate(rows, ["audience_type"])
+
+    assert result.loc["Broad", "ctr"] == 0.0 and result.loc["Broad", "roas"] == 0.0
+    assert result.loc["Lookalike", "roas"] == pytest.approx(2.0)
+    assert merge([result], ["audience_type"])["ctr"].notna().all()
+
+
+def test_partitions_merge_to_whole(df):
+    whole = aggregate(df, ["date", "audience_type"])
+    halves = [aggregate(df.iloc[:1234], ["date", "audience_type"]),
+              aggregate(df.iloc[1234:], ["date", "audience_type"]).reset_index().to_dict(orient="records")]
+    merged = merge(halves, ["date", "audience_type"])
+
+    pd.testing.assert_frame_equal(merged[whole.columns], whole, check_dtype=False)
+
+
+def test_data_agent_summaries_are_additive(df):
+    agent = DataAgent("config/config.yaml")
+    daily = pd.DataFrame(agent.summarize_daily(df))
+    audience = pd.DataFrame(agent.summarize_by_audience(df))
+
+    assert daily[ROWS].sum() == len(df) == audience[ROWS].sum()
+    assert (daily["ctr"] == daily["clicks"] / daily["impressions"]).all()
+    assert {"clicks", "revenue", "purchases"} <= set(audience.columns)
+    assert audience["revenue"].sum() == pytest.approx(df["revenue"].sum())
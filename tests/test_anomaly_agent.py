@@ -0,0 +1,90 @@
+"""
+Unit tests for AnomalyAgent.
+
+These tests ensure:
+- ROAS drops, spend spikes and impression fatigue are flagged per segment
+- stable segments are not flagged
+- sparse segments (near-empty base days, few active days) are not flagged
+- flags are ranked by impact in currency within each type
+- InsightAgent skips the LLM when nothing is flagged
+"""
+
+from src.agents.anomaly_agent import AnomalyAgent
+from src.agents.insight_agent import InsightAgent
+
+
+def _day(spend, impressions, clicks, revenue):
+    return {"spend": spend, "impressions": impressions, "clicks": clicks, "revenue": revenue, "purchases": 1}
+
+
+STABLE = [_day(100.0, 10000, 200, 300.0)] * 14
+
+
+def test_flags_each_anomaly_type(cube_summary):
+    agent = AnomalyAgent("config/config.yaml")
+
+    summary = cube_summary({
+        "Stable": STABLE,
+        "RoasDrop": [_day(100.0, 10000, 200, 300.0)] * 7 + [_day(100.0, 10000, 200, 200.0)] * 7,
+        "SpendSpike": [_day(100.0, 10000, 200, 300.0)] * 10 + [_day(200.0, 10000, 200, 600.0)] * 4,
+        "Fatigue": [_day(100.0, 10000, 200, 300.0)] * 7 + [_day(100.0, 15000, 180, 300.0)] * 7,
+    }, dimension="campaign_name")
+
+    result = agent.detect(summary)
+    flagged = {(a["type"], a["segment"]) for a in result["flagged"]}
+
+    assert ("roas_drop", "RoasDrop") in flagged
+    assert ("spend_spike", "SpendSpike") in flagged
+    assert ("impression_fatigue", "Fatigue") in flagged
+    assert not any(segment == "Stable" for _, segment in flagged)
+    assert result["segments_scanned"] == 4
+
+    spike = next(a for a in result["flagged"] if a["type"] == "spend_spike")
+    assert spike["date"] == "2025-01-11"
+    assert spike["change_pct"] == 100.0
+
+
+def test_sparse_segments_are_not_flagged(cube_summary):
+    agent = AnomalyAgent("config/config.yaml")
+    idle = _day(0.0, 0, 0, 0.0)
+
+    summary = cube_summary({
+        "Stable": STABLE,
+        # A near-empty day followed by a normal one is not a spike
+        "Trickle": [_day(100.0, 10000, 200, 300.0)] * 10 + [_day(2.0, 200, 4, 6.0), _day(100.0, 10000, 200, 300.0)]
+        + [_day(100.0, 10000, 200, 300.0)] * 2,
+        # One active day with no revenue in the recent window
+        "Sporadic": [_day(100.0, 10000, 200, 300.0)] * 7 + [idle] * 6 + [_day(100.0, 10000, 200, 0.0)],
+        # A small segment's huge jump ranks below a large segment's real one
+        "Small": [_day(60.0, 6000, 120, 180.0)] * 13 + [_day(600.0, 6000, 120, 1800.0)],
+        "Large": [_day(10000.0, 10000, 200, 30000.0)] * 13 + [_day(15000.0, 10000, 200, 45000.0)],
+    }, dimension="campaign_name")
+
+    flagged = [(a["type"], a["segment"]) for a in agent.detect(summary)["flagged"]]
+
+    assert not any(segment in ("Stable", "Trickle", "Sporadic") for _, segment in flagged)
+    spikes = [segment for kind, segment in flagged if kind == "spend_spike"]
+    assert spikes == ["Large", "Small"]
+
+
+class _CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def ask_json(self, system_prompt, user_prompt):
+        self.calls += 1
+        return {"hypotheses": [{"reason": "x", "evidence": "y", "metric": "roas", "confidence": 0.5}]}
+
+
+def test_insight_agent_skips_llm_without_anomalies(cube_summary):
+    llm = _CountingLLM()
+    insight = InsightAgent("config/config.yaml", llm=llm)
+
+    summary = cube_summary({"Stable": STABLE}, dimension="campaign_name")
+    summary["anomalies"] = AnomalyAgent("config/config.yaml").detect(summary)
+
+    result = insight.generate_insights(summary)
+
+    assert llm.calls == 0
+    assert result["hypotheses"] == []
+    assert "__error" not in result
@@ -0,0 +1,154 @@
+"""
+Unit tests for CreativeAgent.
+
+These tests ensure:
+- every low-CTR creative is covered, in fixed-size chunks
+- results are merged in stable chunk order under concurrency
+- a failed chunk is retried on its own without losing the others
+- the token bucket paces requests
+- with dedup off, a message repeated across campaigns in one chunk maps back to each creative
+- a plan without the creative summary skips the stage without calling the LLM
+- MultiLLM charges its limiter once per HTTP request, fallbacks included
+"""
+
+import ast
+import threading
+import time
+
+from src.agents.creative_agent import CreativeAgent
+from src.utils import llm_client
+from src.utils.llm_client import MultiLLM
+from src.utils.rate_limiter import TokenBucket
+
+
+class _ChunkLLM:
+    """Echoes the `echo` keys of each creative; fails the first call for `flaky` messages."""
+
+    def __init__(self, flaky=(), delay=0.0, echo=("campaign", "old_message")):
+        self.flaky = set(flaky)
+        self.delay = delay
+        self.echo = echo
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def ask_json(self, system_prompt, user_prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+
+        start = user_prompt.index("[")
+        chunk = ast.literal_eval(user_prompt[start:user_prompt.index("]\n", start) + 1])
+        messages = [x["old_message"] for x in chunk]
+        with self._lock:
+            if self.flaky & set(messages):
+                self.flaky -= set(messages)
+                return {"__raw_text": "Model failed to produce a valid response."}
+
+        return {"improvements": [{k: x[k] for k in self.echo} for x in chunk]}
+
+
+def _agent(llm, **overrides):
+    agent = CreativeAgent("config/config.yaml", llm=llm)
+    agent.chunk_size = 3
+    agent.concurrency = 4
+    agent.retry_backoff = 0.0
+    for k, v in overrides.items():
+        setattr(agent, k, v)
+    return agent
+
+
+def test_all_creatives_covered_in_stable_order(creative_summary):
+    llm = _ChunkLLM(delay=0.01)
+    result = _agent(llm).generate_creatives(creative_summary([f"msg {i}" for i in range(10)]))
+
+    assert [x["old_message"] for x in result["improvements"]] == [f"msg {i}" for i in range(10)]
+    assert result["chunks"] == 4
+    assert result["creatives_covered"] == 10
+    assert llm.calls == 4
+    assert "failed_chunks" not in result
+
+
+def test_failed_chunk_is_retried_alone(creative_summary):
+    llm = _ChunkLLM(flaky={"msg 4"})
+    result = _agent(llm).generate_creatives(creative_summary([f"msg {i}" for i in range(9)]))
+
+    assert [x["old_message"] for x in result["improvements"]] == [f"msg {i}" for i in range(9)]
+    assert llm.calls == 4  # three chunks + one retry of chunk 1
+
+
+def test_exhausted_retries_keep_other_chunks(creative_summary):
+    llm = _ChunkLLM(flaky={"msg 0"})
+    result = _agent(llm, max_retries=0).generate_creatives(creative_summary([f"msg {i}" for i in range(6)]))
+
+    assert [x["old_message"] for x in result["improvements"]] == ["msg 3", "msg 4", "msg 5"]
+    assert result["failed_chunks"][0]["chunk"] == 0
+    assert "__error" not in result
+
+
+def test_repeated_message_maps_to_each_campaign_without_dedup(creative_summary):
+    summary = creative_summary(["Same msg", "Same msg", "Other msg"])
+
+    result = _agent(_ChunkLLM(echo=("id", "old_message")), dedup_enabled=False).generate_creatives(summary)
+    assert [x["campaign"] for x in result["improvements"]] == ["C0", "C1", "C2"]
+    assert "unmatched_improvements" not in result
+
+    # Without an id, (campaign, message) still tells the two apart
+    result = _agent(_ChunkLLM(), dedup_enabled=False).generate_creatives(summary)
+    assert [x["campaign"] for x in result["improvements"]] == ["C0", "C1", "C2"]
+
+    # A bare message shared by two items is ambiguous: dropped, not duplicated
+    result = _agent(_ChunkLLM(echo=("old_message",)), dedup_enabled=False).generate_creatives(summary)
+    assert [x["campaign"] for x in result["improvements"]] == ["C2"]
+    assert result["unmatched_improvements"] == 2
+
+
+def test_stage_skipped_when_plan_omits_creatives():
+    llm = _ChunkLLM()
+    result = _agent(llm).generate_creatives({"creative_type_summary": []})
+
+    assert result["improvements"] == []
+    assert result["skipped"].startswith("Skipped by plan")
+    assert llm.calls == 0
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+    assert bucket.try_acquire() is False
+
+
+class _CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(0)
+        self.acquired = 0
+
+    def acquire(self, tokens=1.0, timeout=None):
+        self.acquired += tokens
+        return True
+
+
+def test_llm_limiter_charges_each_model_request(monkeypatch):
+    def down(*args, **kwargs):
+        raise ConnectionError("model unavailable")
+
+    monkeypatch.setattr(llm_client.requests, "post", down)
+    # Bypass __init__: it needs an API key and loads the embedding model
+    llm = MultiLLM.__new__(MultiLLM)
+    llm.rate_limiter, llm.calls, llm.headers = _CountingBucket(), 0, {}
+    llm._calls_lock = threading.Lock()
+    llm.models = ["model-a", "model-b", "model-c"]
+
+    assert llm.ask("system", "user") == "Model failed to produce a valid response."
+    assert llm.rate_limiter.acquired == 3
+    assert llm.calls == 3
+
+    # Chunk worker threads share the client: the request count stays exact
+    threads = [threading.Thread(target=lambda: [llm._call_model("m", []) for _ in range(50)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert llm.calls == 3 + 400
@@ -0,0 +1,55 @@
+"""
+Unit tests for DataAgent summaries.
+
+These tests ensure:
+- creative_summary has one row per (campaign, adset, creative_message)
+- CTR and ROAS are weighted (computed from summed totals)
+- the partial-sort top-K matches a full sort by wasted spend
+- a non-positive low_roas target falls back to spend minus revenue
+"""
+
+import numpy as np
+import pytest
+
+from src.agents.data_agent import DataAgent
+from src.utils.cleaner import DataCleaner
+from src.utils.data_generator import SyntheticAdsGenerator
+
+
+@pytest.fixture(scope="module")
+def df():
+    raw = SyntheticAdsGenerator(seed=5, campaigns=6, creatives=30, days=20).generate_chunk(5000)
+    return DataCleaner().clean_dataframe(raw)
+
+
+def test_creative_summary_top_k_by_wasted_spend(df):
+    agent = DataAgent("config/config.yaml")
+    agent.creative_top_k = 15
+
+    rows = agent.summarize_by_creative(df)
+
+    keys = ["campaign_name", "adset_name", "creative_message"]
+    full = df.groupby(keys)[["spend", "impressions", "clicks", "revenue"]].sum()
+    full["wasted"] = np.maximum(full["spend"] - full["revenue"] / agent.thresholds["low_roas"], 0.0)
+    expected = full.sort_values("wasted", ascending=False).head(15)
+
+    assert len(rows) == 15
+    assert [r["wasted_spend"] for r in rows] == pytest.approx(expected["wasted"].tolist())
+
+    top = rows[0]
+    totals = full.loc[(top["campaign_name"], top["adset_name"], top["creative_message"])]
+    assert top["ctr"] == pytest.approx(totals["clicks"] / totals["impressions"])
+    assert top["roas"] == pytest.approx(totals["revenue"] / totals["spend"])
+
+
+@pytest.mark.parametrize("low_roas", [0, -1.0])
+def test_wasted_spend_without_positive_roas_target(df, low_roas):
+    agent = DataAgent("config/config.yaml")
+    agent.thresholds["low_roas"] = low_roas
+
+    rows = agent.summarize_by_creative(df)
+
+    wasted = [r["wasted_spend"] for r in rows]
+    assert np.isfinite(wasted).all()
+    assert wasted == pytest.approx([max(r["spend"] - r["revenue"], 0.0) for r in rows])
+    assert wasted == sorted(wasted, reverse=True)
@@ -0,0 +1,134 @@
+"""
+Unit tests for MessageDeduplicator.
+
+These tests ensure:
+- identical texts (modulo case/whitespace) share a cluster without an embedder
+- near-duplicates cluster by cosine similarity, in first-appearance order
+- vectors are cached by message hash and only new texts are embedded
+- the vector cache reloads from cache_path, with or without a .npz suffix
+- the cache is written atomically, once per cluster() call that embeds new texts
+- CreativeAgent generates once per cluster and fans results out
+- improvements whose old_message matches no creative are dropped
+"""
+
+import numpy as np
+import pytest
+
+from src.agents.creative_agent import CreativeAgent
+from src.utils.dedup import MessageDeduplicator
+
+
+class _BagOfWordsEmbedder:
+    VOCAB = ["comfort", "cotton", "soft", "sale", "bamboo", "breathable", "summer", "today"]
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, batch_size=32):
+        self.encoded += len(texts)
+        return np.array([[t.lower().count(w) for w in self.VOCAB] for t in texts], dtype=float)
+
+
+MESSAGES = [
+    "Soft cotton comfort sale",
+    "Bamboo breathable summer",
+    "soft  cotton comfort SALE",
+    "Soft cotton comfort sale today",
+    "Bamboo breathable summer",
+]
+
+
+def test_exact_dedup_without_embedder():
+    clusters = MessageDeduplicator().cluster(MESSAGES)
+
+    assert clusters == [[0, 2], [1, 4], [3]]
+
+
+def test_embedding_clusters_and_cache():
+    embedder = _BagOfWordsEmbedder()
+    dedup = MessageDeduplicator(embedder, threshold=0.85)
+
+    assert dedup.cluster(MESSAGES) == [[0, 2, 3], [1, 4]]
+    assert embedder.encoded == 3
+
+    dedup.cluster(MESSAGES + ["Bamboo breathable summer sale"])
+    assert embedder.encoded == 4
+
+
+def test_cache_reloads_from_path(tmp_path):
+    for name in ("vectors", "vectors.npz"):
+        path = str(tmp_path / name)
+        first = _BagOfWordsEmbedder()
+        MessageDeduplicator(first, threshold=0.85, cache_path=path).cluster(MESSAGES)
+        assert first.encoded == 3
+
+        second = _BagOfWordsEmbedder()
+        dedup = MessageDeduplicator(second, threshold=0.85, cache_path=path)
+        assert len(dedup.cache) == 3
+        assert dedup.cluster(MESSAGES) == [[0, 2, 3], [1, 4]]
+        assert second.encoded == 0
+
+
+def test_cache_saved_once_per_call_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "vectors.npz")
+    dedup = MessageDeduplicator(_BagOfWordsEmbedder(), threshold=0.85, batch_size=1, cache_path=path)
+    saves = []
+    save = dedup.save
+    monkeypatch.setattr(dedup, "save", lambda: saves.append(1) or save())
+
+    dedup.cluster(MESSAGES)
+    assert len(saves) == 1
+    dedup.cluster(MESSAGES)  # nothing new to embed
+    assert len(saves) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["vectors.npz"]
+
+    def broken(f, **arrays):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "savez", broken)
+    dedup.cache["extra"] = np.ones(8, dtype=np.float32)
+    with pytest.raises(OSError):
+        save()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["vectors.npz"]
+    assert len(MessageDeduplicator(cache_path=path).cache) == 3
+
+
+class _EchoLLM:
+    def __init__(self):
+        self.embedder = _BagOfWordsEmbedder()
+        self.calls = 0
+
+    def ask_json(self, system_prompt, user_prompt):
+        self.calls += 1
+        return {"improvements": [{"old_message": m, "new_headlines": ["H"]} for m in dict.fromkeys(MESSAGES) if m in user_prompt]}
+
+
+def test_creative_agent_generates_once_per_cluster(creative_summary):
+    llm = _EchoLLM()
+    agent = CreativeAgent("config/config.yaml", llm=llm)
+    agent.chunk_size = 1
+    agent.deduplicator.threshold = 0.85
+
+    result = agent.generate_creatives(creative_summary(MESSAGES))
+
+    assert llm.calls == 2
+    assert result["dedup"]["llm_calls_saved"] == 3
+    assert sorted(x["campaign"] for x in result["improvements"]) == [f"C{i}" for i in range(5)]
+    assert {x["old_message"] for x in result["improvements"]} == set(MESSAGES)
+
+
+class _MismatchedLLM:
+    embedder = None
+
+    def ask_json(self, system_prompt, user_prompt):
+        # Rewrites old_message, so nothing can be matched back to a creative
+        return {"improvements": [{"old_message": "Something else entirely", "new_headlines": ["H"]}]}
+
+
+def test_creative_agent_drops_unmatched_improvements(creative_summary):
+    agent = CreativeAgent("config/config.yaml", llm=_MismatchedLLM())
+    result = agent.generate_creatives(creative_summary(MESSAGES[:2]))
+
+    assert result["improvements"] == []
+    assert result["unmatched_improvements"] == 1
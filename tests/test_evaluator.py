@@ -5,10 +5,18 @@ These tests ensure:
 - evaluator loads without error
 - evaluator returns expected fields
 - hypotheses are validated numerically
+- each reason is routed by the rule table, highest-priority rule first
+- the routed metric, not the LLM's free text, is reported as tested
+- an ANOVA with no finite segment means reports insufficient data
+- video vs image aggregates are compared in the order the text names them
+- the change-point search and segment scan hold their false-positive rate
 """
 
+import numpy as np
 import pytest
 from src.agents.evaluator_agent import EvaluatorAgent
+from src.utils import stats
+from src.utils.pattern_matcher import MultiPatternMatcher
 
 
 def test_evaluator_basic_validation():
@@ -55,6 +63,197 @@ def test_evaluator_basic_validation():
     assert "numeric_support" in h
     assert "final_confidence" in h
 
-    # Numeric check: ctr dropped from 0.02 to 0.01, so validated=True
+    # ctr dropped from 0.02 to 0.01, but two days cannot be tested
+    assert h["validated"] is False
+    assert h["numeric_support"] == pytest.approx(-0.01)
+    assert h["statistics"]["insufficient_data"] is True
+
+def _series_summary(ctr_values):
+    return {
+        "daily_summary": [
+            {"date": f"2025-01-{i + 1:02d}", "ctr": v, "roas": 2.0} for i, v in enumerate(ctr_values)
+        ],
+        "creative_summary": [],
+        "audience_summary": [],
+    }
+
+
+def test_full_series_drop_is_significant():
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    # 20 stable days then a clear step down, with a little noise
+    noise = [0.0004, -0.0003, 0.0002, -0.0001, 0.0003]
+    ctr = [0.03 + noise[i % 5] for i in range(20)] + [0.02 + noise[i % 5] for i in range(10)]
+    hypotheses = {"hypotheses": [{"reason": "CTR dropped", "confidence": 0.5}]}
+
+    h = evaluator.validate(hypotheses, _series_summary(ctr))["validated_hypotheses"][0]
+
     assert h["validated"] is True
-    assert h["numeric_support"] == pytest.approx(-0.01)
\ No newline at end of file
+    assert h["p_value"] < 0.01
+    assert h["numeric_support"] == pytest.approx(-0.01, abs=1e-3)
+    assert h["statistics"]["change_date"] == "2025-01-21"
+    assert h["final_confidence"] > 0.5
+
+
+def test_last_day_dip_in_rising_series_is_not_validated():
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    # Rising series whose last day dips: the old last-two-rows check said "dropped"
+    ctr = [0.01 + 0.0005 * i for i in range(30)]
+    ctr[-1] = ctr[-2] - 0.001
+    hypotheses = {"hypotheses": [{"reason": "CTR dropped", "confidence": 0.5}]}
+
+    h = evaluator.validate(hypotheses, _series_summary(ctr))["validated_hypotheses"][0]
+
+    assert h["validated"] is False
+    assert h["final_confidence"] <= 0.5
+
+
+def test_audience_requires_significant_difference(cube_summary):
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    summary = cube_summary({
+        "Broad": [0.020, 0.021, 0.019, 0.020, 0.021, 0.019, 0.020, 0.021, 0.019, 0.020],
+        "Lookalike": [0.021, 0.019, 0.020, 0.021, 0.019, 0.020, 0.021, 0.019, 0.020, 0.021],
+    })
+    hypotheses = {"hypotheses": [{"reason": "Audience mix drives CTR differences", "confidence": 0.5}]}
+
+    h = evaluator.validate(hypotheses, summary)["validated_hypotheses"][0]
+
+    assert h["validated"] is False
+    assert h["p_value"] > 0.05
+
+
+def test_named_segments_are_compared_directly(cube_summary):
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    summary = cube_summary({
+        "Broad": [0.030, 0.031, 0.029, 0.030, 0.031, 0.029, 0.030, 0.031, 0.029, 0.030],
+        "Retargeting": [0.020, 0.021, 0.019, 0.021, 0.020, 0.019, 0.021, 0.020, 0.019, 0.020],
+    })
+    hypotheses = {"hypotheses": [
+        {"reason": "Retargeting audience outperforms Broad", "confidence": 0.6},
+        {"reason": "Broad audience beats retargeting on CTR", "confidence": 0.6},
+    ]}
+
+    wrong, right = evaluator.validate(hypotheses, summary)["validated_hypotheses"]
+
+    assert wrong["validated"] is False
+    assert wrong["final_confidence"] < 0.6
+    assert right["validated"] is True
+    assert right["p_value"] < 0.01
+    assert right["statistics"]["period_totals"]["Broad"]["ctr"] == pytest.approx(0.03)
+
+
+def test_matcher_scans_keywords_and_segments_once():
+    matcher = MultiPatternMatcher(
+        {"ctr": ["ctr", "click-through rate"], ("entity", "audience_type", "Retargeting"): ["Retargeting"]},
+        {("entity", "country", "US"): ["US"]},
+    )
+
+    hits = matcher.scan("Click-through rate fell for retargeting users in the US, not us")
+
+    assert [label for label, _ in hits] == [
+        "ctr",
+        ("entity", "audience_type", "Retargeting"),
+        ("entity", "country", "US"),
+    ]
+
+
+def test_rule_priority_and_direction(cube_summary):
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    summary = cube_summary({
+        "Broad": [0.030, 0.031, 0.029, 0.030, 0.031, 0.029, 0.030, 0.031, 0.029, 0.030],
+        "Retargeting": [0.030, 0.031, 0.029, 0.030, 0.031, 0.020, 0.021, 0.019, 0.020, 0.019],
+    })
+    hypotheses = {"hypotheses": [
+        {"reason": "Retargeting CTR dropped after a brief rise", "metric": "CTR (click rate)", "confidence": 0.5},
+        {"reason": "Retargeting audience CTR dropped below Broad", "confidence": 0.5},
+        {"reason": "Nothing measurable here", "confidence": 0.5},
+    ]}
+
+    drop, pair, none = evaluator.validate(hypotheses, summary)["validated_hypotheses"]
+
+    assert drop["rule"] == "metric_drop"
+    assert drop["routed_metric"] == "ctr"
+    assert drop["metric"] == "CTR (click rate)"
+    assert drop["validated"] is True
+    assert drop["statistics"]["segment"] == {"dimension": "audience_type", "value": "Retargeting"}
+
+    assert pair["rule"] == "segment_comparison"
+    assert pair["matched_rules"] == ["segment_comparison", "metric_drop", "audience_spread"]
+
+    assert none["rule"] is None
+    assert none["routed_metric"] is None
+    assert none["final_confidence"] == 0.5
+
+
+def test_change_point_search_is_calibrated_on_noise():
+    evaluator = EvaluatorAgent("config/config.yaml")
+    rng = np.random.default_rng(0)
+    noise = 0.02 + 0.002 * rng.standard_normal((1000, 90))
+
+    assert np.mean(stats.change_point(noise, min_size=3)["p"] <= 0.05) <= 0.05
+    for direction in (-1, 1):
+        assert evaluator._test_series(noise, direction)["validated"].mean() <= 0.05
+
+    step = noise.copy()
+    step[:, 60:] -= 0.002
+    assert evaluator._test_series(step, -1)["validated"].mean() > 0.8
+
+
+def test_holm_adjusts_one_family():
+    adjusted = stats.holm([0.01, np.nan, 0.04, 0.03])
+
+    assert np.isnan(adjusted[1])
+    assert adjusted[[0, 3, 2]] == pytest.approx([0.03, 0.06, 0.06])
+
+
+def test_matcher_cache_follows_cube_lifetime(cube_summary):
+    evaluator = EvaluatorAgent("config/config.yaml")
+    first = cube_summary({"Broad": [0.02] * 5})["metric_cube"]
+    matcher = evaluator._matcher_for(first)
+
+    assert evaluator._matcher_for(first) is matcher
+    del first
+    assert len(evaluator._matchers) == 0
+
+    second = cube_summary({"Lookalike": [0.02] * 5})["metric_cube"]
+    hits = evaluator._matcher_for(second).scan("Lookalike CTR dropped")
+    assert ("entity", "audience_type", "Lookalike") in [label for label, _ in hits]
+
+
+def test_anova_without_finite_means_is_insufficient(cube_summary):
+    evaluator = EvaluatorAgent("config/config.yaml")
+    no_spend = [{"spend": 0.0, "revenue": 0.0}] * 5
+    summary = cube_summary({"Broad": no_spend, "Lookalike": no_spend})
+    hypotheses = {"hypotheses": [{"reason": "Audience mix drives ROAS differences", "confidence": 0.5}]}
+
+    h = evaluator.validate(hypotheses, summary)["validated_hypotheses"][0]
+
+    assert h["rule"] == "audience_spread"
+    assert h["validated"] is False
+    assert h["statistics"]["insufficient_data"] is True
+
+
+def test_aggregate_compare_follows_text_order():
+    evaluator = EvaluatorAgent("config/config.yaml")
+    summary = {"creative_type_summary": [
+        {"creative_type": "Video", "ctr": 0.010},
+        {"creative_type": "Image", "ctr": 0.020},
+    ]}
+    hypotheses = {"hypotheses": [
+        {"reason": "Image outperforms video on CTR", "confidence": 0.5},
+        {"reason": "Video outperforms image on CTR", "confidence": 0.5},
+        {"reason": "Video underperforms image on CTR", "confidence": 0.5},
+    ]}
+
+    image_first, video_first, video_worse = evaluator.validate(hypotheses, summary)["validated_hypotheses"]
+
+    assert image_first["rule"] == "video_vs_image"
+    assert image_first["validated"] is True
+    assert image_first["numeric_support"] == pytest.approx(0.01)
+    assert image_first["statistics"]["test"] == "aggregate difference (image - video)"
+    assert video_first["validated"] is False
+    assert video_worse["validated"] is True
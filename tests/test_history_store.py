@@ -0,0 +1,133 @@
+"""
+Unit tests for HistoryStore.
+
+These tests ensure:
+- a run's metrics, hypotheses and creatives are stored and read back
+- metric and hypothesis trends are ordered by data window across runs
+- filters by account and date range use the stored window
+- hypotheses are indexed by the evaluator's routed metric, not the LLM's text
+- runs are keyed by (account, run_id): accounts sharing a run_id keep both runs
+- runs with segment filters are left out of TOTAL trends unless asked for
+- a database keyed by run_id alone is migrated in place
+"""
+
+import sqlite3
+
+import pytest
+
+from src.utils.history_store import HistoryStore
+
+
+def _summary(cube_summary, start, roas):
+    day = {"spend": 100.0, "impressions": 10000, "clicks": 150, "purchases": 3, "revenue": 100.0 * roas}
+    return cube_summary({"Summer": [day] * 7}, dimension="campaign_name", start=start)
+
+
+def _validated(p):
+    return {"validated_hypotheses": [
+        {"reason": "ROAS dropped", "metric": "ROAS / revenue efficiency", "routed_metric": "roas",
+         "rule": "metric_drop", "validated": p < 0.05, "p_value": p, "final_confidence": 0.7},
+    ]}
+
+
+def test_record_and_query_trends(tmp_path, cube_summary):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+
+    store.record_run("r1", "acme", "q", _summary(cube_summary, "2025-01-01", 3.0), _validated(0.2),
+                     {"improvements": [{"campaign": "Summer", "old_message": "m"}]})
+    store.record_run("r2", "acme", "q", _summary(cube_summary, "2025-01-08", 2.4), _validated(0.01))
+    store.record_run("r3", "other", "q", _summary(cube_summary, "2025-01-08", 9.0), _validated(0.5))
+
+    trend = store.metric_trend("roas", account="acme")
+    assert [r["run_id"] for r in trend] == ["r1", "r2"]
+    assert trend[1]["change_pct"] == pytest.approx(-20.0)
+
+    segment = store.metric_trend("roas", account="acme", dimension="campaign_name", segment="Summer")
+    assert [r["value"] for r in segment] == pytest.approx([3.0, 2.4])
+
+    hyps = store.hypothesis_trend("ROAS", account="acme")
+    assert [(r["run_id"], r["validated"]) for r in hyps] == [("r1", 0), ("r2", 1)]
+
+    assert {r["run_id"] for r in store.runs(since="2025-01-10")} == {"r2", "r3"}
+    assert [r["run_id"] for r in store.runs(account="acme", until="2025-01-07")] == ["r1"]
+
+    run = store.run("r1")
+    assert run["date_start"] == "2025-01-01" and run["date_end"] == "2025-01-07"
+    assert run["creatives"][0]["campaign"] == "Summer"
+
+    # Re-recording replaces the run rather than duplicating it
+    store.record_run("r1", "acme", "q", _summary(cube_summary, "2025-01-01", 3.0), _validated(0.2))
+    assert len(store.metric_trend("roas", account="acme")) == 2
+    assert store.run("r1")["creatives"] == []
+    store.close()
+
+
+def test_same_run_id_in_two_accounts(tmp_path, cube_summary):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+
+    store.record_run("r1", "acme", "q", _summary(cube_summary, "2025-01-01", 3.0), _validated(0.2))
+    store.record_run("r1", "other", "q", _summary(cube_summary, "2025-01-01", 9.0), _validated(0.5),
+                     {"improvements": [{"campaign": "Summer", "old_message": "m"}]})
+
+    assert [r["value"] for r in store.metric_trend("roas", account="acme")] == pytest.approx([3.0])
+    assert [r["value"] for r in store.metric_trend("roas", account="other")] == pytest.approx([9.0])
+    assert store.run("r1", account="acme")["creatives"] == []
+    assert len(store.run("r1", account="other")["hypotheses"]) == 1
+    assert len(store.runs()) == 2
+    store.close()
+
+
+def test_filtered_runs_left_out_of_total_trends(tmp_path, cube_summary):
+    store = HistoryStore(str(tmp_path / "history.sqlite"))
+    filtered = _summary(cube_summary, "2025-01-08", 5.0)
+    filtered["dataset_info"]["data_plan"] = {"window_days": 7, "filters": {"creative_type": ["Video"]}}
+
+    store.record_run("r1", "acme", "q", _summary(cube_summary, "2025-01-01", 3.0))
+    store.record_run("r2", "acme", "video only", filtered)
+
+    assert [r["run_id"] for r in store.metric_trend("roas", account="acme")] == ["r1"]
+    assert [r["run_id"] for r in store.metric_trend("roas", account="acme", include_filtered=True)] == ["r1", "r2"]
+    segment = store.metric_trend("roas", account="acme", dimension="campaign_name", segment="Summer")
+    assert [r["run_id"] for r in segment] == ["r1", "r2"]
+
+    run = store.run("r2")
+    assert run["filters"] == {"creative_type": ["Video"]}
+    assert run["window_days"] == 7
+    store.close()
+
+
+def test_run_id_keyed_database_is_migrated(tmp_path, cube_summary):
+    path = str(tmp_path / "history.sqlite")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE runs (run_id TEXT PRIMARY KEY, account TEXT NOT NULL, created_at TEXT NOT NULL, query TEXT,
+                           date_start TEXT, date_end TEXT, rows INTEGER, summary TEXT);
+        CREATE INDEX idx_runs_account_dates ON runs (account, date_start, date_end);
+        CREATE TABLE metrics (run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE, account TEXT NOT NULL,
+                              date_start TEXT, date_end TEXT, dimension TEXT NOT NULL, segment TEXT NOT NULL,
+                              metric TEXT NOT NULL, value REAL);
+        CREATE INDEX idx_metrics_run ON metrics (run_id);
+        CREATE TABLE hypotheses (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL REFERENCES runs (run_id),
+                                 account TEXT NOT NULL, date_start TEXT, date_end TEXT, metric TEXT, rule TEXT,
+                                 reason TEXT, validated INTEGER, numeric_support REAL, p_value REAL,
+                                 effect_size REAL, final_confidence REAL, payload TEXT);
+        CREATE TABLE creatives (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL REFERENCES runs (run_id),
+                                account TEXT NOT NULL, campaign TEXT, adset TEXT, old_message TEXT, payload TEXT);
+        INSERT INTO runs VALUES ('r1', 'acme', '2025-01-08T00:00:00', 'q', '2025-01-01', '2025-01-07', 7,
+                                 '{"dataset_info": {"data_plan": {"window_days": 7, "filters": {"audience_type": ["Broad"]}}}}');
+        INSERT INTO metrics VALUES ('r1', 'acme', '2025-01-01', '2025-01-07', 'campaign_name', 'Summer', 'roas', 3.0);
+        INSERT INTO hypotheses (run_id, account, metric, payload) VALUES ('r1', 'acme', 'roas', '{"reason": "old"}');
+    """)
+    conn.close()
+
+    store = HistoryStore(path)
+    run = store.run("r1")
+    assert run["filters"] == {"audience_type": ["Broad"]} and run["window_days"] == 7
+    assert run["hypotheses"] == [{"reason": "old"}]
+    segment = store.metric_trend("roas", account="acme", dimension="campaign_name", segment="Summer")
+    assert [r["value"] for r in segment] == pytest.approx([3.0])
+
+    # The rebuilt tables take the same run_id for another account
+    store.record_run("r1", "other", "q", _summary(cube_summary, "2025-01-01", 9.0), _validated(0.5))
+    assert {r["account"] for r in store.runs()} == {"acme", "other"}
+    store.close()
@@ -0,0 +1,93 @@
+"""
+Unit tests for PipelineLogWriter.
+
+These tests ensure:
+- buffered entries reach disk on flush
+- a run can be read back through the sidecar index
+- size-based rotation keeps the index pointing at the right files
+- a failed write keeps its entries for the next flush
+- close() drops the writer's atexit hook; read_run holds the I/O lock
+"""
+
+import os
+
+import pytest
+
+from src.utils import log_writer
+from src.utils.log_writer import PipelineLogWriter
+
+
+def test_flush_and_read_run(tmp_path):
+    writer = PipelineLogWriter(str(tmp_path), batch_size=100, flush_interval=60)
+
+    writer.write({"run_id": "a", "step": "planner"})
+    writer.write({"run_id": "b", "step": "planner"})
+    writer.write({"run_id": "a", "step": "complete"})
+    writer.flush()
+
+    entries = writer.read_run("a")
+    assert [e["step"] for e in entries] == ["planner", "complete"]
+    assert writer.read_run("missing") == []
+    writer.close()
+
+
+def test_size_rotation_keeps_index(tmp_path):
+    writer = PipelineLogWriter(str(tmp_path), batch_size=1, flush_interval=60, max_bytes=200)
+
+    for i in range(10):
+        writer.write({"run_id": f"run{i % 2}", "step": "step", "i": i})
+        writer.flush()
+
+    log_files = [f for f in os.listdir(tmp_path) if f.endswith(".json")]
+    assert len(log_files) > 1
+
+    assert [e["i"] for e in writer.read_run("run0")] == [0, 2, 4, 6, 8]
+    assert [e["i"] for e in writer.read_run("run1")] == [1, 3, 5, 7, 9]
+    writer.close()
+
+
+def test_rebuild_index_for_legacy_log(tmp_path):
+    with open(tmp_path / "pipeline_log.json", "w", encoding="utf-8") as f:
+        f.write('{"run_id": "old", "step": "planner"}\n')
+        f.write('{"run_id": "old", "step": "complete"}\n')
+
+    writer = PipelineLogWriter(str(tmp_path))
+    assert len(writer.read_run("old")) == 2
+    writer.close()
+
+
+def test_failed_flush_keeps_batch(tmp_path, monkeypatch):
+    writer = PipelineLogWriter(str(tmp_path), batch_size=100, flush_interval=60)
+    writer.write({"run_id": "a", "step": "planner"})
+
+    def fail(batch):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(writer, "_write_batch", fail)
+        with pytest.raises(OSError):
+            writer.flush()
+    writer.write({"run_id": "a", "step": "complete"})
+    writer.flush()
+
+    assert [e["step"] for e in writer.read_run("a")] == ["planner", "complete"]
+    writer.close()
+
+
+def test_close_unregisters_atexit_and_read_run_locks(tmp_path, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(log_writer.atexit, "register", hooks.append)
+    monkeypatch.setattr(log_writer.atexit, "unregister", hooks.remove)
+
+    writer = PipelineLogWriter(str(tmp_path), batch_size=100, flush_interval=60)
+    assert hooks == [writer.close]
+
+    load_index = writer.load_index
+    locked = []
+    monkeypatch.setattr(writer, "load_index", lambda: locked.append(writer._io_lock.locked()) or load_index())
+    writer.write({"run_id": "r1", "step": "planner"})
+    assert writer.read_run("r1") == [{"run_id": "r1", "step": "planner"}]
+    assert locked == [True]
+
+    writer.close()
+    assert hooks == []
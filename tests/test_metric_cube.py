@@ -0,0 +1,66 @@
+"""
+Unit tests for MetricCube.
+
+These tests ensure:
+- window aggregates match a pandas groupby over the same rows
+- daily matrices derive ratios from summed totals
+- segment names are found in free text
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.data_generator import SyntheticAdsGenerator
+from src.utils.cleaner import DataCleaner
+from src.utils.metric_cube import TOTAL, MetricCube
+
+
+@pytest.fixture(scope="module")
+def df():
+    raw = SyntheticAdsGenerator(seed=11, campaigns=4, creatives=6, days=30).generate_chunk(3000)
+    return DataCleaner().clean_dataframe(raw)
+
+
+def test_window_matches_groupby(df):
+    cube = MetricCube.from_dataframe(df)
+    start, end = "2025-01-05", "2025-01-20"
+
+    mask = (df["date"] >= start) & (df["date"] <= end)
+    expected = df[mask].groupby("campaign_name")[["spend", "clicks", "impressions", "revenue"]].sum()
+
+    for campaign, row in expected.iterrows():
+        got = cube.window("campaign_name", campaign, start, end)
+        assert got["spend"] == pytest.approx(row["spend"])
+        assert got["ctr"] == pytest.approx(row["clicks"] / row["impressions"])
+        assert got["roas"] == pytest.approx(row["revenue"] / row["spend"])
+
+    all_rows = cube.windows("campaign_name", start, end)
+    assert all_rows["spend"].sum() == pytest.approx(df[mask]["spend"].sum())
+
+
+def test_daily_matrix(df):
+    cube = MetricCube.from_dataframe(df)
+
+    spend = cube.daily(TOTAL, "spend")
+    assert spend.shape == (1, df["date"].nunique())
+    assert spend.sum() == pytest.approx(df["spend"].sum())
+
+    ctr = cube.daily("creative_type", "ctr")
+    day = df[df["date"] == df["date"].min()].groupby("creative_type")[["clicks", "impressions"]].sum()
+    first = dict(zip(cube.values["creative_type"], ctr[:, 0]))
+    for creative_type, row in day.iterrows():
+        assert first[creative_type] == pytest.approx(row["clicks"] / row["impressions"])
+    assert np.isnan(cube.daily("creative_type", "ctr", start="2030-01-01")).size == 0
+
+
+
+def test_match_entities(df):
+    cube = MetricCube.from_dataframe(df)
+
+    found = cube.match_entities("Video beats image for Retargeting users in the US, not us")
+
+    assert ("creative_type", "Video") in found
+    assert ("creative_type", "Image") in found
+    assert ("audience_type", "Retargeting") in found
+    assert found.count(("country", "US")) == 1
@@ -0,0 +1,117 @@
+"""
+Unit tests for the multi-account runner.
+
+These tests ensure:
+- every account in the manifest gets its own reports and a unique run_id
+- the full pipeline, creative generation included, runs for each account
+- worker processes are reused across accounts
+- duplicate labels, and labels sharing a directory slug, are rejected
+- a failing account is reported without stopping the others
+- the shared token bucket limits LLM calls across processes
+"""
+
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+import yaml
+
+from benchmarks.stub_llm import StubLLM
+from src.orchestrator.multi_account import MultiAccountRunner, load_manifest, validate_manifest
+from src.utils.data_generator import SyntheticAdsGenerator
+from src.utils.history_store import HistoryStore
+from src.utils.rate_limiter import SharedTokenBucket
+
+
+class _LimitedStubLLM(StubLLM):
+    def __init__(self, rate_limiter=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+
+    def ask_json(self, system_prompt, user_prompt):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return super().ask_json(system_prompt, user_prompt)
+
+
+def _config(tmp_path):
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    config["paths"]["reports"] = str(tmp_path / "reports")
+    config["paths"]["logs"] = str(tmp_path / "logs")
+    config["llm"]["rate_per_sec"] = 0
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def test_accounts_run_sharded_with_isolated_reports(tmp_path):
+    accounts = []
+    for i in range(3):
+        data = str(tmp_path / f"acct{i}.csv")
+        SyntheticAdsGenerator(seed=i, campaigns=2, creatives=4, days=14).write_csv(data, 600)
+        accounts.append({"account": f"acct {i}", "data": data})
+    accounts.append({"account": "missing", "data": str(tmp_path / "missing.csv")})
+
+    runner = MultiAccountRunner(_config(tmp_path), processes=2, llm_factory=_LimitedStubLLM)
+    assert runner.llm_rate == 0  # the shared bucket takes llm.rate_per_sec
+    summary = runner.run({"query": "Analyze ROAS drop and recommend creatives", "accounts": accounts})
+    results = {r["account"]: r for r in summary["results"]}
+    throughput = summary["throughput"]
+
+    assert [r["account"] for r in summary["results"]] == ["acct 0", "acct 1", "acct 2", "missing"]
+    assert throughput["succeeded"] == 3 and throughput["failed"] == 1
+    assert "FileNotFoundError" in results["missing"]["error"]
+    assert len(throughput["accounts_per_process"]) <= 2
+    assert throughput["rows_processed"] == sum(results[f"acct {i}"]["rows"] for i in range(3))
+    assert all(results[f"acct {i}"]["improvements"] > 0 for i in range(3))
+
+    run_ids = {r["run_id"] for r in summary["results"]}
+    assert len(run_ids) == 4
+    for i in range(3):
+        reports = results[f"acct {i}"]["reports_dir"]
+        assert os.path.basename(reports) == f"acct_{i}"
+        assert os.path.exists(os.path.join(reports, "report.md"))
+        assert os.path.exists(os.path.join(reports, "logs", "pipeline_log.json"))
+
+    with open(os.path.join(runner.output_dir, "summary.json")) as f:
+        assert json.load(f)["throughput"]["accounts"] == 4
+    store = HistoryStore(str(tmp_path / "logs" / "history.sqlite"))
+    assert sorted(r["account"] for r in store.runs()) == ["acct 0", "acct 1", "acct 2"]
+    store.close()
+
+
+def test_duplicate_accounts_rejected(tmp_path):
+    path = tmp_path / "manifest.yaml"
+    path.write_text(yaml.safe_dump({"accounts": [{"account": "a"}, {"account": "a"}]}))
+    with pytest.raises(ValueError):
+        load_manifest(str(path))
+
+
+def test_colliding_account_slugs_rejected():
+    with pytest.raises(ValueError, match="acct_1"):
+        validate_manifest({"accounts": [{"account": "acct 1"}, {"account": "acct_1"}]})
+    assert validate_manifest([{"account": "acct 1"}, {"account": "acct 2"}])["accounts"][1]["account"] == "acct 2"
+
+
+def _drain(bucket, n, out):
+    for _ in range(n):
+        bucket.acquire()
+    out.put(time.monotonic())
+
+
+def test_shared_token_bucket_limits_across_processes():
+    ctx = multiprocessing.get_context()
+    bucket = SharedTokenBucket(rate=40, capacity=1, ctx=ctx)
+    out = ctx.Queue()
+    start = time.monotonic()
+    workers = [ctx.Process(target=_drain, args=(bucket, 4, out)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    # 12 tokens at 40/s with a burst of 1 need at least 11 / 40 seconds in total
+    assert max(out.get() for _ in workers) - start >= 11 / 40 * 0.9
@@ -0,0 +1,96 @@
+"""
+Unit tests for StageProfiler.
+
+These tests ensure:
+- each stage records its wall time and writes its profile files
+- sampling mode collects stacks and stops its thread on finish
+- work done in threads started by a stage is profiled in both modes
+- a stage that raises still leaves the profiler finished (sampler stopped,
+  tracemalloc off), including inside Orchestrator.run
+"""
+
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import yaml
+
+from benchmarks.stub_llm import StubLLM
+from src.orchestrator.orchestrator import Orchestrator
+from src.utils.profiler import StageProfiler
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_deterministic_stage_timing_and_files(tmp_path):
+    profiler = StageProfiler(str(tmp_path), mode="deterministic")
+    profiler.begin("run1")
+    with profiler.stage("load"):
+        _busy(0.05)
+    with profiler.stage("fit"):
+        pass
+    report = profiler.finish()
+
+    assert [s["name"] for s in profiler.stages] == ["load", "fit"]
+    assert profiler.stages[0]["wall_seconds"] >= 0.05 > profiler.stages[1]["wall_seconds"]
+    for name in ("load.prof", "load.alloc.txt", "fit.prof", "hotspots.md"):
+        assert os.path.exists(tmp_path / "run1" / name)
+    assert "| load |" in open(report, encoding="utf-8").read()
+    assert not tracemalloc.is_tracing()
+
+
+def test_sampling_collects_stacks_and_stops(tmp_path):
+    profiler = StageProfiler(str(tmp_path), mode="sampling", sample_interval=0.001)
+    profiler.begin("run1")
+    sampler = profiler._sampler
+    with profiler.stage("busy"):
+        _busy(0.1)
+    profiler.finish()
+
+    assert not sampler._thread.is_alive()
+    assert profiler.stages[0]["samples"] > 0
+    assert "_busy" in (tmp_path / "run1" / "busy.samples.txt").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("mode", ["deterministic", "sampling"])
+def test_worker_threads_are_profiled(tmp_path, mode):
+    profiler = StageProfiler(str(tmp_path), mode=mode, sample_interval=0.001)
+    profiler.begin("run1")
+    with profiler.stage("pool"):
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="chunk") as pool:
+            list(pool.map(_busy, [0.1, 0.1]))
+    profiler.finish()
+
+    stage = profiler.stages[0]
+    assert stage["threads"] >= 3
+    assert any(label.startswith("_busy ") for *_, label in stage["functions"])
+    if mode == "sampling":
+        assert "[chunk_0];" in (tmp_path / "run1" / "pool.samples.txt").read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("mode", ["deterministic", "sampling"])
+def test_failed_run_still_finishes_profile(tmp_path, mode):
+    with open("config/config.yaml", "r") as f:
+        config = yaml.safe_load(f)
+    config["paths"].update(
+        data=str(tmp_path / "missing.csv"), reports=str(tmp_path / "reports"), logs=str(tmp_path / "logs")
+    )
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump(config))
+
+    orchestrator = Orchestrator(str(config_path), llm=StubLLM())
+    orchestrator.profiler = StageProfiler(str(tmp_path / "profiles"), mode=mode)
+    with pytest.raises(FileNotFoundError):
+        orchestrator.run("Analyze ROAS drop", run_id="failed")
+
+    assert orchestrator.profiler._sampler is None
+    assert not tracemalloc.is_tracing()
+    assert [s["name"] for s in orchestrator.profiler.stages] == ["planner", "data_agent"]
+    assert os.path.exists(tmp_path / "profiles" / "failed" / "hotspots.md")
+    assert orchestrator.log_writer is None
@@ -0,0 +1,96 @@
+"""
+Unit tests for planner-driven data operations.
+
+These tests ensure:
+- queries and planner tasks compile to only the summaries they need
+- a query that names a topic is not widened by planner tasks
+- date windows and metric names are extracted
+- DataAgent filters to a named comparison set and computes only planned ops
+- segment filters come from the user query, not from planner task text
+"""
+
+from src.agents.data_agent import DataAgent
+from src.utils.cleaner import DataCleaner
+from src.utils.data_generator import SyntheticAdsGenerator
+from src.utils.query_plan import OPERATIONS, compile_plan
+
+
+def test_compile_image_vs_video_last_month():
+    plan = compile_plan({"tasks": [{"step": 1, "task": "Aggregate ROAS per format"}]},
+                        "Compare image vs video ROAS over the last month")
+
+    assert plan.kinds == ["creative_type"]
+    assert plan.metrics == ("roas",)
+    assert plan.window_days == 30
+
+
+def test_targeted_query_ignores_broader_planner_tasks():
+    tasks = {"tasks": [
+        {"task": "Plot the daily ROAS trend over time"},
+        {"task": "Review low-CTR creatives and recommend new headlines"},
+        {"task": "Break CTR down by audience and creative type"},
+        {"task": "Check the last 7 days"},
+    ]}
+
+    for query, kinds in [
+        ("Compare image vs video ROAS over the last month", ["creative_type"]),
+        ("Compare Broad vs Retargeting audience CTR", ["audience"]),
+    ]:
+        plan = compile_plan(tasks, query)
+        assert plan.kinds == kinds
+        assert set(plan.kinds) < set(OPERATIONS)
+        assert len(plan.metrics) == 1
+
+    assert compile_plan(tasks, "Compare Broad vs Retargeting audience CTR").window_days is None
+
+    # A query with no topic falls back to the tasks' operations
+    plan = compile_plan(tasks, "What happened to ROAS?")
+    assert plan.kinds == ["daily", "creative", "creative_type", "audience", "low_ctr_ads"]
+    assert plan.metrics == ("roas",)
+    assert plan.window_days is None
+
+
+def test_compile_falls_back_to_full_plan():
+    plan = compile_plan({"tasks": []}, "What happened?")
+
+    assert plan.kinds == list(OPERATIONS)
+    assert plan.window_days is None
+
+    assert compile_plan(None, "Show CTR for the past 2 weeks").window_days == 14
+
+
+def test_data_agent_runs_only_planned_ops():
+    raw = SyntheticAdsGenerator(seed=3, campaigns=3, creatives=20, days=60).generate_chunk(3000)
+    df = DataCleaner().clean_dataframe(raw)
+
+    agent = DataAgent("config/config.yaml")
+    agent.load_data = lambda: df
+
+    plan = compile_plan(None, "Compare Image vs Video ROAS over the last month")
+    summary = agent.build_summary(plan)
+
+    assert "daily_summary" not in summary and "audience_summary" not in summary
+    rows = summary["creative_type_summary"]
+    assert sorted(r["creative_type"] for r in rows) == ["Image", "Video"]
+    assert all("ctr" not in r and "roas" in r for r in rows)
+
+    info = summary["dataset_info"]["data_plan"]
+    assert info["filters"] == {"creative_type": ["Image", "Video"]}
+    dates = summary["metric_cube"].dates
+    assert len(dates) == 30 and str(dates[-1]) == str(df["date"].max().date())
+
+
+def test_filters_ignore_planner_task_text():
+    raw = SyntheticAdsGenerator(seed=3, campaigns=3, creatives=20, days=60).generate_chunk(3000)
+    df = DataCleaner().clean_dataframe(raw)
+
+    agent = DataAgent("config/config.yaml")
+    agent.load_data = lambda: df
+
+    plan = compile_plan({"tasks": [{"task": "Compare Image vs Video creative types"}]}, "How is ROAS doing?")
+    assert plan.texts == ["How is ROAS doing?"]
+    assert "creative_type" in plan.kinds
+
+    summary = agent.build_summary(plan)
+    assert summary["dataset_info"]["data_plan"]["filters"] == {}
+    assert len(summary["creative_type_summary"]) > 2
@@ -0,0 +1,115 @@
+"""
+Unit tests for sample mode.
+
+These tests ensure:
+- the stratified sample is seeded, within budget and covers every stratum
+- the row budget holds when strata x min_per_stratum exceeds it
+- a time-budget stop flags the estimate as partial
+- weighted totals estimate the full-data totals
+- CTR/ROAS intervals cover the full-data value
+- EvaluatorAgent treats overlapping segment intervals as inconclusive
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.agents.data_agent import DataAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.utils.cleaner import DataCleaner
+from src.utils.data_generator import SyntheticAdsGenerator
+from src.utils.metric_cube import TOTAL
+from src.utils.aggregation import WEIGHT
+from src.utils.sampling import stratified_sample_csv
+
+
+@pytest.fixture(scope="module")
+def csv_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("data") / "ads.csv")
+    SyntheticAdsGenerator(seed=9, campaigns=4, creatives=12, days=20).write_csv(path, 20000)
+    return path
+
+
+def _agent(path):
+    agent = DataAgent("config/config.yaml")
+    agent.data_path = path
+    agent.mode = "sample"
+    agent.sampling_cfg = {"max_rows": 3000, "chunk_rows": 5000}
+    return agent
+
+
+def test_sample_is_seeded_stratified_and_unbiased(csv_path):
+    agent = _agent(csv_path)
+    sample = agent.load_data()
+    again = _agent(csv_path).load_data()
+    full = DataCleaner().clean_dataframe(pd.read_csv(csv_path))
+
+    pd.testing.assert_frame_equal(sample, again)
+    assert len(sample) < len(full) / 3
+    strata = ["date", "campaign_name", "creative_type"]
+    assert len(sample.drop_duplicates(strata)) == len(full.drop_duplicates(strata))
+    assert sample["spend"].sum() == pytest.approx(full["spend"].sum(), rel=0.05)
+
+
+def test_many_strata_stay_within_row_budget(tmp_path):
+    path = str(tmp_path / "wide.csv")
+    SyntheticAdsGenerator(seed=4, campaigns=40, creatives=80, days=20).write_csv(path, 12000)
+    clean = DataCleaner().clean_dataframe
+
+    df, info = stratified_sample_csv(path, clean, max_rows=1000, chunk_rows=3000, min_per_stratum=2)
+
+    assert len(df) == 1000
+    assert info["strata_unsampled"] > 0
+    assert info["population"]["n_h"].sum() == len(df)
+    assert info["population"]["N_h"].sum() + info["rows_unsampled_strata"] == info["rows_read"] == 12000
+    assert df[WEIGHT].sum() == pytest.approx(info["population"]["N_h"].sum())
+
+    # Budget to spare: every stratum gets its minimum
+    df, info = stratified_sample_csv(path, clean, max_rows=8000, chunk_rows=3000, min_per_stratum=2)
+    assert len(df) == 8000 and info["strata_unsampled"] == 0
+    population = info["population"]
+    assert (population["n_h"] >= np.minimum(population["N_h"], 2)).all()
+
+
+def test_time_budget_flags_partial_estimate(csv_path):
+    df, info = stratified_sample_csv(csv_path, DataCleaner().clean_dataframe, max_rows=3000, chunk_rows=5000,
+                                     time_budget=0)
+
+    assert info["partial"] is True
+    assert info["rows_read"] == 5000
+    assert len(df) == 3000
+
+
+def test_summary_intervals_cover_full_data(csv_path):
+    summary = _agent(csv_path).build_summary()
+    full = DataCleaner().clean_dataframe(pd.read_csv(csv_path))
+
+    total = summary["segment_intervals"][TOTAL]["all"]
+    ctr = full["clicks"].sum() / full["impressions"].sum()
+    roas = full["revenue"].sum() / full["spend"].sum()
+    assert total["ctr"][0] <= ctr <= total["ctr"][1]
+    assert total["roas"][0] <= roas <= total["roas"][1]
+
+    row = summary["creative_type_summary"][0]
+    assert row["ctr_ci"][0] <= row["ctr"] <= row["ctr_ci"][1]
+    assert summary["sampling"]["rows_read"] == len(full)
+
+
+def test_overlapping_intervals_make_comparison_inconclusive(cube_summary):
+    summary = cube_summary({
+        audience: [ctr + 0.001 * (day % 3) for day in range(10)]
+        for audience, ctr in (("Broad", 0.030), ("Retargeting", 0.020))
+    })
+    hypotheses = {"hypotheses": [{"reason": "Broad audience beats Retargeting on CTR", "confidence": 0.6}]}
+    evaluator = EvaluatorAgent("config/config.yaml")
+
+    assert evaluator.validate(hypotheses, summary)["validated_hypotheses"][0]["validated"] is True
+
+    summary["segment_intervals"] = {"audience_type": {
+        "Broad": {"ctr": [0.018, 0.034]},
+        "Retargeting": {"ctr": [0.016, 0.024]},
+    }}
+    h = evaluator.validate(hypotheses, summary)["validated_hypotheses"][0]
+
+    assert h["validated"] is False
+    assert h["statistics"]["sampling_inconclusive"] is True